@@ -0,0 +1,232 @@
+"""
+Build benchmark: the full main() build and each stage of the pipeline
+(markdown_to_blocks, text_to_textnode, markdown_to_html_node, to_html)
+on a synthetic site from corpus.py, with pages/sec and peak memory.
+
+Every measurement runs in a fresh child process. The peak of the build
+is the maximum RSS of its process, interpreter included; the peak of a
+stage is the most memory tracemalloc saw allocated while it ran, in a
+second, traced run of the stage that is not timed. The corpus is generated from a fixed seed, so
+results of different commits can be compared: save them with --json and
+pass the file to --compare on a later run, or measure an older commit
+side by side with --before REV (exported with git archive).
+
+usage: python bench/bench_build.py [--pages N] [--depth D] [--repeat N] [--before REV] [--json PATH] [--compare PATH]
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import corpus
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+STAGES = ["markdown_to_blocks", "text_to_textnode", "markdown_to_html_node", "to_html"]
+
+
+def peak_rss() -> int:
+	# ru_maxrss is in KiB on Linux
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_stage(run, seconds: dict, peaks: dict, stage: str):
+	"""
+	Time run(), then run it again under tracemalloc for its peak.
+
+	return:
+	* what the timed run returned
+	"""
+	start = time.perf_counter()
+	result = run()
+	seconds[stage] = time.perf_counter() - start
+	tracemalloc.start()
+	run()
+	peaks[stage] = tracemalloc.get_traced_memory()[1] // 1024
+	tracemalloc.stop()
+	return result
+
+
+def stages_worker(src_dir: str, site: str) -> dict:
+	"""
+	Time every stage over the whole corpus, each stage fed with the
+	output of the previous one.
+	"""
+	sys.path.insert(0, src_dir)
+	from utils import block_to_block_type, markdown_to_blocks, markdown_to_html_node, text_to_textnode
+
+	pages = []
+	for dir_path, _, files in os.walk(os.path.join(site, "content")):
+		for name in sorted(files):
+			with open(os.path.join(dir_path, name)) as f:
+				pages.append(f.read())
+	seconds = {}
+	peaks = {}
+
+	blocks = run_stage(lambda: [markdown_to_blocks(page) for page in pages], seconds, peaks, "markdown_to_blocks")
+	texts = [text for page_blocks in blocks for text in inline_texts(page_blocks, block_to_block_type)]
+	run_stage(lambda: [text_to_textnode(text) for text in texts], seconds, peaks, "text_to_textnode")
+	trees = run_stage(lambda: [markdown_to_html_node(page) for page in pages], seconds, peaks, "markdown_to_html_node")
+	run_stage(lambda: [tree.to_html() for tree in trees], seconds, peaks, "to_html")
+
+	return {"pages": len(pages), "seconds": seconds, "peak_kib": peaks}
+
+
+def inline_texts(blocks: list[str], block_to_block_type) -> list[str]:
+	"""
+	The text the block converters hand to text_to_textnode: paragraphs
+	whole, headings and list items without their markers.
+	"""
+	texts = []
+	for block in blocks:
+		block_type = block_to_block_type(block)
+		if block_type == "paragraph":
+			texts.append(block)
+		elif block_type in ("heading", "unordered_list", "ordered_list"):
+			texts.extend(line.split(" ", 1)[1] for line in block.split("\n"))
+	return texts
+
+
+def build_worker(src_dir: str, site: str) -> dict:
+	"""
+	Time one clean main() build of a copy of the site.
+	"""
+	with tempfile.TemporaryDirectory() as tmp:
+		for name in ("content", "static", "template.html"):
+			source = os.path.join(site, name)
+			if os.path.isdir(source):
+				shutil.copytree(source, os.path.join(tmp, name))
+			else:
+				shutil.copy(source, os.path.join(tmp, name))
+		os.chdir(tmp)
+		sys.path.insert(0, src_dir)
+		# Older commits have a main() without arguments that reads sys.argv
+		sys.argv = ["main.py", "--clean"]
+		from main import main
+
+		with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+			start = time.perf_counter()
+			main()
+			elapsed = time.perf_counter() - start
+		pages = sum(name.endswith(".md") for _, _, files in os.walk("content") for name in files)
+	# The whole process, which only ever ran this one build
+	return {"pages": pages, "seconds": {"main": elapsed}, "peak_kib": {"main": peak_rss()}}
+
+
+def run_worker(kind: str, src_dir: str, site: str) -> dict:
+	out = subprocess.run(
+		[sys.executable, __file__, "--worker", kind, src_dir, site],
+		check=True, capture_output=True, text=True
+	).stdout
+	return json.loads(out.splitlines()[-1])
+
+
+def measure(src_dir: str, site: str, repeat: int) -> dict:
+	"""
+	Run every measurement repeat times and keep the best time and the
+	lowest peak of each.
+
+	return:
+	* dict of stage name to {"seconds", "pages_per_second", "peak_kib"}
+	"""
+	results = {}
+	for kind in ("stages", "build"):
+		runs = [run_worker(kind, src_dir, site) for _ in range(repeat)]
+		pages = runs[0]["pages"]
+		for stage in runs[0]["seconds"]:
+			seconds = min(run["seconds"][stage] for run in runs)
+			results[stage] = {
+				"seconds": round(seconds, 4),
+				"pages_per_second": round(pages / seconds, 1) if seconds else None,
+				"peak_kib": min(run["peak_kib"][stage] for run in runs),
+			}
+	return results
+
+
+def export_src(rev: str, dest: str) -> str:
+	archive = subprocess.run(["git", "-C", ROOT, "archive", rev, "src"], check=True, capture_output=True).stdout
+	subprocess.run(["tar", "-x", "-C", dest], input=archive, check=True)
+	return os.path.join(dest, "src")
+
+
+def describe(rev: str="HEAD") -> str:
+	"""
+	Short commit id of rev, marked +dirty when src/ has uncommitted changes.
+	"""
+	commit = subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", rev], check=True, capture_output=True, text=True).stdout.strip()
+	if rev == "HEAD":
+		status = subprocess.run(["git", "-C", ROOT, "status", "--porcelain", "src"], check=True, capture_output=True, text=True).stdout
+		if status.strip():
+			commit += "+dirty"
+	return commit
+
+
+def print_results(runs: list[tuple[str, dict]], baseline: dict=None):
+	header = f"{'tree':<16} {'stage':<22} {'seconds':>9} {'pages/s':>10} {'peak MiB':>9}"
+	if baseline is not None:
+		header += f" {'vs ' + baseline['commit']:>14}"
+	print(header)
+	for name, results in runs:
+		for stage in ["main"] + STAGES:
+			result = results[stage]
+			line = f"{name:<16} {stage:<22} {result['seconds']:>9.4f} {result['pages_per_second'] or 0:>10.1f} {result['peak_kib'] / 1024:>9.1f}"
+			before = baseline["results"].get(stage) if baseline is not None else None
+			if before:
+				change = (result["seconds"] - before["seconds"]) / before["seconds"] * 100
+				line += f" {change:>+13.1f}%"
+			print(line)
+
+
+def main(argv: list[str]=None):
+	parser = argparse.ArgumentParser(description="Time the build and its stages on a synthetic site.")
+	corpus.add_arguments(parser)
+	parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, best is reported (default: 3)")
+	parser.add_argument("--before", metavar="REV", help="also measure the src/ tree of this git revision")
+	parser.add_argument("--json", metavar="PATH", help="write the results of the working tree to PATH")
+	parser.add_argument("--compare", metavar="PATH", help="show the change against results saved with --json")
+	parser.add_argument("--worker", nargs=3, metavar=("KIND", "SRC", "SITE"), help=argparse.SUPPRESS)
+	args = parser.parse_args(argv)
+
+	if args.worker:
+		kind, src_dir, site = args.worker
+		worker = stages_worker if kind == "stages" else build_worker
+		print(json.dumps(worker(src_dir, site)))
+		return
+
+	baseline = None
+	if args.compare:
+		with open(args.compare) as f:
+			baseline = json.load(f)
+
+	runs = []
+	with tempfile.TemporaryDirectory() as tmp:
+		site = os.path.join(tmp, "site")
+		paths = corpus.generate_site(site, args.pages, args.depth, args.seed, corpus.parse_mix(args.mix))
+		if args.before:
+			os.makedirs(os.path.join(tmp, "before"))
+			runs.append((describe(args.before), measure(export_src(args.before, os.path.join(tmp, "before")), site, args.repeat)))
+		runs.append((describe(), measure(os.path.join(ROOT, "src"), site, args.repeat)))
+
+	print(f"{len(paths)} pages, depth {args.depth}, seed {args.seed}")
+	print_results(runs, baseline)
+
+	if args.json:
+		commit, results = runs[-1]
+		with open(args.json, "w") as f:
+			json.dump({
+				"commit": commit,
+				"python": sys.version.split()[0],
+				"corpus": {"pages": args.pages, "depth": args.depth, "seed": args.seed, "mix": corpus.parse_mix(args.mix)},
+				"results": results,
+			}, f, indent=1)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,42 @@
+"""
+Microbenchmark: single-pass scan_inline against the original chain of
+split_nodes_* passes (text_to_textnode_chain).
+
+usage: python bench/bench_inline.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from utils import scan_inline, text_to_textnode_chain
+
+SAMPLES = {
+	"plain": "Just a plain sentence without any inline markup at all. " * 4,
+	"mixed": (
+		"This is **text** with an *italic* word and a `code block` and an "
+		"![obi wan image](https://i.imgur.com/fJRm4Vk.jpeg) and a [link](https://boot.dev)"
+	),
+	"dense": " ".join(f"**b{i}** *i{i}* `c{i}` [l{i}](/l{i})" for i in range(50)),
+	"long": "Some *emphasis* and a [link](/x) in a long paragraph. " * 200,
+}
+
+
+def main(argv: list[str]=None):
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--repeat", type=int, default=5, help="timing repetitions, best is reported")
+	args = parser.parse_args(argv)
+
+	print(f"{'sample':<8} {'chars':>7} {'chain us':>10} {'scan us':>10} {'speedup':>8}")
+	for name, text in SAMPLES.items():
+		assert scan_inline(text) == text_to_textnode_chain(text)
+		number = max(1, 20000 // len(text))
+		chain = min(timeit.repeat(lambda: text_to_textnode_chain(text), number=number, repeat=args.repeat)) / number
+		scan = min(timeit.repeat(lambda: scan_inline(text), number=number, repeat=args.repeat)) / number
+		print(f"{name:<8} {len(text):>7} {chain * 1e6:>10.1f} {scan * 1e6:>10.1f} {chain / scan:>7.2f}x")
+
+
+if __name__ == "__main__":
+	main()
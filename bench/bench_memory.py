@@ -0,0 +1,103 @@
+"""
+Memory benchmark: peak RSS of parsing a large generated corpus and keeping
+every TextNode and HTMLNode tree alive.
+
+Each measurement runs in a fresh child process so peak RSS is not shared.
+With --before REV the same workload is also run against the src/ tree of
+an older commit (exported with git archive), e.g. the commit before the
+node classes got __slots__:
+
+usage: python bench/bench_memory.py [--pages N] [--before REV]
+"""
+import argparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+WORDS = ["middle", "earth", "ring", "hobbit", "shire", "elves", "dwarves", "wizard", "river", "mountain"]
+
+
+def generate_page(rng: random.Random) -> str:
+	blocks = [f"# {' '.join(rng.choices(WORDS, k=4)).title()}"]
+	for _ in range(rng.randint(5, 15)):
+		spans = []
+		for _ in range(rng.randint(10, 30)):
+			word = rng.choice(WORDS)
+			kind = rng.random()
+			if kind < 0.1:
+				spans.append(f"**{word}**")
+			elif kind < 0.2:
+				spans.append(f"*{word}*")
+			elif kind < 0.25:
+				spans.append(f"`{word}`")
+			elif kind < 0.3:
+				spans.append(f"[{word}](/{word})")
+			else:
+				spans.append(word)
+		blocks.append(" ".join(spans))
+	return "\n\n".join(blocks)
+
+
+def worker(src_dir: str, pages: int):
+	sys.path.insert(0, src_dir)
+	from utils import markdown_to_html_node
+
+	rng = random.Random(42)
+	corpus = [generate_page(rng) for _ in range(pages)]
+	baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+	start = time.perf_counter()
+	trees = [markdown_to_html_node(md) for md in corpus]
+	elapsed = time.perf_counter() - start
+
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	print(f"{len(trees)} {elapsed:.3f} {baseline} {peak}")
+
+
+def measure(src_dir: str, pages: int) -> tuple[float, int]:
+	out = subprocess.run(
+		[sys.executable, __file__, "--worker", src_dir, "--pages", str(pages)],
+		check=True, capture_output=True, text=True
+	).stdout.split()
+	_, elapsed, baseline, peak = out
+	# ru_maxrss is in KiB on Linux; count only what the node trees added
+	return float(elapsed), int(peak) - int(baseline)
+
+
+def export_src(rev: str, dest: str) -> str:
+	archive = subprocess.run(["git", "-C", ROOT, "archive", rev, "src"], check=True, capture_output=True).stdout
+	subprocess.run(["tar", "-x", "-C", dest], input=archive, check=True)
+	return os.path.join(dest, "src")
+
+
+def main(argv: list[str]=None):
+	parser = argparse.ArgumentParser(description="Peak RSS of parsing a generated corpus into node trees.")
+	parser.add_argument("--pages", type=int, default=2000, help="number of generated pages")
+	parser.add_argument("--before", metavar="REV", help="also measure the src/ tree of this git revision")
+	parser.add_argument("--worker", metavar="SRC", help=argparse.SUPPRESS)
+	args = parser.parse_args(argv)
+
+	if args.worker:
+		worker(args.worker, args.pages)
+		return
+
+	runs = []
+	with tempfile.TemporaryDirectory() as tmp:
+		if args.before:
+			runs.append((args.before, measure(export_src(args.before, tmp), args.pages)))
+		runs.append(("working tree", measure(os.path.join(ROOT, "src"), args.pages)))
+
+	print(f"{args.pages} pages")
+	print(f"{'tree':<16} {'parse s':>8} {'peak RSS MiB':>13}")
+	for name, (elapsed, rss) in runs:
+		print(f"{name:<16} {elapsed:>8.3f} {rss / 1024:>13.1f}")
+
+
+if __name__ == "__main__":
+	main()
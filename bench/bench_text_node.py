@@ -0,0 +1,63 @@
+"""
+Microbenchmark: text_node_to_html_node with the per-type converter table
+against the previous version, which built all six LeafNodes on every call
+and returned one of them.
+
+usage: python bench/bench_text_node.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from htmlnode import LeafNode
+from textnode import TextNode
+from utils import text_node_to_html_node
+
+
+def text_node_to_html_node_dict(text_node: TextNode) -> LeafNode:
+	# The previous implementation, kept here as the baseline
+	valid_text_to_html = {
+		"text" : LeafNode(tag=None, value=text_node.text),
+		"bold" : LeafNode(tag="b", value=text_node.text),
+		"italic" : LeafNode(tag="i", value=text_node.text),
+		"code" : LeafNode(tag="code", value=text_node.text),
+		"link" : LeafNode(tag="a", value=text_node.text, props={"href" : text_node.url}),
+		"image" : LeafNode(
+			tag="img",
+			value=text_node.text,
+			props={"src" : text_node.url, "alt" : text_node.text})
+	}
+	if text_node.text_type in valid_text_to_html:
+		return valid_text_to_html[text_node.text_type]
+	raise ValueError("TextNode does not contain a valid text_type")
+
+
+NODES = [
+	TextNode("plain words", "text"),
+	TextNode("bold words", "bold"),
+	TextNode("italic words", "italic"),
+	TextNode("code", "code"),
+	TextNode("a link", "link", "https://boot.dev"),
+	TextNode("an image", "image", "/images/rivendell.png"),
+]
+
+
+def main(argv: list[str]=None):
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--repeat", type=int, default=5, help="timing repetitions, best is reported")
+	args = parser.parse_args(argv)
+
+	number = 20000
+	print(f"{'text_type':<10} {'dict ns':>9} {'table ns':>9} {'speedup':>8}")
+	for node in NODES:
+		assert text_node_to_html_node(node) == text_node_to_html_node_dict(node)
+		old = min(timeit.repeat(lambda: text_node_to_html_node_dict(node), number=number, repeat=args.repeat)) / number
+		new = min(timeit.repeat(lambda: text_node_to_html_node(node), number=number, repeat=args.repeat)) / number
+		print(f"{node.text_type:<10} {old * 1e9:>9.0f} {new * 1e9:>9.0f} {old / new:>7.2f}x")
+
+
+if __name__ == "__main__":
+	main()
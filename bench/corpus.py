@@ -0,0 +1,212 @@
+"""
+Deterministic synthetic site generator for the benchmarks.
+
+Writes a content/ tree of markdown pages, a static/ tree and a
+template.html into a directory, so the site can be built by main() like
+the real one. The same arguments always produce byte-identical files,
+which keeps benchmark results comparable across commits.
+
+usage: python bench/corpus.py DEST [--pages N] [--depth D] [--seed S] [--mix kind=weight ...]
+"""
+import argparse
+import os
+import random
+import shutil
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+WORDS = [
+	"middle", "earth", "ring", "hobbit", "shire", "elves", "dwarves", "wizard",
+	"river", "mountain", "tower", "forest", "king", "sword", "journey", "road",
+]
+
+# Relative frequency of every block kind in a page, the title excluded
+BLOCK_WEIGHTS = {
+	"paragraph": 8,
+	"heading": 2,
+	"unordered_list": 2,
+	"ordered_list": 1,
+	"code": 1,
+	"quote": 1,
+}
+
+TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title> {{ Title }} </title>
+    <link href="/index.css" rel="stylesheet">
+</head>
+<body>
+    <article>
+        {{ Content }}
+    </article>
+</body>
+</html>
+"""
+
+
+def words(rng: random.Random, count: int) -> str:
+	return " ".join(rng.choices(WORDS, k=count))
+
+
+def inline_text(rng: random.Random, count: int, urls: list[str]=("/",)) -> str:
+	"""
+	A run of words with bold, italic, code, links to urls and images mixed in.
+	"""
+	spans = []
+	for _ in range(count):
+		word = rng.choice(WORDS)
+		kind = rng.random()
+		if kind < 0.08:
+			spans.append(f"**{word}**")
+		elif kind < 0.16:
+			spans.append(f"*{word}*")
+		elif kind < 0.21:
+			spans.append(f"`{word}`")
+		elif kind < 0.27:
+			spans.append(f"[{word}]({rng.choice(urls)})")
+		elif kind < 0.29:
+			spans.append(f"![{word}](/images/{word}.png)")
+		else:
+			spans.append(word)
+	return " ".join(spans)
+
+
+def generate_block(rng: random.Random, kind: str, urls: list[str]=("/",)) -> str:
+	if kind == "heading":
+		return f"{'#' * rng.randint(2, 4)} {words(rng, rng.randint(2, 6)).capitalize()}"
+	if kind == "unordered_list":
+		return "\n".join(f"{rng.choice('*-')} {inline_text(rng, rng.randint(3, 10), urls)}" for _ in range(rng.randint(2, 6)))
+	if kind == "ordered_list":
+		return "\n".join(f"{i}. {inline_text(rng, rng.randint(3, 10), urls)}" for i in range(1, rng.randint(2, 6) + 1))
+	if kind == "code":
+		lines = [f"{rng.choice(WORDS)} = {rng.randint(0, 1000)}" for _ in range(rng.randint(2, 8))]
+		return "```\n" + "\n".join(lines) + "\n```"
+	if kind == "quote":
+		return "\n".join(f"> {words(rng, rng.randint(4, 12))}" for _ in range(rng.randint(1, 3)))
+	return inline_text(rng, rng.randint(20, 80), urls)
+
+
+def generate_page(
+		rng: random.Random,
+		weights: dict[str, int]=BLOCK_WEIGHTS,
+		blocks: tuple[int, int]=(10, 40),
+		urls: list[str]=("/",)) -> str:
+	"""
+	return:
+	* the markdown of one page: an h1 title followed by random blocks,
+	  linking to the given site urls
+	"""
+	kinds = list(weights)
+	chosen = rng.choices(kinds, weights=[weights[kind] for kind in kinds], k=rng.randint(*blocks))
+	page = [f"# {words(rng, rng.randint(2, 5)).title()}"]
+	page.extend(generate_block(rng, kind, urls) for kind in chosen)
+	return "\n\n".join(page) + "\n"
+
+
+def page_url(relative: str) -> str:
+	"""
+	The url a page path relative to content/ is built to, e.g.
+	"section1/page9.md" -> "/section1/page9.html".
+	"""
+	if relative == "index.md":
+		return "/"
+	return "/" + relative[:-len(".md")] + ".html"
+
+
+def page_paths(pages: int, depth: int, fanout: int=8) -> list[str]:
+	"""
+	Spread the pages over a tree of section directories at most depth
+	levels deep, fanout sections per level.
+
+	return:
+	* list of paths relative to content/
+	"""
+	paths = ["index.md"]
+	for i in range(1, pages):
+		parts = []
+		n = i
+		while n and len(parts) < depth:
+			parts.append(f"section{n % fanout}")
+			n //= fanout
+		paths.append("/".join(parts + [f"page{i}.md"]))
+	return paths
+
+
+def generate_site(dest: str, pages: int=1000, depth: int=3, seed: int=42, weights: dict[str, int]=BLOCK_WEIGHTS) -> list[str]:
+	"""
+	Write a synthetic site into dest, replacing any content/ and static/
+	already there.
+
+	parameters:
+	* dest: directory to write content/, static/ and template.html into
+	* pages: number of markdown pages
+	* depth: maximum nesting of content directories
+	* seed: random seed; the same seed gives the same site
+	* weights: relative frequency of every block kind
+
+	return:
+	* list of the generated markdown paths
+	"""
+	rng = random.Random(seed)
+	for name in ("content", "static"):
+		shutil.rmtree(os.path.join(dest, name), ignore_errors=True)
+
+	paths = []
+	relatives = page_paths(pages, depth)
+	# Links only point at pages of the corpus, so a build checking links finds none broken
+	urls = [page_url(relative) for relative in relatives]
+	for relative in relatives:
+		path = os.path.join(dest, "content", relative)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		with open(path, "w") as f:
+			f.write(generate_page(rng, weights, urls=urls))
+		paths.append(path)
+
+	os.makedirs(os.path.join(dest, "static", "images"))
+	shutil.copy(os.path.join(ROOT, "static", "index.css"), os.path.join(dest, "static", "index.css"))
+	for word in WORDS:
+		with open(os.path.join(dest, "static", "images", f"{word}.png"), "wb") as f:
+			f.write(rng.randbytes(512))
+	with open(os.path.join(dest, "template.html"), "w") as f:
+		f.write(TEMPLATE)
+	return paths
+
+
+def parse_mix(items: list[str]) -> dict[str, int]:
+	"""
+	Turn ["code=3", "quote=0"] into BLOCK_WEIGHTS with those weights replaced.
+	"""
+	weights = dict(BLOCK_WEIGHTS)
+	for item in items or []:
+		kind, _, weight = item.partition("=")
+		if kind not in weights:
+			raise ValueError(f"Unknown block kind {kind}, expected one of {', '.join(weights)}")
+		weights[kind] = int(weight)
+	return weights
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+	parser.add_argument("--pages", type=int, default=1000, help="number of pages (default: 1000)")
+	parser.add_argument("--depth", type=int, default=3, help="maximum directory nesting (default: 3)")
+	parser.add_argument("--seed", type=int, default=42, help="random seed (default: 42)")
+	parser.add_argument(
+		"--mix",
+		nargs="*",
+		metavar="KIND=WEIGHT",
+		help=f"block kind weights, out of {', '.join(f'{kind}={weight}' for kind, weight in BLOCK_WEIGHTS.items())}"
+	)
+
+
+def main(argv: list[str]=None):
+	parser = argparse.ArgumentParser(description="Write a deterministic synthetic site.")
+	parser.add_argument("dest", help="directory to write the site into")
+	add_arguments(parser)
+	args = parser.parse_args(argv)
+	paths = generate_site(args.dest, args.pages, args.depth, args.seed, parse_mix(args.mix))
+	print(f"Wrote {len(paths)} pages to {os.path.join(args.dest, 'content')}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,115 @@
+"""
+Load test: requests per second of the built-in dev server against the
+stdlib http.server that main.sh used to run, both serving the same
+directory.
+
+Each request opens its own connection, since http.server speaks
+HTTP/1.0 and would not reuse it anyway.
+
+usage: python bench/loadtest.py [--root public] [--requests N] [--concurrency C] [--path /]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+
+def free_port() -> int:
+	with socket.socket() as sock:
+		sock.bind(("127.0.0.1", 0))
+		return sock.getsockname()[1]
+
+
+def wait_for(port: int, timeout: float=10.0):
+	deadline = time.monotonic() + timeout
+	while time.monotonic() < deadline:
+		try:
+			socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+			return
+		except OSError:
+			time.sleep(0.05)
+	raise RuntimeError(f"Server on port {port} did not come up")
+
+
+async def fetch(port: int, path: str, accept_encoding: str) -> int:
+	reader, writer = await asyncio.open_connection("127.0.0.1", port)
+	writer.write(
+		f"GET {path} HTTP/1.1\r\nHost: localhost\r\nAccept-Encoding: {accept_encoding}\r\nConnection: close\r\n\r\n".encode()
+	)
+	await writer.drain()
+	response = await reader.read()
+	writer.close()
+	return int(response.split(b" ", 2)[1])
+
+
+async def load(port: int, path: str, requests: int, concurrency: int, accept_encoding: str) -> tuple[float, int]:
+	remaining = requests
+	errors = 0
+
+	async def client():
+		nonlocal remaining, errors
+		while remaining > 0:
+			remaining -= 1
+			try:
+				if await fetch(port, path, accept_encoding) != 200:
+					errors += 1
+			except OSError:
+				errors += 1
+
+	start = time.perf_counter()
+	await asyncio.gather(*(client() for _ in range(concurrency)))
+	return requests / (time.perf_counter() - start), errors
+
+
+def run(name: str, command: list[str], port: int, args) -> tuple[str, float, int]:
+	process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	try:
+		wait_for(port)
+		# Warm up caches before measuring
+		asyncio.run(load(port, args.path, min(100, args.requests), args.concurrency, args.accept_encoding))
+		rps, errors = asyncio.run(load(port, args.path, args.requests, args.concurrency, args.accept_encoding))
+	finally:
+		process.terminate()
+		process.wait()
+	return name, rps, errors
+
+
+def main(argv: list[str]=None):
+	parser = argparse.ArgumentParser(description="Compare requests/s of the dev server and http.server.")
+	parser.add_argument("--root", default="public", help="directory to serve (default: public)")
+	parser.add_argument("--path", default="/", help="request path (default: /)")
+	parser.add_argument("--requests", type=int, default=2000, help="requests per server")
+	parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients")
+	parser.add_argument("--accept-encoding", default="identity", help="Accept-Encoding header to send")
+	args = parser.parse_args(argv)
+
+	root = os.path.abspath(args.root)
+	dev_port, stdlib_port = free_port(), free_port()
+	results = [
+		run(
+			"dev server",
+			[sys.executable, "-c", f"import sys; sys.path.insert(0, {SRC!r}); from server import serve; serve({root!r}, port={dev_port})"],
+			dev_port,
+			args
+		),
+		run(
+			"http.server",
+			[sys.executable, "-m", "http.server", str(stdlib_port), "--bind", "127.0.0.1", "--directory", root],
+			stdlib_port,
+			args
+		),
+	]
+
+	print(f"{args.requests} requests of {args.path}, {args.concurrency} concurrent clients")
+	print(f"{'server':<12} {'req/s':>9} {'errors':>7}")
+	for name, rps, errors in results:
+		print(f"{name:<12} {rps:>9.0f} {errors:>7}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,155 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest import BuildManifest, hash_file
+
+
+class SyncResult:
+	"""
+	What sync_tree did to every file it mirrored.
+	"""
+
+	def __init__(self):
+		self.copied = []
+		self.linked = []
+		self.unchanged = []
+
+	def __repr__(self) -> str:
+		return f"SyncResult(copied={len(self.copied)}, linked={len(self.linked)}, unchanged={len(self.unchanged)})"
+
+
+def sync_tree(
+		src: str,
+		dst: str,
+		manifest: BuildManifest=None,
+		checksum: bool=False,
+		hardlink: bool=False,
+		workers: int=None) -> SyncResult:
+	"""
+	Mirror the files of src into dst, touching only what changed.
+
+	A file is considered unchanged when the output has the same size and
+	modification time as the source (copies keep the source's mtime), or
+	when both are the same inode. With checksum=True the mtime is ignored
+	and equal-size files are compared by content hash instead, which is
+	what you want after a fresh checkout resets every mtime.
+
+	Changed files are copied with os.copy_file_range when src and dst are
+	on the same filesystem, which lets the kernel reflink them on
+	filesystems that support it; with hardlink=True they are hardlinked
+	instead. Copies run on a thread pool.
+
+	Every mirrored file is recorded in the manifest, so files whose
+	source is gone are removed by manifest.remove_stale() at the end of
+	the build. Without a manifest nothing is ever deleted, since dst
+	also holds the generated pages.
+
+	parameters:
+	* src: A relative path from the root of the project.
+	* dst: A relative path from the root of the project.
+	* manifest: the build manifest to record the mirrored files in
+	* checksum: compare content hashes instead of modification times
+	* hardlink: hardlink instead of copy when on the same filesystem
+	* workers: number of copy threads (ThreadPoolExecutor default if None)
+	"""
+	root = os.path.abspath(".")
+	src_root = os.path.join(root, src)
+	dst_root = os.path.join(root, dst)
+	os.makedirs(dst_root, exist_ok=True)
+	same_fs = os.stat(src_root).st_dev == os.stat(dst_root).st_dev
+
+	files = list(_walk(src_root, dst_root))
+	with ThreadPoolExecutor(max_workers=workers) as executor:
+		actions = list(executor.map(
+			lambda item: sync_file(item[0], item[1], item[2], checksum, hardlink and same_fs, same_fs),
+			files
+		))
+
+	result = SyncResult()
+	for (src_path, _, dst_path), (action, content_hash) in zip(files, actions):
+		getattr(result, action).append(dst_path)
+		if manifest is not None:
+			manifest.record_asset(src_path, dst_path, content_hash)
+	return result
+
+
+def _walk(src_root: str, dst_root: str):
+	"""
+	Yield (src_path, src_stat, dst_path) for every file below src_root and
+	create the matching directories below dst_root.
+	"""
+	with os.scandir(src_root) as entries:
+		for entry in entries:
+			dst_path = os.path.join(dst_root, entry.name)
+			if entry.is_dir():
+				os.makedirs(dst_path, exist_ok=True)
+				yield from _walk(entry.path, dst_path)
+			else:
+				yield entry.path, entry.stat(), dst_path
+
+
+def sync_file(
+		src_path: str,
+		src_stat: os.stat_result,
+		dst_path: str,
+		checksum: bool=False,
+		hardlink: bool=False,
+		same_fs: bool=False) -> tuple[str, str]:
+	"""
+	Bring one output file up to date with its source.
+
+	return:
+	* (action, content hash or None), action being "copied", "linked" or "unchanged"
+	"""
+	try:
+		dst_stat = os.stat(dst_path)
+	except FileNotFoundError:
+		dst_stat = None
+
+	content_hash = None
+	if dst_stat is not None:
+		if (dst_stat.st_ino, dst_stat.st_dev) == (src_stat.st_ino, src_stat.st_dev):
+			return "unchanged", None
+		if dst_stat.st_size == src_stat.st_size:
+			if not checksum and dst_stat.st_mtime_ns == src_stat.st_mtime_ns:
+				return "unchanged", None
+			if checksum:
+				content_hash = hash_file(src_path)
+				if content_hash == hash_file(dst_path):
+					if dst_stat.st_mtime_ns != src_stat.st_mtime_ns:
+						os.utime(dst_path, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+					return "unchanged", content_hash
+
+	# Write next to the output and rename, so a half-written file is
+	# never visible under the real name.
+	tmp_path = f"{dst_path}.tmp{os.getpid()}"
+	if hardlink:
+		os.link(src_path, tmp_path)
+		os.replace(tmp_path, dst_path)
+		return "linked", content_hash
+
+	copy_file(src_path, tmp_path, same_fs)
+	shutil.copystat(src_path, tmp_path)
+	os.replace(tmp_path, dst_path)
+	return "copied", content_hash
+
+
+def copy_file(src_path: str, dst_path: str, same_fs: bool=False):
+	"""
+	Copy file contents, in the kernel with copy_file_range when possible.
+	"""
+	if same_fs and hasattr(os, "copy_file_range"):
+		try:
+			with open(src_path, "rb") as fsrc, open(dst_path, "wb") as fdst:
+				remaining = os.fstat(fsrc.fileno()).st_size
+				while remaining > 0:
+					copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+					if copied == 0:
+						break
+					remaining -= copied
+			return
+		except OSError:
+			# Not supported by this kernel or filesystem
+			pass
+	shutil.copyfile(src_path, dst_path)
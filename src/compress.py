@@ -0,0 +1,136 @@
+import gzip
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from manifest import BuildManifest
+
+try:
+	# Python 3.14+
+	from compression import zstd
+except ImportError:
+	zstd = None
+
+# Smaller files gain nothing from compression
+MIN_SIZE = 256
+
+COMPRESSIBLE_EXTENSIONS = {".html", ".css", ".js", ".mjs", ".json", ".xml", ".svg", ".txt", ".map", ".md"}
+
+# Content-Encoding -> (sibling suffix, compress function)
+FORMATS = {"gzip": (".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))}
+if zstd is not None:
+	FORMATS["zstd"] = (".zst", lambda data: zstd.compress(data, level=19))
+
+SIBLING_SUFFIXES = tuple(suffix for suffix, _ in FORMATS.values())
+
+
+def is_compressible(path: str) -> bool:
+	return os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+def compress_file(path: str, encodings: list[str]) -> tuple[str, int, dict[str, int]]:
+	"""
+	Write the requested compressed siblings of path. A sibling that would
+	not be smaller than the original is removed instead of written.
+
+	return:
+	* (path, original size, dict of encoding to sibling size)
+	"""
+	with open(path, "rb") as f:
+		data = f.read()
+	sizes = {}
+	for encoding in encodings:
+		suffix, compress = FORMATS[encoding]
+		compressed = compress(data)
+		if len(compressed) >= len(data):
+			if os.path.exists(path + suffix):
+				os.remove(path + suffix)
+			continue
+		tmp_path = f"{path}{suffix}.tmp"
+		with open(tmp_path, "wb") as f:
+			f.write(compressed)
+		os.replace(tmp_path, path + suffix)
+		sizes[encoding] = len(compressed)
+	return path, len(data), sizes
+
+
+def compress_outputs(manifest: BuildManifest, jobs: int=1) -> dict[str, dict]:
+	"""
+	Precompress every compressible output of the current build.
+
+	Each sibling is recorded in the manifest with the output as its
+	source, so it is only recompressed when the output's content hash
+	changed, and it is removed with the other stale outputs once the
+	output itself is gone. So is a sibling that was not written because
+	it would not have been smaller. With jobs > 1 the compression runs
+	across a ProcessPoolExecutor.
+
+	return:
+	* dict of output path to {"size": ..., "<encoding>": size, "<encoding>_ratio": ...}
+	"""
+	outputs = sorted(
+		path for path in manifest.seen
+		if is_compressible(path)
+		and not path.endswith(SIBLING_SUFFIXES)
+		and os.path.getsize(path) >= MIN_SIZE
+	)
+
+	results = {}
+	tasks = []
+	for path in outputs:
+		stale = [
+			encoding for encoding, (suffix, _) in FORMATS.items()
+			if not manifest.is_fresh(path, path + suffix)
+		]
+		if stale:
+			tasks.append((path, stale))
+		results[path] = _sizes(path)
+
+	if jobs > 1 and len(tasks) > 1:
+		with ProcessPoolExecutor(max_workers=jobs) as executor:
+			done = list(executor.map(compress_file, *zip(*tasks)))
+	else:
+		done = [compress_file(path, encodings) for path, encodings in tasks]
+
+	for (path, encodings), (_, _, sizes) in zip(tasks, done):
+		_record_siblings(manifest, path, encodings, sizes)
+		results[path] = _sizes(path)
+	return results
+
+
+def recompress(manifest: BuildManifest, path: str) -> list[str]:
+	"""
+	Bring the siblings of a single, just rewritten output up to date.
+	Used by watch mode, which rebuilds one output at a time.
+
+	return:
+	* list of siblings written or removed
+	"""
+	siblings = [path + suffix for suffix in SIBLING_SUFFIXES]
+	if not is_compressible(path) or path.endswith(SIBLING_SUFFIXES):
+		return []
+	if not os.path.exists(path) or os.path.getsize(path) < MIN_SIZE:
+		return [sibling for sibling in siblings if manifest.remove_output(sibling)]
+	# path was hashed before it was rewritten; the siblings record its new hash
+	manifest.file_hash(path, refresh=True)
+	_, _, sizes = compress_file(path, list(FORMATS))
+	_record_siblings(manifest, path, list(FORMATS), sizes)
+	return siblings
+
+def _record_siblings(manifest: BuildManifest, path: str, encodings: list[str], sizes: dict[str, int]):
+	for encoding in encodings:
+		sibling = path + FORMATS[encoding][0]
+		if encoding in sizes:
+			manifest.record(path, sibling)
+		else:
+			# Not smaller than path: remembered, so it is not tried again
+			# until path changes
+			manifest.record_skipped(path, sibling)
+
+def _sizes(path: str) -> dict:
+	size = os.path.getsize(path)
+	entry = {"size": size}
+	for encoding, (suffix, _) in FORMATS.items():
+		if os.path.exists(path + suffix):
+			entry[encoding] = os.path.getsize(path + suffix)
+			entry[f"{encoding}_ratio"] = round(entry[encoding] / size, 3) if size else 1.0
+	return entry
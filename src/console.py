@@ -0,0 +1,128 @@
+import sys
+import time
+
+QUIET = 0
+NORMAL = 1
+VERBOSE = 2
+
+
+class Console:
+	"""
+	Leveled, buffered output of the build.
+
+	* QUIET: errors only
+	* NORMAL: a progress line on terminals and the summary at the end
+	* VERBOSE: also one line per page and per file touched
+
+	Lines below the current level cost one comparison and are never
+	formatted. Verbose lines are collected and written in batches, and the
+	progress line is redrawn at most every refresh seconds, so the page
+	loop does no I/O of its own at the default level.
+
+	Example:
+	console.configure(VERBOSE)
+	console.debug("Generating page from %s to %s", from_path, dest_path)
+	console.progress("pages", 10, 200)
+	console.count("pages rendered", 200)
+	console.summary()
+	# Done in 0.42s: 200 pages rendered
+	"""
+
+	def __init__(self, level: int=NORMAL, stream=None, batch_size: int=256, refresh: float=0.1):
+		self.configure(level, stream)
+		self.batch_size = batch_size
+		self.refresh = refresh
+		self.buffer = []
+		self.counters = {}
+		self.start = time.perf_counter()
+		self._progress_shown = False
+		self._progress_time = 0.0
+
+	def configure(self, level: int=NORMAL, stream=None):
+		self.level = level
+		self.stream = stream
+
+	def _stream(self):
+		# Looked up on every write so redirected stdout (e.g. by tests) is honoured
+		return self.stream if self.stream is not None else sys.stdout
+
+	def debug(self, message: str, *args):
+		"""
+		Buffer a verbose line; message is %-formatted with args only when shown.
+		"""
+		if self.level < VERBOSE:
+			return
+		self.buffer.append((message % args if args else message) + "\n")
+		if len(self.buffer) >= self.batch_size:
+			self.flush()
+
+	def info(self, message: str, *args):
+		"""
+		Write a line shown at the normal level, e.g. the start of a watch.
+		"""
+		if self.level < NORMAL:
+			return
+		self.buffer.append((message % args if args else message) + "\n")
+		self.flush()
+
+	def error(self, message: str, *args):
+		"""
+		Write a line to stderr at every level.
+		"""
+		self.flush()
+		sys.stderr.write((message % args if args else message) + "\n")
+		sys.stderr.flush()
+
+	def count(self, name: str, n: int=1):
+		"""
+		Add n to a counter of the end summary.
+		"""
+		self.counters[name] = self.counters.get(name, 0) + n
+
+	def progress(self, label: str, done: int, total: int):
+		"""
+		Redraw the progress line, on terminals only and at most every
+		refresh seconds (and once more when done reaches total).
+		"""
+		if self.level < NORMAL:
+			return
+		now = time.perf_counter()
+		if done < total and now - self._progress_time < self.refresh:
+			return
+		self._progress_time = now
+		stream = self._stream()
+		# The progress line only makes sense where it can be redrawn
+		if not stream.isatty():
+			return
+		self.flush()
+		stream.write(f"\r\x1b[K{label}: {done}/{total}")
+		stream.flush()
+		self._progress_shown = True
+
+	def flush(self):
+		stream = self._stream()
+		if self._progress_shown:
+			# Clear the progress line before anything else is written over it
+			stream.write("\r\x1b[K")
+			self._progress_shown = False
+		if self.buffer:
+			stream.write("".join(self.buffer))
+			self.buffer = []
+		stream.flush()
+
+	def summary(self):
+		"""
+		Write the counters collected since the last reset() and the time it took.
+		"""
+		elapsed = time.perf_counter() - self.start
+		counters = ", ".join(f"{n} {name}" for name, n in self.counters.items() if n)
+		self.info(f"Done in {elapsed:.2f}s" + (f": {counters}" if counters else ""))
+
+	def reset(self):
+		self.flush()
+		self.counters = {}
+		self.start = time.perf_counter()
+
+
+# The console of this process; main() configures it from the command line
+console = Console()
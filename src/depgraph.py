@@ -0,0 +1,289 @@
+import contextlib
+import heapq
+import json
+import os
+
+import utils
+from images import image_key
+from listings import entry_url
+from manifest import hash_file
+from pageindex import PageIndex
+
+DEPGRAPH_PATH = ".build/deps.json"
+DEPGRAPH_VERSION = 2
+
+# The DependencyGraph of the running build, or None. generate_page
+# records into it while pages render.
+active = None
+
+
+def normalize_url(url: str) -> str:
+	"""
+	The form page urls are looked up by: no query or fragment, no
+	index.html and no trailing slash, so "/majesty", "/majesty/" and
+	"/majesty/index.html#top" all name the same page.
+	"""
+	url = url.split("#", 1)[0].split("?", 1)[0]
+	if url.endswith("/index.html") or url == "index.html":
+		url = url[:-len("index.html")]
+	return url.rstrip("/") or "/"
+
+
+class DependencyGraph:
+	"""
+	What every page was rendered from besides its own markdown, kept
+	between builds:
+
+	* ("template", path): the template it was rendered with
+	* ("include", path): every file included into it, at any depth
+	* ("page", url): every site url it links to without a link text, as
+	  [](/majesty), which shows the title of the page at that url
+	* ("image", path): every image of the site it shows, with the size
+	  and variants found by the ImageIndex in images
+
+	Each dependency is stored with the fingerprint it had when the page
+	was rendered: the hash of a file, the title of the page at a url
+	(None while there is none), the size and variants of an image. A page is stale once any of them
+	differs, so changing, adding or removing one source rebuilds exactly
+	the pages that show something of it.
+
+	Example deps.json:
+	{
+		"version": 2,
+		"pages": {
+			"content/index.md": [
+				["template", "template.html", "3f1c..."],
+				["include", "includes/footer.md", "9ab2..."],
+				["page", "/majesty", "The Unparalleled Majesty"],
+				["image", "images/rivendell.png", "1600x900 480,960"]
+			]
+		}
+	}
+	"""
+
+	def __init__(self, path: str=DEPGRAPH_PATH):
+		self.path = path
+		self.pages = {}
+		# Source -> list of (kind, target) recorded by this process, or
+		# None outside of a build. Filled by record().
+		self.collecting = None
+		# Normalized url -> source, and source -> title, from bind()
+		self.urls = {}
+		self.titles = {}
+		# The images.ImageIndex of the build, or None when image sizes are not shown
+		self.images = None
+		self._hashes = {}
+
+	@classmethod
+	def load(cls, path: str=DEPGRAPH_PATH) -> "DependencyGraph":
+		graph = cls(path)
+		if not os.path.exists(path):
+			return graph
+		with open(path, "r") as f:
+			try:
+				data = json.load(f)
+			except json.JSONDecodeError:
+				return graph
+		if data.get("version") == DEPGRAPH_VERSION:
+			graph.pages = data.get("pages", {})
+		return graph
+
+	def save(self):
+		directory = os.path.dirname(self.path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		tmp_path = f"{self.path}.tmp"
+		with open(tmp_path, "w") as f:
+			json.dump({"version": DEPGRAPH_VERSION, "pages": self.pages}, f, indent=1, sort_keys=True)
+		os.replace(tmp_path, self.path)
+
+	def __getstate__(self) -> dict:
+		# Worker processes resolve titles and fingerprints, but record
+		# into a graph of their own
+		return {**self.__dict__, "pages": {}, "collecting": None}
+
+	def bind(self, index: PageIndex, dest_dir: str="public"):
+		"""
+		Resolve urls and titles from the page index of this build, and
+		forget the file hashes of the last one.
+		"""
+		self.urls = {}
+		self.titles = {}
+		self._hashes = {}
+		for entry in index.pages.values():
+			self.set_page(entry["source"], entry_url(entry, dest_dir), entry["title"])
+
+	def set_page(self, source: str, url: str, title: str):
+		self.urls[normalize_url(url)] = source
+		self.titles[source] = title
+
+	def remove_page(self, source: str):
+		"""
+		Forget a page that was deleted, so pages linking to it go stale.
+		"""
+		source = os.path.relpath(source)
+		self.pages.pop(source, None)
+		self.titles.pop(source, None)
+		self.urls = {url: value for url, value in self.urls.items() if value != source}
+
+	def link_title(self, url: str) -> tuple[str, str]:
+		"""
+		utils.link_title while this graph is bound.
+
+		return:
+		* (normalized url, title of the page there or None) for site urls
+		* None for external urls
+		"""
+		if not url.startswith("/"):
+			return None
+		url = normalize_url(url)
+		return url, self.title(url)
+
+	def image_attributes(self, url: str) -> tuple[str, dict]:
+		"""
+		utils.image_attributes while this graph is bound.
+
+		return:
+		* (path below the output directory, img attributes from images,
+		  {} if none) for site urls
+		* None for other urls
+		"""
+		key = image_key(url)
+		if key is None:
+			return None
+		return key, self.images.attributes(key) if self.images is not None else {}
+
+	def title(self, url: str) -> str:
+		source = self.urls.get(url)
+		return self.titles.get(source) if source is not None else None
+
+	def fingerprint(self, kind: str, target: str) -> str:
+		"""
+		return:
+		* the current state of a dependency, or None if it is gone
+		"""
+		if kind == "page":
+			return self.title(target)
+		if kind == "image":
+			return self.images.fingerprint(target) if self.images is not None else None
+		if target not in self._hashes:
+			self._hashes[target] = hash_file(target) if os.path.isfile(target) else None
+		return self._hashes[target]
+
+	def fingerprints(self, dependencies) -> list[list[str]]:
+		"""
+		return:
+		* list of [kind, target, fingerprint] of the distinct (kind, target) pairs
+		"""
+		return [[kind, target, self.fingerprint(kind, target)] for kind, target in dict.fromkeys(map(tuple, dependencies))]
+
+	def forget(self, paths):
+		"""
+		Drop the file hashes of paths that changed since they were taken.
+		"""
+		for path in paths:
+			self._hashes.pop(path, None)
+
+	def is_fresh(self, dependencies: list[list[str]]) -> bool:
+		"""
+		return:
+		* whether every (kind, target, fingerprint) still has its fingerprint
+		"""
+		return all(self.fingerprint(kind, target) == fingerprint for kind, target, fingerprint in dependencies)
+
+	def get(self, source: str) -> list[list[str]]:
+		"""
+		return:
+		* the dependencies recorded for a page, None if it was never rendered
+		"""
+		return self.pages.get(os.path.relpath(source))
+
+	def targets(self, kind: str) -> set[str]:
+		"""
+		return:
+		* every target of the given kind that some page depends on
+		"""
+		return {target for dependencies in self.pages.values() for other, target, _ in dependencies if other == kind}
+
+	def is_stale(self, source: str) -> bool:
+		"""
+		return:
+		* whether a dependency of the page changed since it was rendered
+		  (False for pages never rendered; the manifest covers those)
+		"""
+		dependencies = self.get(source)
+		return dependencies is not None and not self.is_fresh(dependencies)
+
+	@contextlib.contextmanager
+	def record(self, from_path: str):
+		"""
+		Record the dependencies of from_path into collecting while the
+		body inside the with statement renders it. The yielded list holds
+		every (kind, target) reported so far, repeats included; the
+		renderer adds the template itself.
+		"""
+		dependencies = []
+		utils.dependency_sink = lambda kind, target: dependencies.append((kind, target))
+		utils.link_title = self.link_title
+		utils.image_attributes = self.image_attributes
+		try:
+			yield dependencies
+		finally:
+			utils.dependency_sink = None
+			utils.link_title = None
+			utils.image_attributes = None
+		self.collecting[os.path.relpath(from_path)] = list(dict.fromkeys(dependencies))
+
+	def update(self, collected: dict):
+		"""
+		Store what record() collected, with the current fingerprints.
+		"""
+		for source, dependencies in collected.items():
+			self.pages[source] = self.fingerprints(dependencies)
+
+	def keep(self, sources):
+		"""
+		Forget every page not in sources.
+		"""
+		keys = {os.path.relpath(source) for source in sources}
+		self.pages = {key: value for key, value in self.pages.items() if key in keys}
+
+	def order(self, pages: list[tuple[str, str]]) -> list[tuple[str, str]]:
+		"""
+		Sort work items so that a page comes after the pages whose titles
+		it shows, where both are in pages. Pages linking each other in a
+		cycle keep their given order.
+		"""
+		keys = [os.path.relpath(from_path) for from_path, _ in pages]
+		position = {key: i for i, key in enumerate(keys)}
+		waiting = {}
+		blocking = {key: [] for key in position}
+		for key in position:
+			targets = {
+				self.urls.get(target) for kind, target, _ in self.pages.get(key, ())
+				if kind == "page"
+			}
+			targets = {target for target in targets if target in position and target != key}
+			waiting[key] = len(targets)
+			for target in targets:
+				blocking[target].append(key)
+
+		ordered = []
+		ready = [i for key, i in position.items() if waiting[key] == 0]
+		heapq.heapify(ready)
+		done = set()
+		while len(ordered) < len(pages):
+			if not ready:
+				# A cycle: release its first page
+				ready = [min(i for key, i in position.items() if key not in done)]
+			i = heapq.heappop(ready)
+			key = keys[i]
+			if key in done:
+				continue
+			done.add(key)
+			ordered.append(pages[i])
+			for dependent in blocking[key]:
+				waiting[dependent] -= 1
+				if waiting[dependent] == 0 and dependent not in done:
+					heapq.heappush(ready, position[dependent])
+		return ordered
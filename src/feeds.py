@@ -0,0 +1,302 @@
+import contextlib
+import datetime
+import json
+import os
+import re
+from xml.sax.saxutils import escape, quoteattr
+
+import utils
+from console import console
+from listings import entry_url
+
+TEXT_CACHE_PATH = ".build/text.json"
+TEXT_CACHE_VERSION = 1
+
+SEARCH_INDEX_VERSION = 1
+SUMMARY_LENGTH = 200
+FEED_ENTRIES = 20
+
+WORD_RE = re.compile(r"\w+")
+
+# Source path -> PageText.to_dict() of the pages rendered by this process,
+# or None when no search index or feed is being built. generate_page
+# fills it while pages render.
+collecting = None
+
+
+class PageText:
+	"""
+	The words and the opening text of one page, collected from the
+	TextNodes the page's blocks are converted from (see utils.text_sink).
+	"""
+	__slots__ = ("terms", "summary", "summary_length")
+
+	def __init__(self):
+		self.terms = set()
+		self.summary = []
+		self.summary_length = 0
+
+	def add_nodes(self, nodes: list):
+		text = "".join(node.text for node in nodes)
+		self.terms.update(WORD_RE.findall(text.lower()))
+		if self.summary_length < SUMMARY_LENGTH and text.strip():
+			self.summary.append(text)
+			self.summary_length += len(text)
+
+	def to_dict(self) -> dict:
+		summary = " ".join(" ".join(self.summary).split())
+		if len(summary) > SUMMARY_LENGTH:
+			summary = summary[:SUMMARY_LENGTH].rsplit(" ", 1)[0] + "…"
+		return {"terms": sorted(self.terms), "summary": summary}
+
+
+@contextlib.contextmanager
+def collect(from_path: str):
+	"""
+	Collect the PageText of from_path into collecting while the body
+	inside the with statement converts it.
+	"""
+	page_text = PageText()
+	utils.text_sink = page_text.add_nodes
+	try:
+		yield page_text
+	finally:
+		utils.text_sink = None
+	collecting[os.path.relpath(from_path)] = page_text.to_dict()
+
+
+class TextCache:
+	"""
+	The PageText of every page, kept between builds so the search index
+	and feed can include pages that were not re-rendered.
+	Entries are keyed by source path and carry the source hash they were
+	collected from.
+	"""
+
+	def __init__(self, path: str=TEXT_CACHE_PATH):
+		self.path = path
+		self.pages = {}
+
+	@classmethod
+	def load(cls, path: str=TEXT_CACHE_PATH) -> "TextCache":
+		cache = cls(path)
+		if not os.path.exists(path):
+			return cache
+		with open(path, "r") as f:
+			try:
+				data = json.load(f)
+			except json.JSONDecodeError:
+				return cache
+		if data.get("version") == TEXT_CACHE_VERSION:
+			cache.pages = data.get("pages", {})
+		return cache
+
+	def save(self):
+		directory = os.path.dirname(self.path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		tmp_path = f"{self.path}.tmp"
+		with open(tmp_path, "w") as f:
+			json.dump({"version": TEXT_CACHE_VERSION, "pages": self.pages}, f, separators=(",", ":"))
+		os.replace(tmp_path, self.path)
+
+	def get(self, source: str, source_hash: str) -> dict:
+		entry = self.pages.get(os.path.relpath(source))
+		if entry is None or entry["hash"] != source_hash:
+			return None
+		return entry
+
+	def put(self, source: str, source_hash: str, text: dict):
+		self.pages[os.path.relpath(source)] = {**text, "hash": source_hash}
+
+	def keep(self, sources):
+		"""
+		Forget every page not in sources.
+		"""
+		keys = {os.path.relpath(source) for source in sources}
+		self.pages = {key: entry for key, entry in self.pages.items() if key in keys}
+
+
+def rfc3339(date: str) -> str:
+	"""
+	Normalize a front matter date to the RFC 3339 timestamp in UTC that
+	Atom wants. A date without a time is taken as midnight, and a time
+	without an offset as UTC.
+
+	Example:
+	rfc3339("2024-06-10")  # "2024-06-10T00:00:00Z"
+	rfc3339("2024-06-10 14:30+02:00")  # "2024-06-10T12:30:00Z"
+
+	return:
+	* the timestamp, or None if date is not an ISO 8601 date
+	"""
+	try:
+		moment = datetime.datetime.fromisoformat(date)
+	except (TypeError, ValueError):
+		return None
+	if moment.tzinfo is not None:
+		moment = moment.astimezone(datetime.timezone.utc)
+	return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class AtomicWriter:
+	"""
+	A text file written next to its destination and renamed into place
+	on close(), so readers never see a half-written feed.
+	"""
+
+	def __init__(self, path: str):
+		self.path = path
+		os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+		self.out = open(f"{path}.tmp", "w", encoding="utf-8")
+
+	def close(self):
+		self.out.close()
+		os.replace(f"{self.path}.tmp", self.path)
+
+
+class SitemapWriter(AtomicWriter):
+	"""
+	sitemap.xml, written one <url> at a time.
+	"""
+
+	def __init__(self, path: str, base_url: str):
+		super().__init__(path)
+		self.base_url = base_url.rstrip("/")
+		self.out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+		self.out.write('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+
+	def add(self, url: str, lastmod: str=None):
+		lastmod = f"<lastmod>{escape(lastmod)}</lastmod>" if lastmod else ""
+		self.out.write(f"<url><loc>{escape(self.base_url + url)}</loc>{lastmod}</url>\n")
+
+	def close(self):
+		self.out.write("</urlset>\n")
+		super().close()
+
+
+class AtomWriter(AtomicWriter):
+	"""
+	An Atom feed of the newest max_entries dated pages. Pages must be
+	added newest first (as PageIndex.published() returns them); each is
+	written as it is added and the rest are ignored. The feed names
+	author as the author of every entry, or title when there is none.
+	"""
+
+	def __init__(self, path: str, base_url: str, title: str, max_entries: int=FEED_ENTRIES, author: str=None):
+		super().__init__(path)
+		self.base_url = base_url.rstrip("/")
+		self.max_entries = max_entries
+		self.entries = 0
+		self.title = title
+		self.author = author or title
+		self.feed_url = self.base_url + "/" + os.path.basename(path)
+
+	def add(self, url: str, title: str, updated: str, summary: str):
+		"""
+		parameters:
+		* updated: RFC 3339 timestamp of the page (see rfc3339), None for
+		  pages without a date, which are left out
+		"""
+		if self.entries >= self.max_entries or not updated:
+			return
+		if self.entries == 0:
+			# The newest entry dates the feed
+			self.out.write('<?xml version="1.0" encoding="utf-8"?>\n')
+			self.out.write('<feed xmlns="http://www.w3.org/2005/Atom">\n')
+			self._write_head(updated)
+		link = escape(self.base_url + url)
+		self.out.write(
+			f"<entry><title>{escape(title)}</title><link href={quoteattr(self.base_url + url)}/>"
+			f"<id>{link}</id><updated>{updated}</updated><summary>{escape(summary)}</summary></entry>\n"
+		)
+		self.entries += 1
+
+	def _write_head(self, updated: str):
+		self.out.write(
+			f"<title>{escape(self.title)}</title><link href={quoteattr(self.base_url + '/')}/>"
+			f"<link rel=\"self\" href={quoteattr(self.feed_url)}/><id>{escape(self.base_url + '/')}</id>"
+			f"<updated>{updated}</updated><author><name>{escape(self.author)}</name></author>\n"
+		)
+
+	def close(self):
+		if self.entries == 0:
+			self.out.write('<?xml version="1.0" encoding="utf-8"?>\n')
+			self.out.write('<feed xmlns="http://www.w3.org/2005/Atom">\n')
+			self._write_head("1970-01-01T00:00:00Z")
+		self.out.write("</feed>\n")
+		super().close()
+
+
+class SearchIndexWriter(AtomicWriter):
+	"""
+	A client-side search index: every page gets an integer id in the
+	order it is added, and every term maps to the ascending list of ids
+	of the pages containing it.
+
+	Example search.json:
+	{"version":1,"docs":[["/","Home"],["/majesty/","Majesty"]],"terms":{"ring":[0,1],"tolkien":[1]}}
+	"""
+
+	def __init__(self, path: str):
+		super().__init__(path)
+		self.docs = []
+		self.postings = {}
+
+	def add(self, url: str, title: str, terms: list[str]):
+		doc_id = len(self.docs)
+		self.docs.append([url, title])
+		for term in terms:
+			self.postings.setdefault(term, []).append(doc_id)
+
+	def close(self):
+		dump = lambda value: json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+		self.out.write(f'{{"version":{SEARCH_INDEX_VERSION},"docs":{dump(self.docs)},"terms":{{')
+		for i, term in enumerate(sorted(self.postings)):
+			self.out.write(f'{"," if i else ""}{dump(term)}:{dump(self.postings[term])}')
+		self.out.write("}}\n")
+		super().close()
+
+
+def default_title(index, content_dir: str="content") -> str:
+	"""
+	The title of the site when none is given: that of its home page.
+	"""
+	home = index.get(os.path.join(content_dir, "index.md"))
+	return home["title"] if home is not None and home["title"] else "Site"
+
+
+def write_feeds(index, cache: TextCache, base_url: str, title: str, dest_dir: str="public", author: str=None) -> list[str]:
+	"""
+	Write sitemap.xml, atom.xml and search.json into dest_dir, feeding
+	the three writers one published page at a time, newest first.
+	Everything comes from the page index and the text cache; no markdown
+	is read. This runs once the pages are generated rather than from the
+	generate_page loop: an incremental build renders only the changed
+	pages, in source order, while the feed wants every published page
+	newest first. A page whose date is not an ISO 8601 date is reported and
+	left out of the feed.
+
+	return:
+	* list of the written paths
+	"""
+	sitemap = SitemapWriter(os.path.join(dest_dir, "sitemap.xml"), base_url)
+	atom = AtomWriter(os.path.join(dest_dir, "atom.xml"), base_url, title, author=author)
+	search = SearchIndexWriter(os.path.join(dest_dir, "search.json"))
+	for entry in index.published():
+		url = entry_url(entry, dest_dir)
+		page_title = entry["title"] or entry["source"]
+		text = cache.pages.get(entry["source"], {"terms": [], "summary": ""})
+		terms = set(text["terms"])
+		terms.update(WORD_RE.findall(page_title.lower()))
+		# The opening text usually starts with the page's own h1
+		summary = text["summary"].removeprefix(page_title).lstrip()
+		updated = rfc3339(entry["date"]) if entry["date"] else None
+		if entry["date"] and updated is None:
+			console.error("%s: date %r is not an ISO 8601 date, left out of the feed", entry["source"], entry["date"])
+		sitemap.add(url, updated)
+		atom.add(url, page_title, updated, summary)
+		search.add(url, page_title, sorted(terms))
+	for writer in (sitemap, atom, search):
+		writer.close()
+	return [sitemap.path, atom.path, search.path]
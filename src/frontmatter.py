@@ -0,0 +1,146 @@
+FENCE = b"---"
+
+
+def parse_value(text: str):
+	"""
+	Parse one scalar or [inline, list] value of the YAML subset we accept.
+	"""
+	text = text.strip()
+	if not text:
+		return None
+	if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+		return text[1:-1]
+	if text.startswith("[") and text.endswith("]"):
+		return [parse_value(item) for item in text[1:-1].split(",") if item.strip()]
+	lowered = text.lower()
+	if lowered in ("true", "yes"):
+		return True
+	if lowered in ("false", "no"):
+		return False
+	return text
+
+
+def parse_front_matter(lines: list[str]) -> dict:
+	"""
+	Parse the lines between the --- fences of a page.
+
+	Only a small subset of YAML is understood: one "key: value" per line,
+	quoted strings, true/false, inline [a, b] lists and block lists of
+	"- item" lines below an empty "key:". Lines starting with # are
+	comments.
+
+	Example:
+	parse_front_matter(["title: Hello", "tags: [tolkien, books]", "draft: false"])
+	# {"title": "Hello", "tags": ["tolkien", "books"], "draft": False}
+	"""
+	meta = {}
+	key = None
+	for line in lines:
+		stripped = line.strip()
+		if not stripped or stripped.startswith("#"):
+			continue
+		if stripped.startswith("- ") or stripped == "-":
+			if key is None:
+				raise ValueError(f"Invalid front matter: list item without a key: {line}")
+			if not isinstance(meta[key], list):
+				meta[key] = []
+			meta[key].append(parse_value(stripped[1:]))
+			continue
+		key, colon, value = stripped.partition(":")
+		if not colon:
+			raise ValueError(f"Invalid front matter: expected key: value, got {line}")
+		key = key.strip()
+		meta[key] = parse_value(value)
+	return meta
+
+
+def normalize(meta: dict) -> dict:
+	"""
+	Coerce the fields the build knows about into their types: title,
+	date and template are strings or None, tags a list of strings, draft
+	a bool. Other keys are passed through.
+	"""
+	meta = dict(meta)
+	for key in ("title", "date", "template"):
+		if meta.get(key) is not None:
+			meta[key] = str(meta[key])
+		else:
+			meta[key] = None
+	tags = meta.get("tags")
+	if tags is None:
+		tags = []
+	elif isinstance(tags, str):
+		tags = tags.split(",")
+	elif not isinstance(tags, list):
+		tags = [tags]
+	meta["tags"] = [str(tag).strip() for tag in tags if tag is not None and str(tag).strip()]
+	meta["draft"] = meta.get("draft") is True
+	return meta
+
+
+def split_front_matter(buffer) -> tuple[dict, int]:
+	"""
+	Find the front matter at the start of a raw markdown buffer (bytes or
+	mmap), without touching the rest of it.
+
+	return:
+	* (normalized front matter, offset of the first byte of the body)
+	* ({...empty fields...}, 0) if the page has no front matter
+	"""
+	if buffer[:3] != FENCE:
+		return normalize({}), 0
+	end = buffer.find(b"\n")
+	if end == -1 or buffer[:end].rstrip() != FENCE:
+		return normalize({}), 0
+	lines = []
+	position = end + 1
+	while position < len(buffer):
+		end = buffer.find(b"\n", position)
+		if end == -1:
+			end = len(buffer)
+		line = buffer[position:end].rstrip(b"\r")
+		if line.rstrip() == FENCE:
+			return normalize(parse_front_matter(lines)), min(end + 1, len(buffer))
+		lines.append(line.decode("utf-8"))
+		position = end + 1
+	# No closing fence: the --- was a horizontal rule, not front matter
+	return normalize({}), 0
+
+
+def read_header(path: str) -> dict:
+	"""
+	Read only the head of a page: its front matter and the first block of
+	the body, which holds the h1 used as title when the front matter has
+	none. The rest of the file is never read.
+
+	return:
+	* the normalized front matter, with "title" filled in from the h1
+	"""
+	with open(path, "rb") as f:
+		head = []
+		line = f.readline()
+		if line.rstrip() == FENCE:
+			head.append(line)
+			for line in iter(f.readline, b""):
+				head.append(line)
+				if line.rstrip() == FENCE:
+					break
+			meta, offset = split_front_matter(b"".join(head))
+			if offset == 0:
+				# Not front matter after all; the title is on the first line
+				f.seek(0)
+			line = f.readline()
+		else:
+			meta = normalize({})
+
+		if meta["title"] is None:
+			while line and not line.strip():
+				line = f.readline()
+			block = []
+			while line and line.strip():
+				block.append(line.decode("utf-8").strip())
+				line = f.readline()
+			first_block = "\n".join(block)
+			if first_block.startswith("# "):
+				meta["title"] = first_block[2:]
+	return meta
@@ -1,4 +1,12 @@
+# Trees nested deeper than this are walked with an explicit stack rather
+# than by recursion
+RECURSION_DEPTH = 100
+
+
 class HTMLNode:
+	# Nodes are created by the million during a build; slots keep them
+	# small and cheap to allocate. Subclasses must declare __slots__ too.
+	__slots__ = ("tag", "value", "children", "props")
 
 	def __init__(self, tag: str=None, value: str=None, children: list=None, props: dict=None):
 		self.tag = tag
@@ -8,6 +16,14 @@ class HTMLNode:
 
 	def to_html(self):
 		raise NotImplementedError
+
+	def write_html(self, out):
+		"""
+		Stream the html of this node into a file-like object.
+		"""
+		fragments = Fragments()
+		collect_html(self, fragments)
+		out.writelines(fragments)
 	
 	def props_to_html(self) -> str:
 		html_str = ""
@@ -25,6 +41,7 @@ class HTMLNode:
 		return (self.tag, self.value, self.children, self.props) == (other.tag, other.value, other.children, other.props)
 	
 class LeafNode(HTMLNode):
+	__slots__ = ()
 
 	def __init__(self, tag: str, value: str, props: dict=None):
 		super().__init__(tag=tag, value=value, props=props)
@@ -39,6 +56,7 @@ class LeafNode(HTMLNode):
 		return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
 	
 class ParentNode(HTMLNode):
+	__slots__ = ()
 
 	def __init__(self, tag: str, children: list, props: dict=None):
 		super().__init__(tag=tag, children=children, props=props)
@@ -51,9 +69,81 @@ class ParentNode(HTMLNode):
 		if self.children is None or self.children == []:
 			raise ValueError("ParentNode must have children.")
 		
-		child_str = ""
-		for child in self.children:
-			#if child:
-			child_str += child.to_html()
-		
-		return f"<{self.tag}{self.props_to_html()}>{child_str}</{self.tag}>"
\ No newline at end of file
+		fragments = []
+		collect_html(self, fragments)
+		return "".join(fragments)
+
+class Fragments(list):
+	"""
+	A list that can stand in for a file: write() and writelines() append
+	to it without a Python call per fragment.
+
+	Example:
+	fragments = Fragments()
+	node.write_html(fragments)
+	"".join(fragments) == node.to_html()
+	"""
+	__slots__ = ()
+	write = list.append
+	writelines = list.extend
+
+def collect_html(node: HTMLNode, fragments: list, depth: int=0):
+	"""
+	Append the html of a tree to fragments. Recursion is the fastest walk
+	for the shallow trees of real pages; a subtree RECURSION_DEPTH levels
+	down is handed to iter_html, so deep documents do not hit the
+	recursion limit.
+
+	Example:
+	fragments = []
+	collect_html(ParentNode("p", [LeafNode("b", "Bold"), LeafNode(None, " text")]), fragments)
+	# ["<p>", "<b>Bold</b>", " text", "</p>"]
+	"""
+	if not isinstance(node, ParentNode):
+		fragments.append(node.to_html())
+		return
+	if depth >= RECURSION_DEPTH:
+		fragments.extend(iter_html(node))
+		return
+	if node.tag is None:
+		raise ValueError("Parentnode needs a tag.")
+	if not node.children:
+		raise ValueError("ParentNode must have children.")
+	fragments.append(f"<{node.tag}{node.props_to_html()}>")
+	for child in node.children:
+		if isinstance(child, ParentNode):
+			collect_html(child, fragments, depth + 1)
+		else:
+			fragments.append(child.to_html())
+	fragments.append(f"</{node.tag}>")
+
+def iter_html(node: HTMLNode):
+	"""
+	Walk an HTMLNode tree iteratively and yield its html in fragments.
+
+	Joining the fragments gives the same string as node.to_html(), but no
+	subtree string is built (and copied again by each ancestor) on the way,
+	and deep documents do not hit the recursion limit. Slower than
+	collect_html on ordinary trees, which falls back to it for deep ones.
+
+	Example:
+	node = ParentNode("p", [LeafNode("b", "Bold"), LeafNode(None, " text")])
+	list(iter_html(node))
+	# ["<p>", "<b>Bold</b>", " text", "</p>"]
+	"""
+	# The stack holds nodes still to visit and closing tags still to emit
+	stack = [node]
+	while stack:
+		item = stack.pop()
+		if isinstance(item, str):
+			yield item
+		elif isinstance(item, ParentNode):
+			if item.tag is None:
+				raise ValueError("Parentnode needs a tag.")
+			if item.children is None or item.children == []:
+				raise ValueError("ParentNode must have children.")
+			yield f"<{item.tag}{item.props_to_html()}>"
+			stack.append(f"</{item.tag}>")
+			stack.extend(reversed(item.children))
+		else:
+			yield item.to_html()
\ No newline at end of file
@@ -0,0 +1,529 @@
+import json
+import os
+import posixpath
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import unquote, urlsplit
+
+from assets import sync_file
+from manifest import BuildManifest, hash_file
+
+IMAGES_PATH = ".build/images.json"
+IMAGES_VERSION = 1
+# Variants by source hash; survives --clean like the render cache
+IMAGE_CACHE_DIR = ".build/image-cache"
+
+IMAGE_EXTENSIONS = {".png", ".gif", ".jpg", ".jpeg"}
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# PNG color type -> samples per pixel
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+# JPEG start-of-frame markers, which hold the size of the image
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# JPEG markers without a length
+JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+
+
+### Image headers
+def image_size(path: str) -> tuple[int, int]:
+	"""
+	Read the size of a PNG, GIF or JPEG image from its header, without
+	decoding any pixels. JPEGs rotated by their EXIF orientation are
+	measured the way they are displayed.
+
+	return:
+	* (width, height)
+	* None for other or broken files
+	"""
+	with open(path, "rb") as f:
+		head = f.read(26)
+		if head.startswith(PNG_SIGNATURE) and head[12:16] == b"IHDR":
+			return struct.unpack(">II", head[16:24])
+		if head[:6] in (b"GIF87a", b"GIF89a") and len(head) >= 10:
+			return struct.unpack("<HH", head[6:10])
+		if head[:2] == b"\xff\xd8":
+			f.seek(2)
+			return _jpeg_size(f)
+	return None
+
+
+def _jpeg_size(f) -> tuple[int, int]:
+	"""
+	Walk the segments of a JPEG up to its start-of-frame.
+	"""
+	orientation = 1
+	while True:
+		byte = f.read(1)
+		while byte and byte != b"\xff":
+			byte = f.read(1)
+		while byte == b"\xff":
+			byte = f.read(1)
+		if not byte:
+			return None
+		marker = byte[0]
+		if marker in JPEG_STANDALONE_MARKERS:
+			continue
+		length = f.read(2)
+		if len(length) < 2:
+			return None
+		length = struct.unpack(">H", length)[0] - 2
+		if marker in JPEG_SOF_MARKERS:
+			data = f.read(5)
+			if len(data) < 5:
+				return None
+			height, width = struct.unpack(">xHH", data)
+			# Orientations 5 to 8 turn the image by 90 degrees
+			return (height, width) if orientation >= 5 else (width, height)
+		if marker == 0xE1:
+			data = f.read(length)
+			orientation = _exif_orientation(data) or orientation
+		else:
+			f.seek(length, 1)
+
+
+def _exif_orientation(data: bytes) -> int:
+	"""
+	return:
+	* the Orientation tag of the EXIF data in an APP1 segment, or None
+	"""
+	if not data.startswith(b"Exif\x00\x00") or len(data) < 14:
+		return None
+	tiff = data[6:]
+	endian = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+	if endian is None:
+		return None
+	offset = struct.unpack(endian + "I", tiff[4:8])[0]
+	if offset + 2 > len(tiff):
+		return None
+	count = struct.unpack(endian + "H", tiff[offset:offset + 2])[0]
+	for i in range(count):
+		entry = tiff[offset + 2 + 12 * i:offset + 14 + 12 * i]
+		if len(entry) < 12:
+			return None
+		tag, kind = struct.unpack(endian + "HH", entry[:4])
+		if tag == 0x0112 and kind == 3:
+			return struct.unpack(endian + "H", entry[8:10])[0]
+	return None
+
+
+def png_resizable(path: str) -> bool:
+	"""
+	Whether read_png can decode path: an 8-bit, non-interlaced PNG.
+	"""
+	with open(path, "rb") as f:
+		head = f.read(29)
+	if not head.startswith(PNG_SIGNATURE) or head[12:16] != b"IHDR" or len(head) < 29:
+		return False
+	depth, color, _, _, interlace = struct.unpack(">BBBBB", head[24:29])
+	return depth == 8 and color in PNG_CHANNELS and interlace == 0
+
+
+### PNG pixels
+def read_png(path: str) -> tuple[int, int, int, list[bytes]]:
+	"""
+	Decode an 8-bit, non-interlaced PNG. Palette images are expanded to
+	RGB, or to RGBA when the palette has transparency.
+
+	return:
+	* (width, height, channels, list of rows of width * channels samples)
+	"""
+	with open(path, "rb") as f:
+		data = f.read()
+	if not data.startswith(PNG_SIGNATURE):
+		raise ValueError(f"Not a PNG: {path}")
+	position = len(PNG_SIGNATURE)
+	idat = []
+	palette = transparency = None
+	header = None
+	while position + 8 <= len(data):
+		length, kind = struct.unpack(">I4s", data[position:position + 8])
+		chunk = data[position + 8:position + 8 + length]
+		position += length + 12
+		if kind == b"IHDR":
+			header = struct.unpack(">IIBBBBB", chunk)
+		elif kind == b"PLTE":
+			palette = chunk
+		elif kind == b"tRNS":
+			transparency = chunk
+		elif kind == b"IDAT":
+			idat.append(chunk)
+		elif kind == b"IEND":
+			break
+	if header is None:
+		raise ValueError(f"PNG without header: {path}")
+	width, height, depth, color, _, _, interlace = header
+	if depth != 8 or interlace or color not in PNG_CHANNELS:
+		raise ValueError(f"Unsupported PNG (bit depth {depth}, color type {color}, interlace {interlace}): {path}")
+	channels = PNG_CHANNELS[color]
+	rows = _unfilter(zlib.decompress(b"".join(idat)), width * channels, height, channels)
+
+	if color == 3:
+		if palette is None:
+			raise ValueError(f"PNG without palette: {path}")
+		alpha = transparency or b""
+		channels = 4 if alpha else 3
+		table = [
+			palette[3 * i:3 * i + 3] + (bytes([alpha[i] if i < len(alpha) else 255]) if alpha else b"")
+			for i in range(len(palette) // 3)
+		]
+		table += [bytes(channels)] * (256 - len(table))
+		rows = [b"".join(map(table.__getitem__, row)) for row in rows]
+	return width, height, channels, rows
+
+
+def _unfilter(raw: bytes, stride: int, height: int, bpp: int) -> list[bytes]:
+	"""
+	Undo the per-row filters of decompressed PNG data.
+	"""
+	rows = []
+	previous = bytes(stride)
+	position = 0
+	for _ in range(height):
+		kind = raw[position]
+		row = bytearray(raw[position + 1:position + 1 + stride])
+		position += stride + 1
+		if kind == 1:
+			for i in range(bpp, stride):
+				row[i] = (row[i] + row[i - bpp]) & 0xFF
+		elif kind == 2:
+			row = _add_bytes(row, previous)
+		elif kind == 3:
+			for i in range(stride):
+				left = row[i - bpp] if i >= bpp else 0
+				row[i] = (row[i] + ((left + previous[i]) >> 1)) & 0xFF
+		elif kind == 4:
+			for i in range(stride):
+				if i >= bpp:
+					left = row[i - bpp]
+					upper_left = previous[i - bpp]
+				else:
+					left = upper_left = 0
+				up = previous[i]
+				estimate = left + up - upper_left
+				to_left = abs(estimate - left)
+				to_up = abs(estimate - up)
+				to_upper_left = abs(estimate - upper_left)
+				if to_left <= to_up and to_left <= to_upper_left:
+					predictor = left
+				elif to_up <= to_upper_left:
+					predictor = up
+				else:
+					predictor = upper_left
+				row[i] = (row[i] + predictor) & 0xFF
+		elif kind != 0:
+			raise ValueError(f"Unknown PNG filter type {kind}")
+		rows.append(bytes(row))
+		previous = rows[-1]
+	return rows
+
+
+def _add_bytes(a: bytes, b: bytes) -> bytes:
+	"""
+	Bytewise (a + b) mod 256 over whole rows at once: the low seven bits
+	of every byte are added without carrying into the next byte, the top
+	bit is their xor.
+	"""
+	if not a:
+		return bytes(a)
+	low = int.from_bytes(b"\x7f" * len(a), "big")
+	x = int.from_bytes(a, "big")
+	y = int.from_bytes(b, "big")
+	return (((x & low) + (y & low)) ^ ((x ^ y) & ~low & ((1 << 8 * len(a)) - 1))).to_bytes(len(a), "big")
+
+
+def downscale(rows: list[bytes], width: int, height: int, channels: int, new_width: int, new_height: int) -> list[bytes]:
+	"""
+	Shrink an image by averaging the box of source pixels under every
+	target pixel, first along the rows, then down the columns.
+	"""
+	xs = [x * width // new_width for x in range(new_width + 1)]
+	narrow = []
+	for row in rows:
+		samples = []
+		for x in range(new_width):
+			start, end = xs[x] * channels, xs[x + 1] * channels
+			n = xs[x + 1] - xs[x]
+			for c in range(channels):
+				samples.append((sum(row[start + c:end:channels]) * 2 + n) // (2 * n))
+		narrow.append(samples)
+
+	ys = [y * height // new_height for y in range(new_height + 1)]
+	result = []
+	for y in range(new_height):
+		group = narrow[ys[y]:ys[y + 1]]
+		n = len(group)
+		result.append(bytes((total * 2 + n) // (2 * n) for total in map(sum, zip(*group))))
+	return result
+
+
+def write_png(path: str, width: int, height: int, channels: int, rows: list[bytes]):
+	"""
+	Encode rows as an 8-bit PNG, every row filtered with Up.
+	"""
+	color = {1: 0, 2: 4, 3: 2, 4: 6}[channels]
+	filtered = []
+	previous = bytes(width * channels)
+	for row in rows:
+		filtered.append(b"\x02" + _sub_bytes(row, previous))
+		previous = row
+
+	def chunk(kind: bytes, data: bytes) -> bytes:
+		return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+	tmp_path = f"{path}.tmp{os.getpid()}"
+	with open(tmp_path, "wb") as f:
+		f.write(PNG_SIGNATURE)
+		f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color, 0, 0, 0)))
+		f.write(chunk(b"IDAT", zlib.compress(b"".join(filtered), 9)))
+		f.write(chunk(b"IEND", b""))
+	os.replace(tmp_path, path)
+
+
+def _sub_bytes(a: bytes, b: bytes) -> bytes:
+	"""
+	Bytewise (a - b) mod 256, the inverse of _add_bytes.
+	"""
+	return _add_bytes(a, bytes((256 - value) & 0xFF for value in b))
+
+
+def write_variants(path: str, variants: list[tuple[int, str]]) -> list[int]:
+	"""
+	Write downscaled copies of a PNG, decoding it once for all of them.
+	Runs in the worker processes of ImageIndex.update.
+
+	parameters:
+	* path: the source image
+	* variants: list of (width, path to write it to)
+
+	return:
+	* list of the widths written
+	"""
+	width, height, channels, rows = read_png(path)
+	written = []
+	for new_width, variant_path in variants:
+		new_height = max(1, round(height * new_width / width))
+		write_png(variant_path, new_width, new_height, channels, downscale(rows, width, height, channels, new_width, new_height))
+		written.append(new_width)
+	return written
+
+
+def variant_path(path: str, width: int) -> str:
+	"""
+	The name of the variant of path that is width pixels wide.
+
+	Example:
+	variant_path("/images/rivendell.png", 480)
+	# "/images/rivendell-480w.png"
+	"""
+	root, extension = posixpath.splitext(path)
+	return f"{root}-{width}w{extension}"
+
+
+class ImageUpdate:
+	"""
+	What ImageIndex.update did.
+	"""
+
+	def __init__(self):
+		self.read = []
+		self.unchanged = []
+		self.variants_written = []
+		# Variant outputs copied or linked into the output directory
+		self.synced = []
+
+	def __repr__(self) -> str:
+		return (
+			f"ImageUpdate(read={len(self.read)}, unchanged={len(self.unchanged)}, "
+			f"variants_written={len(self.variants_written)})"
+		)
+
+
+class ImageIndex:
+	"""
+	The size and the downscaled variants of every image below static/,
+	kept between builds.
+
+	An image is looked at again only when its size or modification time
+	changed, and then only read further than its header when its content
+	hash changed. Variants are written once per content hash into
+	cache_dir and synced into the output tree from there, so unchanged
+	images are never decoded again, not even after --clean. Variants are
+	PNG only: the stdlib has no decoder for JPEG or GIF pixels, so those
+	only get their width and height.
+
+	Pages show images with their width and height, and with a srcset of
+	the variants narrower than the image itself.
+
+	Example images.json:
+	{
+		"version": 1,
+		"widths": [480, 960],
+		"images": {
+			"images/rivendell.png": {
+				"source": "static/images/rivendell.png",
+				"size": 182044, "mtime_ns": 1717000000000000000, "hash": "9ab2...",
+				"width": 1600, "height": 900, "resizable": true, "variants": [480, 960]
+			}
+		}
+	}
+	"""
+
+	def __init__(self, path: str=IMAGES_PATH, cache_dir: str=IMAGE_CACHE_DIR, widths=()):
+		self.path = path
+		self.cache_dir = cache_dir
+		self.widths = sorted(set(widths))
+		self.images = {}
+
+	@classmethod
+	def load(cls, path: str=IMAGES_PATH, cache_dir: str=IMAGE_CACHE_DIR) -> "ImageIndex":
+		index = cls(path, cache_dir)
+		if not os.path.exists(path):
+			return index
+		with open(path, "r") as f:
+			try:
+				data = json.load(f)
+			except json.JSONDecodeError:
+				return index
+		if data.get("version") == IMAGES_VERSION:
+			index.widths = data.get("widths", [])
+			index.images = data.get("images", {})
+		return index
+
+	def save(self):
+		directory = os.path.dirname(self.path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		tmp_path = f"{self.path}.tmp"
+		with open(tmp_path, "w") as f:
+			json.dump({"version": IMAGES_VERSION, "widths": self.widths, "images": self.images}, f, indent=1, sort_keys=True)
+		os.replace(tmp_path, self.path)
+
+	def cache_path(self, entry: dict, width: int) -> str:
+		return os.path.join(self.cache_dir, f"{entry['hash']}-{width}w.png")
+
+	def update(self, src: str="static", dst: str="public", manifest: BuildManifest=None, jobs: int=1) -> ImageUpdate:
+		"""
+		Bring the index up to date with the images below src, write the
+		variants that are not cached yet (across a ProcessPoolExecutor
+		with jobs > 1) and sync every variant into dst.
+
+		parameters:
+		* src: the static directory the images are mirrored from
+		* dst: the output directory
+		* manifest: the build manifest to record the variants in
+		* jobs: number of processes writing variants
+		"""
+		result = ImageUpdate()
+		images = {}
+		for root, _, files in os.walk(src):
+			for name in sorted(files):
+				if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+					continue
+				source = os.path.relpath(os.path.join(root, name))
+				key = os.path.relpath(source, src).replace(os.sep, "/")
+				stat = os.stat(source)
+				entry = self.images.get(key)
+				if entry is not None and entry["source"] == source and (entry["size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+					result.unchanged.append(source)
+				else:
+					content_hash = hash_file(source)
+					if entry is None or entry["hash"] != content_hash:
+						size = image_size(source)
+						if size is None:
+							continue
+						entry = {
+							"hash": content_hash,
+							"width": size[0],
+							"height": size[1],
+							"resizable": png_resizable(source),
+							"variants": [],
+						}
+						result.read.append(source)
+					else:
+						result.unchanged.append(source)
+					entry = {**entry, "source": source, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+				images[key] = entry
+		self.images = images
+
+		os.makedirs(self.cache_dir, exist_ok=True)
+		tasks = []
+		for entry in images.values():
+			wanted = [width for width in self.widths if width < entry["width"]] if entry["resizable"] else []
+			entry["variants"] = wanted
+			missing = [(width, self.cache_path(entry, width)) for width in wanted if not os.path.exists(self.cache_path(entry, width))]
+			if missing:
+				tasks.append((entry["source"], missing))
+
+		if jobs > 1 and len(tasks) > 1:
+			with ProcessPoolExecutor(max_workers=jobs) as executor:
+				done = list(executor.map(write_variants, *zip(*tasks)))
+		else:
+			done = [write_variants(source, variants) for source, variants in tasks]
+		for (source, _), widths in zip(tasks, done):
+			result.variants_written.extend((source, width) for width in widths)
+
+		used = set()
+		for cache_path, output in self.outputs(dst):
+			used.add(os.path.basename(cache_path))
+			os.makedirs(os.path.dirname(output), exist_ok=True)
+			action, _ = sync_file(cache_path, os.stat(cache_path), output)
+			if manifest is not None:
+				manifest.record_asset(cache_path, output)
+			if action != "unchanged":
+				result.synced.append(output)
+		# Variants of images that changed or are gone
+		for name in os.listdir(self.cache_dir):
+			if name not in used:
+				os.remove(os.path.join(self.cache_dir, name))
+		return result
+
+	def outputs(self, dst: str="public") -> list[tuple[str, str]]:
+		"""
+		return:
+		* list of (cached variant, output path) of every variant
+		"""
+		return [
+			(self.cache_path(entry, width), os.path.join(dst, *variant_path(key, width).split("/")))
+			for key, entry in sorted(self.images.items())
+			for width in entry["variants"]
+		]
+
+	def attributes(self, key: str) -> dict:
+		"""
+		return:
+		* the attributes an img of the image at key (relative to the
+		  output directory) is shown with, {} for unknown images
+		"""
+		entry = self.images.get(key)
+		if entry is None:
+			return {}
+		props = {"width": str(entry["width"]), "height": str(entry["height"])}
+		if entry["variants"]:
+			url = "/" + key
+			props["srcset"] = ", ".join(
+				[f"{variant_path(url, width)} {width}w" for width in entry["variants"]]
+				+ [f"{url} {entry['width']}w"]
+			)
+		return props
+
+	def fingerprint(self, key: str) -> str:
+		"""
+		return:
+		* what attributes() shows of the image, None for unknown images
+		"""
+		entry = self.images.get(key)
+		if entry is None:
+			return None
+		return f"{entry['width']}x{entry['height']} {','.join(map(str, entry['variants']))}".rstrip()
+
+
+def image_key(url: str) -> str:
+	"""
+	return:
+	* the path below the output directory that a site-absolute url names
+	* None for relative and external urls
+	"""
+	if not url.startswith("/") or url.startswith("//"):
+		return None
+	return unquote(urlsplit(url).path).lstrip("/")
@@ -0,0 +1,256 @@
+import contextlib
+import os
+import time
+
+from console import console
+
+import htmlnode
+import source
+import template
+import utils
+
+# Build stages, in pipeline order. Times are exclusive: the time spent in
+# text_to_textnode is counted as "inline", not also as "convert".
+STAGES = ["read", "blocks", "inline", "convert", "to_html", "template", "write", "other"]
+
+# The Instrumentation of the running build, or None. generate_page only
+# checks this once per page, so a build without instrumentation pays
+# nothing for it.
+active = None
+
+
+class Instrumentation:
+	"""
+	Per-stage timers and per-page counters for a build.
+
+	install() wraps the functions that make up each stage (MarkdownSource
+	for reading and block splitting, text_to_textnode for inline parsing,
+	the block converters, HTMLNode.write_html, Template.write) with
+	timers; uninstall() puts the originals back. Nothing is wrapped while
+	instrumentation is off.
+
+	Example:
+	with Instrumentation() as instrumentation:
+		generate_page_recursive(...)
+	instrumentation.to_dict()
+	# {"stages": {"read": 0.01, ...}, "pages": {"public/index.html": {...}}, ...}
+	"""
+
+	def __init__(self):
+		self._originals = []
+		self.reset()
+
+	def reset(self):
+		"""
+		Forget everything measured so far, keeping the probes installed.
+		"""
+		self.stages = {stage: 0.0 for stage in STAGES}
+		# Wall time of the steps of main(): assets, pages, compress...
+		self.phases = {}
+		self.pages = {}
+		self.current = None
+		# Stack of [stage, start, time spent in nested stages]
+		self._stack = []
+
+	def __enter__(self) -> "Instrumentation":
+		self.install()
+		return self
+
+	def __exit__(self, *exc):
+		self.uninstall()
+
+	def install(self):
+		global active
+		self._patch(source.MarkdownSource, "__enter__", self._timed("read", source.MarkdownSource.__enter__))
+		self._patch(source.MarkdownSource, "iter_blocks", self._timed_blocks(source.MarkdownSource.iter_blocks))
+		self._patch(utils, "text_to_textnode", self._timed_inline(utils.text_to_textnode))
+		for block_type, converter in list(utils.block_converters.items()):
+			self._patch(utils.block_converters, block_type, self._timed("convert", converter))
+		self._patch(htmlnode.HTMLNode, "write_html", self._timed("to_html", htmlnode.HTMLNode.write_html))
+		self._patch(template.Template, "write", self._timed("template", template.Template.write))
+		active = self
+
+	def uninstall(self):
+		global active
+		for target, name, original in reversed(self._originals):
+			if isinstance(target, dict):
+				target[name] = original
+			else:
+				setattr(target, name, original)
+		self._originals = []
+		active = None
+
+	def _patch(self, target, name: str, replacement):
+		if isinstance(target, dict):
+			self._originals.append((target, name, target[name]))
+			target[name] = replacement
+		else:
+			self._originals.append((target, name, target.__dict__[name]))
+			setattr(target, name, replacement)
+
+	def enter(self, stage: str):
+		self._stack.append([stage, time.perf_counter(), 0.0])
+
+	def exit(self):
+		stage, start, nested = self._stack.pop()
+		elapsed = time.perf_counter() - start
+		self.stages[stage] += elapsed - nested
+		if self._stack:
+			self._stack[-1][2] += elapsed
+
+	def _timed(self, stage: str, function):
+		def timed(*args, **kwargs):
+			self.enter(stage)
+			try:
+				return function(*args, **kwargs)
+			finally:
+				self.exit()
+		return timed
+
+	def _timed_inline(self, function):
+		def timed(text):
+			self.enter("inline")
+			try:
+				nodes = function(text)
+			finally:
+				self.exit()
+			if self.current is not None:
+				self.current["inline_nodes"] += len(nodes)
+			return nodes
+		return timed
+
+	def _timed_blocks(self, method):
+		def timed(source_self):
+			blocks = method(source_self)
+			while True:
+				self.enter("blocks")
+				try:
+					block = next(blocks, None)
+				finally:
+					self.exit()
+				if block is None:
+					return
+				if self.current is not None:
+					self.current["blocks"] += 1
+				yield block
+		return timed
+
+	@contextlib.contextmanager
+	def time_phase(self, name: str):
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+	def page(self, from_path: str, dest_path: str) -> "PageTimer":
+		return PageTimer(self, from_path, dest_path)
+
+	def writer(self, out) -> "TimedWriter":
+		return TimedWriter(self, out)
+
+	def merge(self, data: dict):
+		"""
+		Add the to_dict() of another Instrumentation, e.g. a worker's.
+		"""
+		for stage, seconds in data["stages"].items():
+			self.stages[stage] += seconds
+		self.pages.update(data["pages"])
+
+	def to_dict(self) -> dict:
+		totals = {"pages": len(self.pages)}
+		for counter in ["blocks", "inline_nodes", "bytes_in", "bytes_out", "seconds"]:
+			totals[counter] = sum(page[counter] for page in self.pages.values())
+		return {
+			"phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+			"stages": {stage: round(seconds, 6) for stage, seconds in self.stages.items()},
+			"totals": totals,
+			"pages": self.pages,
+		}
+
+
+def phase(name: str):
+	"""
+	Time a step of the build while instrumentation is active.
+
+	Example:
+	with phase("assets"):
+		sync_tree(...)
+	"""
+	if active is None:
+		return contextlib.nullcontext()
+	return active.time_phase(name)
+
+
+class PageTimer:
+	"""
+	Context manager around the generation of one page. Time of the page
+	not claimed by any stage is counted as "other".
+	"""
+
+	def __init__(self, instrumentation: Instrumentation, from_path: str, dest_path: str):
+		self.instrumentation = instrumentation
+		self.from_path = from_path
+		self.dest_path = dest_path
+
+	def __enter__(self):
+		self.instrumentation.current = {
+			"source": os.path.relpath(self.from_path),
+			"blocks": 0,
+			"inline_nodes": 0,
+			"bytes_in": os.path.getsize(self.from_path),
+			"bytes_out": 0,
+			"seconds": 0.0,
+		}
+		self.instrumentation.enter("other")
+		return self
+
+	def __exit__(self, *exc):
+		instrumentation = self.instrumentation
+		start = instrumentation._stack[-1][1]
+		instrumentation.exit()
+		page = instrumentation.current
+		page["seconds"] = round(time.perf_counter() - start, 6)
+		if os.path.exists(self.dest_path):
+			page["bytes_out"] = os.path.getsize(self.dest_path)
+		instrumentation.pages[os.path.relpath(self.dest_path)] = page
+		instrumentation.current = None
+
+
+class TimedWriter:
+	"""
+	File-like wrapper that counts the time spent writing as "write".
+	"""
+
+	def __init__(self, instrumentation: Instrumentation, out):
+		self.instrumentation = instrumentation
+		self.out = out
+
+	def write(self, text: str) -> int:
+		self.instrumentation.enter("write")
+		try:
+			return self.out.write(text)
+		finally:
+			self.instrumentation.exit()
+
+	def writelines(self, lines):
+		# Fragments are produced lazily by iter_html, so only the writes
+		# themselves are timed here
+		for line in lines:
+			self.write(line)
+
+
+def report_stages(data: dict):
+	"""
+	Print where the time of an instrumented build went, per stage.
+	"""
+	stages = data["stages"]
+	totals = data["totals"]
+	total = sum(stages.values())
+	console.info(
+		"Instrumented %d pages: %d blocks, %d inline nodes, %d bytes in, %d bytes out",
+		totals["pages"], totals["blocks"], totals["inline_nodes"], totals["bytes_in"], totals["bytes_out"]
+	)
+	for stage in STAGES:
+		share = stages[stage] / total * 100 if total else 0.0
+		console.info("%10s: %.1f ms (%.1f%%)", stage, stages[stage] * 1000, share)
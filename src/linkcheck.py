@@ -0,0 +1,255 @@
+import contextlib
+import json
+import os
+import posixpath
+from urllib.parse import unquote, urlsplit
+
+import utils
+from console import console
+
+LINKS_PATH = ".build/links.json"
+LINKS_VERSION = 1
+
+# Source path -> {"output": output path, "links": list of [url, include]}
+# of the pages rendered by this process, or None when links are not
+# checked. generate_page fills it while pages render.
+collecting = None
+
+
+@contextlib.contextmanager
+def collect(from_path: str, dest_path: str):
+	"""
+	Collect the targets of the links and images of from_path, rendered
+	to dest_path, into collecting while the body inside the with
+	statement converts it. The yielded list holds one [url, include] per
+	link, include being the included file it is in or None.
+	"""
+	links = []
+	utils.link_sink = lambda url, include: links.append([url, include])
+	try:
+		yield links
+	finally:
+		utils.link_sink = None
+	collecting[os.path.relpath(from_path)] = {
+		"output": os.path.relpath(dest_path),
+		"links": list(dict.fromkeys(map(tuple, links)))
+	}
+
+
+class UrlIndex:
+	"""
+	Every file below dest_dir, as a set of paths relative to it with "/"
+	separators. A link target is checked with one or two set lookups,
+	the way the server resolves it: as a file, or as a directory with an
+	index.html. Site-absolute urls are resolved once per index, however
+	many pages link them.
+
+	Example:
+	index = UrlIndex.scan("public")
+	index.resolves("/images/rivendell.png", "public/index.html")
+	# False if public/images/rivendell.png was never written
+	"""
+
+	def __init__(self, dest_dir: str="public", paths=()):
+		self.dest_dir = dest_dir
+		self.paths = set(paths)
+		# Site-absolute url -> resolves(url)
+		self._resolved = {}
+
+	@classmethod
+	def scan(cls, dest_dir: str="public") -> "UrlIndex":
+		index = cls(dest_dir)
+		for root, _, files in os.walk(dest_dir):
+			prefix = index.key(root)
+			prefix = "" if prefix == "." else prefix + "/"
+			index.paths.update(prefix + name for name in files)
+		return index
+
+	def key(self, path: str) -> str:
+		return os.path.relpath(path, self.dest_dir).replace(os.sep, "/")
+
+	def add(self, path: str):
+		self.paths.add(self.key(path))
+		self._resolved = {}
+
+	def discard(self, path: str):
+		self.paths.discard(self.key(path))
+		self._resolved = {}
+
+	def resolves(self, url: str, output: str) -> bool:
+		"""
+		parameters:
+		* url: the target of a link or image
+		* output: path of the page it is on, for relative urls
+
+		return:
+		* whether url names a file of the site
+		* None for urls that are not checked: external ones (with a scheme
+		  or host, e.g. https:, mailto:, //cdn) and links within the page
+		"""
+		return self.resolves_from(url, posixpath.dirname(self.key(output)))
+
+	def resolves_from(self, url: str, directory: str) -> bool:
+		"""
+		resolves() for a page in directory, relative to dest_dir.
+		"""
+		if url.startswith("/") and not url.startswith("//"):
+			resolved = self._resolved.get(url, self)
+			if resolved is self:
+				resolved = self._resolved[url] = self._resolve(url, "")
+			return resolved
+		return self._resolve(url, directory)
+
+	def _resolve(self, url: str, directory: str) -> bool:
+		parts = urlsplit(url)
+		if parts.scheme or parts.netloc or not parts.path:
+			return None
+		path = unquote(parts.path)
+		if not path.startswith("/"):
+			path = posixpath.join(directory, path)
+		path = posixpath.normpath(path.lstrip("/"))
+		if path == "..":
+			return False
+		if path == ".":
+			path = ""
+		elif path.startswith("../"):
+			return False
+		return path in self.paths or posixpath.join(path, "index.html") in self.paths
+
+
+def link_lines(text: str, url: str) -> list[int]:
+	"""
+	return:
+	* the 1-based numbers of the lines of text with a link or image to
+	  url, each line once however many it holds
+	"""
+	needle = f"]({url})"
+	lines = []
+	line = 1
+	last = 0
+	start = text.find(needle)
+	while start != -1:
+		line += text.count("\n", last, start)
+		if not lines or lines[-1] != line:
+			lines.append(line)
+		last = start
+		start = text.find(needle, start + len(needle))
+	return lines
+
+
+class LinkChecker:
+	"""
+	The link and image targets of every page, kept between builds so the
+	links of pages that were not rendered again are checked too, e.g.
+	against a page that was deleted since.
+
+	Targets are collected while pages are converted and checked against
+	a UrlIndex once every output is written, so the html is never read
+	back. Only the files with a broken link are read again, to find the
+	lines to report. The broken links of the last check are saved along
+	with the pages.
+
+	Example links.json:
+	{
+		"version": 1,
+		"pages": {
+			"content/index.md": {
+				"output": "public/index.html",
+				"links": [["/majesty", null], ["/images/rivendell.png", null], ["/about", "includes/footer.md"]]
+			}
+		},
+		"broken": [
+			{"file": "content/index.md", "line": 3, "url": "/images/rivendell.png", "page": "content/index.md"}
+		]
+	}
+	"""
+
+	def __init__(self, path: str=LINKS_PATH):
+		self.path = path
+		self.pages = {}
+		self.broken = []
+
+	@classmethod
+	def load(cls, path: str=LINKS_PATH) -> "LinkChecker":
+		checker = cls(path)
+		if not os.path.exists(path):
+			return checker
+		with open(path, "r") as f:
+			try:
+				data = json.load(f)
+			except json.JSONDecodeError:
+				return checker
+		if data.get("version") == LINKS_VERSION:
+			checker.pages = data.get("pages", {})
+		return checker
+
+	def save(self):
+		directory = os.path.dirname(self.path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		tmp_path = f"{self.path}.tmp"
+		with open(tmp_path, "w") as f:
+			# dumps() encodes in C; dump() would stream through the pure Python encoder
+			f.write(json.dumps({"version": LINKS_VERSION, "pages": self.pages, "broken": self.broken}, separators=(",", ":")))
+		os.replace(tmp_path, self.path)
+
+	def get(self, source: str) -> dict:
+		return self.pages.get(os.path.relpath(source))
+
+	def update(self, collected: dict):
+		self.pages.update(collected)
+
+	def remove(self, source: str):
+		self.pages.pop(os.path.relpath(source), None)
+
+	def keep(self, sources):
+		"""
+		Forget every page not in sources.
+		"""
+		keys = {os.path.relpath(source) for source in sources}
+		self.pages = {key: page for key, page in self.pages.items() if key in keys}
+
+	def check(self, index: UrlIndex) -> list[dict]:
+		"""
+		Check the targets of every page against index, and keep the
+		result in broken.
+
+		return:
+		* list of {"file", "line", "url", "page"} per broken link, file
+		  being the markdown file the link is written in (the page itself
+		  or an include, listed once for all pages including it) and line
+		  None where the link could not be found in it
+		"""
+		broken = {}
+		for source, page in sorted(self.pages.items()):
+			directory = posixpath.dirname(index.key(page["output"]))
+			for url, include in page["links"]:
+				if index.resolves_from(url, directory) is False:
+					broken.setdefault((include or source, url), source)
+
+		texts = {}
+		results = []
+		for (path, url), source in broken.items():
+			if path not in texts:
+				try:
+					with open(path, "r", encoding="utf-8") as f:
+						texts[path] = f.read()
+				except OSError:
+					texts[path] = ""
+			for line in link_lines(texts[path], url) or [None]:
+				results.append({"file": path, "line": line, "url": url, "page": source})
+		self.broken = results
+		return results
+
+
+def report_broken(broken: list[dict]):
+	"""
+	Write one error line per broken link, as file:line: url.
+	"""
+	lines = []
+	for link in broken:
+		location = link["file"] if link["line"] is None else f"{link['file']}:{link['line']}"
+		included = f" (included by {link['page']})" if link["file"] != link["page"] else ""
+		lines.append(f"{location}: broken link {link['url']}{included}")
+	if lines:
+		console.error("\n".join(lines))
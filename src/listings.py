@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import re
+
+from console import console
+from htmlnode import LeafNode, ParentNode
+from manifest import BuildManifest
+from pageindex import PageIndex
+from template import Template
+
+# Bump when the html of listing pages changes, so every listing is rewritten
+LISTING_VERSION = 1
+
+
+class Listing:
+	"""
+	One listing of pages (a section, a tag or a year) before pagination.
+
+	parameters:
+	* title: the title of its pages
+	* url: the url of its first page, e.g. "/tags/tolkien/"
+	"""
+
+	def __init__(self, title: str, url: str):
+		self.title = title
+		self.url = url
+		self.entries = []
+
+	def page_url(self, number: int) -> str:
+		return self.url if number == 1 else f"{self.url}page/{number}/"
+
+	def __repr__(self) -> str:
+		return f"Listing({self.title}, {self.url}, {len(self.entries)} entries)"
+
+
+def slugify(text: str) -> str:
+	return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-") or "-"
+
+
+def collect_listings(index: PageIndex, content_dir: str="content") -> dict[str, Listing]:
+	"""
+	Sort the published pages once, newest first, and deal them out into
+	listings in that single pass, so every listing comes out sorted:
+
+	* one per content directory, of every page below it, at <dir>/list/
+	* one per tag, at tags/<tag>/
+	* one per year of the page dates, at archive/<year>/
+
+	Only the page index is read, never a markdown body.
+
+	return:
+	* dict of listing url to Listing
+	"""
+	listings = {}
+
+	def add(title: str, url: str, entry: dict):
+		listing = listings.get(url)
+		if listing is None:
+			listing = listings[url] = Listing(title, url)
+		listing.entries.append(entry)
+
+	for entry in index.published():
+		section = os.path.dirname(os.path.relpath(entry["source"], content_dir))
+		if os.path.basename(entry["source"]) == "index.md":
+			# A directory's own index belongs to the sections above it
+			section = os.path.dirname(section) if section else None
+		while section is not None:
+			parts = [part for part in section.split(os.sep) if part]
+			add(f"Pages in /{'/'.join(parts)}", "/" + "".join(f"{part}/" for part in parts) + "list/", entry)
+			section = os.path.dirname(section) if section else None
+		for tag in entry["tags"]:
+			add(f"Tagged {tag}", f"/tags/{slugify(tag)}/", entry)
+		if entry["date"]:
+			year = entry["date"][:4]
+			add(f"Archive {year}", f"/archive/{year}/", entry)
+	return listings
+
+
+def entry_url(entry: dict, dest_dir: str="public") -> str:
+	path = os.path.relpath(entry["output"], dest_dir).replace(os.sep, "/")
+	if path == "index.html" or path.endswith("/index.html"):
+		path = path[:-len("index.html")]
+	return "/" + path
+
+
+def listing_page_html(listing: Listing, entries: list[dict], number: int, pages: int, dest_dir: str="public") -> ParentNode:
+	"""
+	The content of one page of a listing: a list of links with their
+	dates, followed by links to the neighbouring pages.
+	"""
+	items = []
+	for entry in entries:
+		children = [LeafNode("a", entry["title"] or entry["source"], {"href": entry_url(entry, dest_dir)})]
+		if entry["date"]:
+			children.append(LeafNode(None, " "))
+			children.append(LeafNode("time", entry["date"], {"datetime": entry["date"]}))
+		items.append(ParentNode("li", children))
+	children = [LeafNode("h1", listing.title), ParentNode("ul", items)]
+
+	links = []
+	if number > 1:
+		links.append(LeafNode("a", "Newer", {"href": listing.page_url(number - 1), "rel": "prev"}))
+	if number < pages:
+		links.append(LeafNode("a", "Older", {"href": listing.page_url(number + 1), "rel": "next"}))
+	if links:
+		children.append(ParentNode("nav", links))
+	return ParentNode("div", children)
+
+
+def listing_key(listing: Listing, entries: list[dict], number: int, pages: int, page_size: int) -> str:
+	"""
+	Hash of everything a listing page shows, so it is only rewritten when
+	its members or their metadata change.
+	"""
+	members = [(entry["output"], entry["title"], entry["date"], entry["source"]) for entry in entries]
+	data = json.dumps([LISTING_VERSION, listing.title, listing.url, number, pages, page_size, members])
+	return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def listing_pages(index: PageIndex, dest_dir: str="public", content_dir: str="content", page_size: int=10):
+	"""
+	Paginate every listing of the site.
+
+	return:
+	* iterator of (listing, page number, number of pages, entries on the page, output path)
+	"""
+	for listing in collect_listings(index, content_dir).values():
+		pages = max(1, -(-len(listing.entries) // page_size))
+		for number in range(1, pages + 1):
+			entries = listing.entries[(number - 1) * page_size:number * page_size]
+			dest_path = os.path.join(dest_dir, *listing.page_url(number).strip("/").split("/"), "index.html")
+			yield listing, number, pages, entries, dest_path
+
+
+def generate_listings(
+		index: PageIndex,
+		template_path: str,
+		dest_dir: str="public",
+		content_dir: str="content",
+		page_size: int=10,
+		manifest: BuildManifest=None) -> list[str]:
+	"""
+	Write every listing page of the site, paginated page_size entries at a
+	time. With a manifest, listing pages whose members and template did
+	not change are left alone.
+
+	return:
+	* list of listing pages written
+	"""
+	template = None
+	template_hash = manifest.file_hash(template_path) if manifest is not None else None
+	written = []
+	for listing, number, pages, entries, dest_path in listing_pages(index, dest_dir, content_dir, page_size):
+		key = listing_key(listing, entries, number, pages, page_size)
+		if manifest is not None and manifest.is_fresh_generated(dest_path, key, template_hash):
+			continue
+
+		if template is None:
+			template = Template.load(template_path)
+		console.debug("Generating listing %s", dest_path)
+		os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+		title = listing.title if number == 1 else f"{listing.title} (page {number})"
+		with open(dest_path, "w") as out:
+			template.write(out, template.front_matter_values(), Title=title, Content=listing_page_html(listing, entries, number, pages, dest_dir))
+		if manifest is not None:
+			manifest.record_generated(dest_path, key, template_hash)
+		written.append(dest_path)
+	console.count("listings rendered", len(written))
+	return written
@@ -1,31 +1,32 @@
+import argparse
+import contextlib
+import cProfile
+import itertools
 import os
 import shutil
 from textnode import TextNode
-from utils import markdown_to_blocks, block_to_block_type, markdown_to_html_node
-
-def copy_tree(src: str, dst: str):
-	"""
-	Copy an entire directory tree.
-
-	parameters:
-	:src: A relative path from the root of the project.
-	:dst: A relative path from the root of the project.
-	"""
-	root = os.path.abspath(".")
-	if not os.path.exists(os.path.join(root, dst)):
-		os.mkdir(os.path.join(root, dst))
-	for item in os.listdir(os.path.join(root, src)):
-		src_path = os.path.join(root, f"{src}/{item}")
-		dst_path = os.path.join(root, f"{dst}/{item}")
-
-		if not os.path.isfile(src_path):
-			os.mkdir(dst_path)
-			print(f"Directory {dst_path} created")
-			copy_tree(f"{src}/{item}", f"{dst}/{item}")
-		else:
-			shutil.copy(src_path, dst_path)
-			print(f"Flie {src_path} copied to {dst_path}")
-
+import utils
+from utils import markdown_to_blocks, block_to_block_type, MarkdownStream
+from assets import sync_tree
+from compress import compress_outputs
+import feeds
+from feeds import TextCache, TEXT_CACHE_PATH, default_title, write_feeds
+from images import ImageIndex, IMAGES_PATH
+from console import console, QUIET, NORMAL, VERBOSE
+import depgraph
+from depgraph import DependencyGraph, DEPGRAPH_PATH
+import instrument
+import linkcheck
+from linkcheck import LinkChecker, LINKS_PATH, UrlIndex
+import rendercache
+from listings import generate_listings
+from manifest import BuildManifest, MANIFEST_PATH, hash_file
+from pageindex import PageIndex, PAGE_INDEX_PATH
+from parallel import generate_pages_parallel, report_throughput
+from report import BuildReport, REPORT_PATH
+from server import serve
+from source import MarkdownSource
+from template import Template
 
 def remove_tree(dst: str):
 	"""
@@ -36,7 +37,7 @@ def remove_tree(dst: str):
 	if os.path.exists(dst):
 		shutil.rmtree(dst)
 	else:
-		print("Directory {dst} does not exist. Nothing to delete!")
+		console.debug("Directory %s does not exist. Nothing to delete!", dst)
 
 def extract_title(markdown):
 	md_blocks = markdown_to_blocks(markdown)
@@ -46,8 +47,21 @@ def extract_title(markdown):
 			return heading_text
 		raise ValueError("No h1 heading could be found!")
 	
-def generate_page_recursive(dir_path_content, template_path, dest_dir_path):
+def output_path(dest_path: str) -> str:
+	"""
+	Map a destination path of a markdown file to the html file it renders to.
+	"""
+	path, file_name = os.path.split(dest_path)
+	file_name = file_name.split(".", 1)[0] + ".html"
+	return os.path.join(path, file_name)
 
+def collect_pages(dir_path_content, dest_dir_path) -> list[tuple[str, str]]:
+	"""
+	Walk the content tree and return one (from_path, dest_path) work item
+	per markdown file. Output directories are created along the way so the
+	items can be rendered in any order.
+	"""
+	pages = []
 	root = os.path.abspath(".")
 	dir_path = os.path.join(root, dir_path_content)
 	dst_path = os.path.join(root, dest_dir_path)
@@ -55,55 +69,573 @@ def generate_page_recursive(dir_path_content, template_path, dest_dir_path):
 		if not os.path.isfile(os.path.join(dir_path, item)):
 			if not os.path.exists(os.path.join(dst_path, item)):
 				os.mkdir(os.path.join(dst_path, item))
-			generate_page_recursive(
+			pages.extend(collect_pages(
 				dir_path_content=os.path.join(dir_path, item),
-				template_path=template_path,
 				dest_dir_path=os.path.join(dst_path, item)
-			)
+			))
 		else:
-			generate_page(
-				from_path=os.path.join(dir_path, item),
-				template_path=template_path,
-				dest_path=os.path.join(dst_path, item)
+			pages.append((
+				os.path.join(dir_path, item),
+				output_path(os.path.join(dst_path, item))
+			))
+	return pages
+
+@contextlib.contextmanager
+def collecting(dependencies: DependencyGraph=None, links: bool=False, text: bool=False):
+	"""
+	Point dependencies.collecting (and depgraph.active), linkcheck.collecting
+	and feeds.collecting at empty dicts while the body inside the with
+	statement renders pages, then reset them, also when rendering fails.
+	The body reads what was collected before it ends.
+
+	parameters:
+	* dependencies: the DependencyGraph to collect into, None for none
+	* links: whether to collect links
+	* text: whether to collect the text of the pages
+	"""
+	if dependencies is not None:
+		dependencies.collecting = {}
+		depgraph.active = dependencies
+	linkcheck.collecting = {} if links else None
+	feeds.collecting = {} if text else None
+	try:
+		yield
+	finally:
+		if dependencies is not None:
+			dependencies.collecting = None
+			depgraph.active = None
+		linkcheck.collecting = None
+		feeds.collecting = None
+
+def generate_page_recursive(
+		dir_path_content,
+		template_path,
+		dest_dir_path,
+		manifest: BuildManifest=None,
+		jobs: int=1,
+		index: PageIndex=None,
+		drafts: bool=False,
+		text_cache: TextCache=None,
+		dependencies: DependencyGraph=None,
+		links: LinkChecker=None):
+
+	pages = collect_pages(dir_path_content, dest_dir_path)
+	# Pages may pick their own template in the front matter
+	page_templates = {}
+	if index is not None:
+		index.scan(pages)
+		if not drafts:
+			published = [(from_path, dest_path) for from_path, dest_path in pages if not index.get(from_path)["draft"]]
+			console.count("drafts skipped", len(pages) - len(published))
+			pages = published
+		if links is not None:
+			links.keep(from_path for from_path, _ in pages)
+		for from_path, _ in pages:
+			page_templates[from_path] = index.get(from_path)["template"] or template_path
+		if dependencies is not None:
+			dependencies.bind(index, dest_dir_path)
+			dependencies.keep(index.pages)
+
+	if manifest is not None:
+		# The template hash is part of every page's key, so a
+		# template change invalidates all pages at once.
+		template_hashes = {
+			from_path: manifest.file_hash(page_templates.get(from_path, template_path))
+			for from_path, _ in pages
+		}
+		all_pages = len(pages)
+		stale = []
+		for from_path, dest_path in pages:
+			if (
+					not manifest.is_fresh(from_path, dest_path, template_hashes[from_path])
+					# A page whose text was never collected is rendered again for it
+					or (text_cache is not None and text_cache.get(from_path, manifest.file_hash(from_path)) is None)
+					# and so is one whose links or dependencies were never collected
+					or (links is not None and links.get(from_path) is None)
+					or (dependencies is not None and dependencies.get(from_path) is None)):
+				stale.append((from_path, dest_path))
+			elif dependencies is not None and dependencies.is_stale(from_path):
+				# Shows an include or a page title that changed
+				stale.append((from_path, dest_path))
+				console.count("pages rebuilt for dependencies")
+		pages = stale
+		console.count("pages unchanged", all_pages - len(pages))
+
+	if dependencies is not None:
+		# Pages whose titles are shown come before the pages showing them
+		pages = dependencies.order(pages)
+
+	# Compiled once and shared by every page of the build
+	template = Template.load(template_path)
+	with collecting(dependencies, links=links is not None, text=text_cache is not None):
+		if jobs > 1:
+			stats = generate_pages_parallel(pages, template_path, render=generate_page, jobs=jobs, template=template)
+			report_throughput(stats)
+		else:
+			for done, (from_path, dest_path) in enumerate(pages, 1):
+				generate_page(
+					from_path=from_path,
+					template_path=template_path,
+					dest_path=dest_path,
+					template=template
+					)
+				console.progress("pages", done, len(pages))
+		console.count("pages rendered", len(pages))
+
+		if text_cache is not None:
+			for source, text in feeds.collecting.items():
+				text_cache.put(source, hash_file(source), text)
+		if links is not None:
+			links.update(linkcheck.collecting)
+		if dependencies is not None:
+			dependencies.update(dependencies.collecting)
+
+	if manifest is not None:
+		for from_path, dest_path in pages:
+			manifest.record(from_path, dest_path, template_hashes[from_path])
+
+def generate_page(from_path, template_path, dest_path, template: Template=None):
+	"""
+	Render one markdown file into dest_path.
+	Pass a compiled template to share it across pages; otherwise
+	template_path is read and compiled for this page only. A template
+	named in the page's front matter takes precedence over both, and so
+	does a front matter title over the page's h1.
+	While a render cache is active (see rendercache), a page whose body
+	was rendered before is written from the cached html without parsing
+	it, and every other page below rendercache.MAX_ENTRY_BYTES of html is
+	stored in the cache as it is rendered.
+	While a dependency graph is active (see depgraph), the template,
+	includes and linked page titles the page shows are recorded into it,
+	and while links are checked (see linkcheck), so are the targets of
+	its links and images into linkcheck.collecting.
+	"""
+	console.debug("Generating page from %s to %s using %s", from_path, dest_path, template_path)
+
+	dest_path = output_path(dest_path)
+	probe = instrument.active
+	cache = rendercache.active
+	graph = depgraph.active
+	with (
+			probe.page(from_path, dest_path) if probe is not None else contextlib.nullcontext(),
+			graph.record(from_path) if graph is not None else contextlib.nullcontext() as dependencies,
+			linkcheck.collect(from_path, dest_path) if linkcheck.collecting is not None else contextlib.nullcontext() as links):
+		# The source is mapped and read block by block, and every block is
+		# converted and written before the next one is decoded, so neither the
+		# markdown nor the html of a page has to be held in memory as a whole.
+		# The render cache keeps a copy of the html only for pages below
+		# rendercache.MAX_ENTRY_BYTES.
+		with MarkdownSource(from_path) as source:
+			meta = source.front_matter
+			if meta["template"] is not None and meta["template"] != template_path:
+				template = Template.load(meta["template"])
+			elif template is None:
+				template = Template.load(template_path)
+			if dependencies is not None:
+				dependencies.append(("template", meta["template"] or template_path))
+
+			key = entry = None
+			if cache is not None:
+				key = rendercache.cache_key(source)
+				entry = cache.lookup(
+					key,
+					need_title=meta["title"] is None,
+					need_text=feeds.collecting is not None,
+					need_links=links is not None,
+					graph=graph
 				)
+			if entry is not None:
+				# Rendered before, in this checkout or another: the body is never parsed
+				title = meta["title"] or entry["title"]
+				if feeds.collecting is not None:
+					feeds.collecting[os.path.relpath(from_path)] = entry["text"]
+				for kind, target, _ in entry["dependencies"]:
+					utils.dependency_sink(kind, target)
+				if links is not None:
+					links.extend(entry["links"])
+				with open(dest_path, "w") as out:
+					template.write(probe.writer(out) if probe is not None else out, template.front_matter_values(meta), Title=title, Content=entry["html"])
+				return
 
-def generate_page(from_path, template_path, dest_path):
-	print(f"{30 * '#'}")
-	print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-	print(f"{30 * '#'}")
+			blocks = source.iter_blocks()
+			first_block = next(blocks, None)
+			if first_block is None:
+				title = meta["title"] or extract_title("")
+				content = MarkdownStream([])
+			else:
+				title = meta["title"] or extract_title("\n".join(first_block[1]))
+				content = MarkdownStream(itertools.chain([first_block], blocks))
+			if cache is not None:
+				content = rendercache.RecordingContent(content)
 
-	with open(from_path, "r") as f:
-		md = f.read()
+			with open(dest_path, "w") as out, feeds.collect(from_path) if feeds.collecting is not None else contextlib.nullcontext() as page_text:
+				template.write(probe.writer(out) if probe is not None else out, template.front_matter_values(meta), Title=title, Content=content)
+			if cache is not None and content.html is not None:
+				cache.put(
+					key,
+					content.html,
+					title=None if meta["title"] else title,
+					text=page_text.to_dict() if page_text is not None else None,
+					dependencies=graph.fingerprints(dependency for dependency in dependencies if dependency[0] != "template")
+					if graph is not None else (),
+					links=links
+				)
 
-	with open(template_path, "r") as f:
-		tmpl = f.read()
-	
-	title = extract_title(md)
-	node = markdown_to_html_node(md)
-	html = node.to_html()
 
-	tmpl = tmpl.replace("{{ Title }}", title)
-	tmpl = tmpl.replace("{{ Content }}", html)
 
-	path, file_name = os.path.split(dest_path)
-	file_name = file_name.split(".", 1)[0] + ".html"
-	dest_path = os.path.join(path, file_name)
-	with open(dest_path, "w") as f:
-		f.write(tmpl)
 
+def positive_int(value: str) -> int:
+	"""
+	argparse type for counts that must be at least 1.
+	"""
+	number = int(value)
+	if number < 1:
+		raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+	return number
 
+def non_negative_int(value: str) -> int:
+	"""
+	argparse type for sizes where 0 turns a feature off.
+	"""
+	number = int(value)
+	if number < 0:
+		raise argparse.ArgumentTypeError(f"must be at least 0, got {number}")
+	return number
 
+def positive_ints(value: str) -> list[int]:
+	"""
+	argparse type for a comma separated list of counts that must be at
+	least 1, e.g. "480,960".
 
-def main():
-	import time
-	remove_tree(dst="public")
-	copy_tree(src="static", dst="public")
-	root = os.path.abspath(".")
-	generate_page_recursive(
-		dir_path_content="content",
-		dest_dir_path="public",
-		template_path="template.html"
+	return:
+	* the distinct values, sorted
+	"""
+	return sorted({positive_int(item) for item in value.split(",") if item.strip()})
+
+def build(args: argparse.Namespace, report: BuildReport) -> BuildManifest:
+	"""
+	Run one full build with the options of main().
+
+	return:
+	* the saved build manifest
+	"""
+	if args.clean:
+		remove_tree(dst="public")
+		manifest = BuildManifest(MANIFEST_PATH)
+		index = PageIndex(PAGE_INDEX_PATH)
+		text_cache = TextCache(TEXT_CACHE_PATH) if args.feeds else None
+		dependencies = DependencyGraph(DEPGRAPH_PATH)
+		links = LinkChecker(LINKS_PATH) if args.check_links else None
+		# The widths are a setting rather than build state: they outlive --clean
+		images = ImageIndex(IMAGES_PATH, widths=ImageIndex.load(IMAGES_PATH).widths) if args.images else None
+	else:
+		manifest = BuildManifest.load(MANIFEST_PATH)
+		index = PageIndex.load(PAGE_INDEX_PATH)
+		text_cache = TextCache.load(TEXT_CACHE_PATH) if args.feeds else None
+		dependencies = DependencyGraph.load(DEPGRAPH_PATH)
+		links = LinkChecker.load(LINKS_PATH) if args.check_links else None
+		images = ImageIndex.load(IMAGES_PATH) if args.images else None
+	# Survives --clean: its entries depend on nothing but the markdown and the parser
+	cache = rendercache.RenderCache(args.render_cache, args.render_cache_size << 20) if args.render_cache else None
+	rendercache.active = cache
+	memo = utils.BlockMemo(args.block_memo) if args.block_memo else None
+	utils.block_memo = memo
+
+	with instrument.phase("assets"):
+		result = sync_tree(
+			src="static",
+			dst="public",
+			manifest=manifest,
+			checksum=args.checksum_assets,
+			hardlink=args.hardlink_assets
+		)
+	console.count("assets copied", len(result.copied))
+	console.count("assets linked", len(result.linked))
+	console.count("assets unchanged", len(result.unchanged))
+	if images is not None:
+		if args.image_widths is not None:
+			images.widths = args.image_widths
+		with instrument.phase("images"):
+			update = images.update("static", "public", manifest=manifest, jobs=args.jobs)
+		console.count("images read", len(update.read))
+		console.count("images unchanged", len(update.unchanged))
+		console.count("image variants written", len(update.variants_written))
+		# Pages show the sizes through the graph, which tracks them too
+		dependencies.images = images
+	with instrument.phase("pages"):
+		generate_page_recursive(
+			dir_path_content="content",
+			dest_dir_path="public",
+			template_path="template.html",
+			manifest=manifest,
+			jobs=args.jobs,
+			index=index,
+			drafts=args.drafts,
+			text_cache=text_cache,
+			dependencies=dependencies,
+			links=links
+		)
+	if args.listings:
+		with instrument.phase("listings"):
+			generate_listings(
+				index,
+				template_path="template.html",
+				dest_dir="public",
+				content_dir="content",
+				page_size=args.listing_page_size,
+				manifest=manifest
+			)
+	if text_cache is not None:
+		with instrument.phase("feeds"):
+			text_cache.keep(index.pages)
+			site_title = args.site_title if args.site_title is not None else default_title(index, "content")
+			for path in write_feeds(index, text_cache, args.base_url, site_title, dest_dir="public", author=args.site_author):
+				manifest.record_generated(path, "feeds")
+			text_cache.save()
+	if args.compress:
+		with instrument.phase("compress"):
+			report.section("compression").update(compress_outputs(manifest, jobs=args.jobs))
+	if cache is not None:
+		console.count("render cache hits", cache.hits)
+		report.section("render_cache").update({**cache.stats(), "evicted": cache.prune()})
+		cache.close()
+	if memo is not None:
+		report.section("block_memo").update({**memo.stats(), "entries": len(memo.entries)})
+	with instrument.phase("cleanup"):
+		for removed in manifest.remove_stale():
+			console.debug("Removed stale output %s", removed)
+			console.count("stale outputs removed")
+		manifest.save()
+		index.save()
+		dependencies.save()
+		if images is not None:
+			images.save()
+	if links is not None:
+		with instrument.phase("links"):
+			# Every output is written and every stale one removed by now
+			broken = links.check(UrlIndex.scan("public"))
+			linkcheck.report_broken(broken)
+			console.count("broken links", len(broken))
+			# The links themselves are in links.json
+			report.section("links").update({"broken": len(broken)})
+			links.save()
+	return manifest
+
+def main(argv: list[str]=None):
+	parser = argparse.ArgumentParser(description="Build the site from content/ and static/ into public/.")
+	parser.add_argument(
+		"--clean",
+		action="store_true",
+		help="remove public/ and the build manifest and rebuild everything"
+	)
+	parser.add_argument(
+		"--jobs",
+		type=positive_int,
+		default=1,
+		metavar="N",
+		help="render pages across N worker processes (default: 1, serial)"
+	)
+	parser.add_argument(
+		"--checksum-assets",
+		action="store_true",
+		help="compare static assets by content hash instead of modification time"
+	)
+	parser.add_argument(
+		"--hardlink-assets",
+		action="store_true",
+		help="hardlink static assets into public/ instead of copying them"
+	)
+	parser.add_argument(
+		"--no-compress",
+		dest="compress",
+		action="store_false",
+		help="do not write precompressed .gz siblings of html, css and other text outputs"
+	)
+	parser.add_argument(
+		"--drafts",
+		action="store_true",
+		help="also build pages marked draft: true in their front matter"
+	)
+	parser.add_argument(
+		"--listings",
+		action="store_true",
+		help="also write listing pages: <dir>/list/ per content directory, tags/<tag>/ and archive/<year>/"
+	)
+	parser.add_argument(
+		"--listing-page-size",
+		type=positive_int,
+		default=10,
+		metavar="N",
+		help="entries per listing page (default: 10)"
+	)
+	parser.add_argument(
+		"--feeds",
+		action="store_true",
+		help="also write sitemap.xml, an Atom feed (atom.xml) and a search index (search.json)"
+	)
+	parser.add_argument(
+		"--base-url",
+		default="http://localhost:8888",
+		help="absolute url the site is served from, for the sitemap and feed (default: http://localhost:8888)"
 	)
+	parser.add_argument(
+		"--site-title",
+		help="title of the Atom feed (default: the title of content/index.md)"
+	)
+	parser.add_argument(
+		"--site-author",
+		help="author named in the Atom feed (default: the site title)"
+	)
+	parser.add_argument(
+		"--render-cache",
+		default=os.environ.get("STATIC_SITE_RENDER_CACHE", rendercache.RENDER_CACHE_DIR),
+		metavar="DIR",
+		help="reuse the html of pages whose markdown body was rendered before, from DIR; "
+		"point several checkouts at one DIR to share it (default: $STATIC_SITE_RENDER_CACHE or .build/render-cache)"
+	)
+	parser.add_argument(
+		"--no-render-cache",
+		dest="render_cache",
+		action="store_const",
+		const=None,
+		help="parse and render every page that is rebuilt"
+	)
+	parser.add_argument(
+		"--render-cache-size",
+		type=non_negative_int,
+		default=rendercache.RENDER_CACHE_SIZE >> 20,
+		metavar="MB",
+		help="evict the least recently used pages once the render cache exceeds MB megabytes (default: 256)"
+	)
+	parser.add_argument(
+		"--block-memo",
+		type=non_negative_int,
+		default=utils.BLOCK_MEMO_SIZE,
+		metavar="N",
+		help="remember the html of the N most recently converted blocks, so blocks repeated across pages "
+		"are converted once (default: 4096, 0 to disable)"
+	)
+	parser.add_argument(
+		"--no-images",
+		dest="images",
+		action="store_false",
+		help="do not read the sizes of the images in static/ into the width and height of their img tags"
+	)
+	parser.add_argument(
+		"--image-widths",
+		type=positive_ints,
+		metavar="W,W,...",
+		help="also write downscaled copies of every PNG wider than each W pixels, as <name>-<W>w.png, "
+		"and list them in the srcset of its img tags; kept for later builds until given again, "
+		"\"\" for none (default: the widths of the last build, none at first)"
+	)
+	parser.add_argument(
+		"--no-check-links",
+		dest="check_links",
+		action="store_false",
+		help="do not check that the site links and images of every page point to a file in public/"
+	)
+	parser.add_argument(
+		"--strict-links",
+		action="store_true",
+		help="exit with an error after the build if a link or image is broken"
+	)
+	parser.add_argument(
+		"--watch",
+		action="store_true",
+		help="after building, keep running and rebuild whatever changes"
+	)
+	parser.add_argument(
+		"--serve",
+		action="store_true",
+		help="after building, serve public/ (with --watch, rebuild while serving)"
+	)
+	parser.add_argument(
+		"--port",
+		type=int,
+		default=8888,
+		help="port for --serve (default: 8888)"
+	)
+	verbosity = parser.add_mutually_exclusive_group()
+	verbosity.add_argument(
+		"-q",
+		"--quiet",
+		dest="level",
+		action="store_const",
+		const=QUIET,
+		default=NORMAL,
+		help="print errors only"
+	)
+	verbosity.add_argument(
+		"-v",
+		"--verbose",
+		dest="level",
+		action="store_const",
+		const=VERBOSE,
+		help="print every page and file as it is written"
+	)
+	parser.add_argument(
+		"--instrument",
+		action="store_true",
+		help="time every build stage and count blocks, inline nodes and bytes per page into .build/report.json"
+	)
+	parser.add_argument(
+		"--profile",
+		metavar="PATH",
+		help="run the build under cProfile and dump the stats to PATH (read them with pstats)"
+	)
+	args = parser.parse_args(argv)
+	console.configure(args.level)
+	console.reset()
+
+	report = BuildReport(REPORT_PATH)
+	probe = instrument.Instrumentation() if args.instrument else None
+	profiler = cProfile.Profile() if args.profile else None
+	if probe is not None:
+		probe.install()
+	if profiler is not None:
+		profiler.enable()
+	try:
+		manifest = build(args, report)
+	finally:
+		if profiler is not None:
+			profiler.disable()
+			profiler.dump_stats(args.profile)
+			console.info("Wrote profile to %s", args.profile)
+		if probe is not None:
+			probe.uninstall()
+		rendercache.active = None
+		utils.block_memo = None
+	if probe is not None:
+		data = probe.to_dict()
+		report.section("instrument").update(data)
+		instrument.report_stages(data)
+	report.save()
+	console.summary()
+	if args.strict_links and console.counters.get("broken links"):
+		raise SystemExit(f"{console.counters['broken links']} broken links")
+
+	if args.watch or args.serve:
+		# watch builds on the functions of this module, so import it late
+		from watch import BuildGraph, watch
+		graph = BuildGraph(
+			manifest=manifest,
+			compress=args.compress,
+			check_links=args.check_links,
+			images=args.images,
+			image_widths=args.image_widths,
+			drafts=args.drafts,
+			listings=args.listings,
+			listing_page_size=args.listing_page_size,
+			feeds=args.feeds,
+			base_url=args.base_url,
+			site_title=args.site_title,
+			site_author=args.site_author
+		) if args.watch else None
+		if args.serve:
+			serve("public", port=args.port, graph=graph)
+		else:
+			watch(graph)
 
 if __name__ == "__main__":
 	main()
\ No newline at end of file
@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+
+MANIFEST_PATH = ".build/manifest.json"
+MANIFEST_VERSION = 1
+
+
+def hash_file(path: str) -> str:
+	"""
+	Return the sha256 hex digest of a file, read in chunks so
+	large assets never have to fit into memory.
+	"""
+	digest = hashlib.sha256()
+	with open(path, "rb") as f:
+		for chunk in iter(lambda: f.read(1 << 16), b""):
+			digest.update(chunk)
+	return digest.hexdigest()
+
+
+class BuildManifest:
+	"""
+	Persistent record of the last build.
+
+	For every output under public/ we remember which source produced it,
+	the hash of that source, the hash of the template it was rendered with
+	(None for static assets) and the hash, size and mtime of the output
+	itself. An output is only rebuilt when one of those hashes changes, and
+	outputs that were not produced by the current build are removed at the
+	end. The output is only hashed again when its size or mtime differs
+	from the recorded one.
+
+	Example manifest.json:
+	{
+		"version": 1,
+		"template": "3f1c...",
+		"outputs": {
+			"public/majesty/index.html": {
+				"source": "content/majesty/index.md",
+				"source_hash": "9ab2...",
+				"template_hash": "3f1c...",
+				"hash": "77e0...",
+				"size": 5120,
+				"mtime_ns": 1717000000000000000
+			}
+		}
+	}
+	"""
+
+	def __init__(self, path: str=MANIFEST_PATH):
+		self.path = path
+		self.template = None
+		self.outputs = {}
+		# Outputs confirmed or written during the current build
+		self.seen = set()
+		self._hashes = {}
+
+	@classmethod
+	def load(cls, path: str=MANIFEST_PATH) -> "BuildManifest":
+		manifest = cls(path)
+		if not os.path.exists(path):
+			return manifest
+		with open(path, "r") as f:
+			try:
+				data = json.load(f)
+			except json.JSONDecodeError:
+				return manifest
+		if data.get("version") != MANIFEST_VERSION:
+			return manifest
+		manifest.template = data.get("template")
+		manifest.outputs = data.get("outputs", {})
+		return manifest
+
+	def save(self):
+		directory = os.path.dirname(self.path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		data = {
+			"version": MANIFEST_VERSION,
+			"template": self.template,
+			"outputs": self.outputs,
+		}
+		tmp_path = f"{self.path}.tmp"
+		with open(tmp_path, "w") as f:
+			json.dump(data, f, indent=1, sort_keys=True)
+		os.replace(tmp_path, self.path)
+
+	def file_hash(self, path: str, refresh: bool=False) -> str:
+		"""
+		Hash a file at most once per build.
+		Pass refresh=True when the file is known to have changed since.
+		"""
+		key = os.path.relpath(path)
+		if refresh or key not in self._hashes:
+			self._hashes[key] = hash_file(path)
+		return self._hashes[key]
+
+	def _output_fields(self, dst: str) -> dict:
+		"""
+		The hash, size and mtime of an output that has just been written.
+		"""
+		stat = os.stat(dst)
+		return {"hash": hash_file(dst), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+	def _output_unchanged(self, entry: dict, dst: str) -> bool:
+		"""
+		True if dst still holds the output recorded in entry. dst is only
+		hashed when its size or mtime changed, e.g. it was touched or edited
+		by hand; if the hash still matches, the new size and mtime are
+		recorded so the next build can skip the hash.
+		"""
+		stat = os.stat(dst)
+		if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+			return True
+		if entry["hash"] != hash_file(dst):
+			return False
+		entry["size"] = stat.st_size
+		entry["mtime_ns"] = stat.st_mtime_ns
+		return True
+
+	def is_fresh(self, src: str, dst: str, template_hash: str=None) -> bool:
+		"""
+		True if dst was built from the current contents of src (and the
+		current template) and has not been touched since.
+		A fresh output is marked as seen so it survives remove_stale().
+		"""
+		dst_key = os.path.relpath(dst)
+		entry = self.outputs.get(dst_key)
+		if entry is None:
+			return False
+		# An output skipped on purpose stays fresh while it is absent
+		skipped = entry.get("skipped", False)
+		if os.path.isfile(dst) == skipped:
+			return False
+		if entry["source"] != os.path.relpath(src):
+			return False
+		if entry["template_hash"] != template_hash:
+			return False
+		if entry["source_hash"] != self.file_hash(src):
+			return False
+		if not skipped and not self._output_unchanged(entry, dst):
+			return False
+		self.seen.add(dst_key)
+		return True
+
+	def record(self, src: str, dst: str, template_hash: str=None):
+		"""
+		Remember that dst has just been written from src.
+		"""
+		dst_key = os.path.relpath(dst)
+		self.outputs[dst_key] = {
+			"source": os.path.relpath(src),
+			"source_hash": self.file_hash(src),
+			"template_hash": template_hash,
+			**self._output_fields(dst),
+		}
+		self.seen.add(dst_key)
+		if template_hash is not None:
+			self.template = template_hash
+
+	def record_skipped(self, src: str, dst: str):
+		"""
+		Remember that dst was deliberately not written from src, e.g. a
+		compressed sibling that would not have been smaller than src.
+		is_fresh holds for it while src is unchanged and dst is absent.
+		"""
+		dst_key = os.path.relpath(dst)
+		self.outputs[dst_key] = {
+			"source": os.path.relpath(src),
+			"source_hash": self.file_hash(src),
+			"template_hash": None,
+			"hash": None,
+			"skipped": True,
+		}
+		self.seen.add(dst_key)
+
+	def record_asset(self, src: str, dst: str, content_hash: str=None):
+		"""
+		Remember that dst mirrors the static asset src.
+		Assets are kept in sync by size and mtime (see assets.sync_tree),
+		so their hashes are only known when a checksum sync computed them.
+		"""
+		dst_key = os.path.relpath(dst)
+		self.outputs[dst_key] = {
+			"source": os.path.relpath(src),
+			"source_hash": content_hash,
+			"template_hash": None,
+			"hash": content_hash,
+		}
+		self.seen.add(dst_key)
+
+	def is_fresh_generated(self, dst: str, key: str, template_hash: str=None) -> bool:
+		"""
+		Like is_fresh, for outputs that have no source file of their own,
+		e.g. listing pages. key stands in for the source hash: it must
+		change whenever anything the output is made of changes.
+		"""
+		dst_key = os.path.relpath(dst)
+		entry = self.outputs.get(dst_key)
+		if entry is None or not os.path.isfile(dst):
+			return False
+		if entry["source"] is not None or entry["source_hash"] != key:
+			return False
+		if entry["template_hash"] != template_hash:
+			return False
+		if not self._output_unchanged(entry, dst):
+			return False
+		self.seen.add(dst_key)
+		return True
+
+	def record_generated(self, dst: str, key: str, template_hash: str=None):
+		"""
+		Remember that dst has just been written from the inputs summed up by key.
+		"""
+		dst_key = os.path.relpath(dst)
+		self.outputs[dst_key] = {
+			"source": None,
+			"source_hash": key,
+			"template_hash": template_hash,
+			**self._output_fields(dst),
+		}
+		self.seen.add(dst_key)
+
+	def remove_stale(self) -> list[str]:
+		"""
+		Delete every output of the previous build that was not produced
+		by this one, together with directories left empty by it.
+
+		return:
+		* list of removed output paths
+		"""
+		removed = []
+		for dst_key in sorted(set(self.outputs) - self.seen):
+			if self.remove_output(dst_key):
+				removed.append(dst_key)
+		return removed
+
+	def remove_output(self, dst: str) -> bool:
+		"""
+		Forget an output and delete it, together with directories left
+		empty by it.
+
+		return:
+		* True if a file was deleted
+		"""
+		dst_key = os.path.relpath(dst)
+		self.outputs.pop(dst_key, None)
+		self.seen.discard(dst_key)
+		if not os.path.isfile(dst_key):
+			return False
+		os.remove(dst_key)
+		directory = os.path.dirname(dst_key)
+		while directory and os.path.isdir(directory) and not os.listdir(directory):
+			os.rmdir(directory)
+			directory = os.path.dirname(directory)
+		return True
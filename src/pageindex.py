@@ -0,0 +1,140 @@
+import json
+import os
+
+from frontmatter import read_header
+
+PAGE_INDEX_PATH = ".build/pages.json"
+PAGE_INDEX_VERSION = 1
+
+
+class PageIndex:
+	"""
+	The metadata of every page of the site, kept between builds.
+
+	scan() reads the front matter (and, for pages without a title, the
+	first heading) of every page whose size or mtime changed since the
+	last build; unchanged pages are answered from the saved index. The
+	markdown bodies are never read, so listings, feeds and sitemaps can
+	query the whole site for the price of a stat per page.
+
+	Example pages.json:
+	{
+		"version": 1,
+		"pages": {
+			"content/majesty/index.md": {
+				"source": "content/majesty/index.md",
+				"output": "public/majesty/index.html",
+				"mtime_ns": 1718000000000000000,
+				"size": 2048,
+				"title": "The Unparalleled Majesty",
+				"date": "2024-06-10",
+				"tags": ["tolkien"],
+				"draft": false,
+				"template": null
+			}
+		}
+	}
+	"""
+
+	def __init__(self, path: str=PAGE_INDEX_PATH):
+		self.path = path
+		self.pages = {}
+
+	@classmethod
+	def load(cls, path: str=PAGE_INDEX_PATH) -> "PageIndex":
+		index = cls(path)
+		if not os.path.exists(path):
+			return index
+		with open(path, "r") as f:
+			try:
+				data = json.load(f)
+			except json.JSONDecodeError:
+				return index
+		if data.get("version") != PAGE_INDEX_VERSION:
+			return index
+		index.pages = data.get("pages", {})
+		return index
+
+	def save(self):
+		directory = os.path.dirname(self.path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		data = {"version": PAGE_INDEX_VERSION, "pages": self.pages}
+		tmp_path = f"{self.path}.tmp"
+		with open(tmp_path, "w") as f:
+			json.dump(data, f, indent=1, sort_keys=True)
+		os.replace(tmp_path, self.path)
+
+	def scan(self, pages: list[tuple[str, str]]) -> list[str]:
+		"""
+		Bring the index up to date with the given work items and forget
+		pages that are gone.
+
+		parameters:
+		* pages: list of (from_path, dest_path), e.g. from collect_pages
+
+		return:
+		* list of sources whose header was (re)read
+		"""
+		changed = []
+		current = {}
+		for from_path, dest_path in pages:
+			entry = self.update(from_path, dest_path)
+			if entry is not None:
+				changed.append(entry["source"])
+			key = os.path.relpath(from_path)
+			current[key] = self.pages[key]
+		self.pages = current
+		return changed
+
+	def update(self, from_path: str, dest_path: str) -> dict:
+		"""
+		Re-read the header of one page if it changed.
+
+		return:
+		* the new entry, or None if the indexed one is still current
+		"""
+		key = os.path.relpath(from_path)
+		stat = os.stat(from_path)
+		entry = self.pages.get(key)
+		output = os.path.relpath(dest_path)
+		if entry is not None and (entry["mtime_ns"], entry["size"]) == (stat.st_mtime_ns, stat.st_size):
+			entry["output"] = output
+			return None
+		entry = {
+			**read_header(from_path),
+			"source": key,
+			"output": output,
+			"mtime_ns": stat.st_mtime_ns,
+			"size": stat.st_size,
+		}
+		self.pages[key] = entry
+		return entry
+
+	def remove(self, from_path: str):
+		self.pages.pop(os.path.relpath(from_path), None)
+
+	def get(self, from_path: str) -> dict:
+		return self.pages.get(os.path.relpath(from_path))
+
+	def published(self) -> list[dict]:
+		"""
+		return:
+		* the entries of all pages that are not drafts, newest first;
+		  pages without a date come last, by source path
+		"""
+		entries = [entry for entry in self.pages.values() if not entry["draft"]]
+		entries.sort(key=lambda entry: entry["source"])
+		entries.sort(key=lambda entry: entry["date"] or "", reverse=True)
+		return entries
+
+	def tags(self) -> dict[str, list[dict]]:
+		"""
+		return:
+		* dict of tag to the published entries carrying it, newest first
+		"""
+		tags = {}
+		for entry in self.published():
+			for tag in entry["tags"]:
+				tags.setdefault(tag, []).append(entry)
+		return tags
@@ -0,0 +1,227 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, NamedTuple
+
+import depgraph
+import feeds
+import instrument
+import linkcheck
+import rendercache
+import utils
+from console import console
+
+
+class WorkerStats:
+	"""
+	Pages rendered and time spent rendering by one worker process.
+	"""
+
+	def __init__(self, pid: int, pages: int=0, seconds: float=0.0):
+		self.pid = pid
+		self.pages = pages
+		self.seconds = seconds
+
+	def pages_per_second(self) -> float:
+		if self.seconds == 0:
+			return 0.0
+		return self.pages / self.seconds
+
+	def __repr__(self) -> str:
+		return f"WorkerStats(pid={self.pid}, pages={self.pages}, seconds={self.seconds:.3f})"
+
+
+class BatchOptions(NamedTuple):
+	"""
+	What every batch of a parallel build is rendered with, shipped to the
+	worker along with the batch.
+
+	* render: the page function, called as render(from_path, template_path, dest_path, template)
+	* template_path: path to the html template
+	* template: the compiled template
+	* instrumented: collect stage timings and page counters
+	* collect_text: collect the PageText of every page for the search index
+	* render_cache: the RenderCache of the build, or None
+	* block_memo_size: max_entries of the worker's BlockMemo, 0 for none
+	* graph: the DependencyGraph of the build, to record the dependencies of every page
+	* collect_links: collect the link and image targets of every page for the link check
+	"""
+	render: Callable
+	template_path: str
+	template: object = None
+	instrumented: bool = False
+	collect_text: bool = False
+	render_cache: rendercache.RenderCache = None
+	block_memo_size: int = 0
+	graph: depgraph.DependencyGraph = None
+	collect_links: bool = False
+
+
+class BatchResult(NamedTuple):
+	"""
+	What a worker sends back for one batch.
+
+	* pid: the worker process
+	* pages: number of pages rendered
+	* seconds: time spent rendering them
+	* timings: Instrumentation.to_dict(), or None when not instrumented
+	* texts: feeds.collecting, or None
+	* counters: dict of "render_cache" and "block_memo" to their stats()
+	* dependencies: DependencyGraph.collecting, or None
+	* links: linkcheck.collecting, or None
+	"""
+	pid: int
+	pages: int
+	seconds: float
+	timings: dict
+	texts: dict
+	counters: dict
+	dependencies: dict
+	links: dict
+
+
+def render_batch(batch: list[tuple[str, str]], options: BatchOptions) -> BatchResult:
+	"""
+	Render one batch of pages inside a worker process.
+
+	parameters:
+	* batch: list of (from_path, dest_path) work items
+	* options: the BatchOptions of the build
+	"""
+	probe = None
+	if options.instrumented:
+		# A forked worker inherits the instrumentation of the parent,
+		# a spawned one has to install its own
+		probe = instrument.active
+		if probe is None:
+			probe = instrument.Instrumentation()
+			probe.install()
+		probe.reset()
+	feeds.collecting = {} if options.collect_text else None
+	linkcheck.collecting = {} if options.collect_links else None
+	graph = options.graph
+	depgraph.active = graph
+	if graph is not None:
+		graph.collecting = {}
+	render_cache = options.render_cache
+	rendercache.active = render_cache
+	if render_cache is not None:
+		render_cache.reset()
+	block_memo_size = options.block_memo_size
+	if not block_memo_size:
+		utils.block_memo = None
+	elif utils.block_memo is None or utils.block_memo.max_entries != block_memo_size:
+		utils.block_memo = utils.BlockMemo(block_memo_size)
+	# A worker keeps its memo across batches; only the counters are per batch
+	if utils.block_memo is not None:
+		utils.block_memo.reset()
+	start = time.perf_counter()
+	for from_path, dest_path in batch:
+		options.render(from_path=from_path, template_path=options.template_path, dest_path=dest_path, template=options.template)
+	counters = {}
+	if render_cache is not None:
+		render_cache.close()
+		counters["render_cache"] = render_cache.stats()
+	if utils.block_memo is not None:
+		counters["block_memo"] = utils.block_memo.stats()
+	seconds = time.perf_counter() - start
+	# Verbose lines buffered by this worker
+	console.flush()
+	return BatchResult(
+		pid=os.getpid(),
+		pages=len(batch),
+		seconds=seconds,
+		timings=probe.to_dict() if probe is not None else None,
+		texts=feeds.collecting,
+		counters=counters,
+		dependencies=graph.collecting if graph is not None else None,
+		links=linkcheck.collecting
+	)
+
+
+def make_batches(pages: list, jobs: int, batch_size: int=None) -> list[list]:
+	"""
+	Split the work items into batches. By default every worker gets about
+	four batches, which keeps the pool busy when page sizes vary without
+	paying the per-task overhead for every single page.
+	"""
+	if batch_size is None:
+		batch_size = max(1, -(-len(pages) // (jobs * 4)))
+	return [pages[i:i + batch_size] for i in range(0, len(pages), batch_size)]
+
+
+def generate_pages_parallel(
+		pages: list[tuple[str, str]],
+		template_path: str,
+		render,
+		jobs: int,
+		batch_size: int=None,
+		template=None) -> dict[int, WorkerStats]:
+	"""
+	Render the work items across a ProcessPoolExecutor.
+	Every page is rendered by the same render function as the serial path,
+	so the output is byte-identical; only the scheduling differs.
+	While instrumentation is active, the timings of the workers are merged
+	into it, and so are the page texts collected for the search index,
+	the counters of the render cache and the block memo, the
+	dependencies recorded for the dependency graph and the links
+	collected for the link check.
+
+	return:
+	* dict of worker pid to WorkerStats
+	"""
+	stats = {}
+	if not pages:
+		return stats
+
+	probe = instrument.active
+	collected = feeds.collecting
+	cache = rendercache.active
+	memo = utils.block_memo
+	graph = depgraph.active
+	links = linkcheck.collecting
+	options = BatchOptions(
+		render=render,
+		template_path=template_path,
+		template=template,
+		instrumented=probe is not None,
+		collect_text=collected is not None,
+		render_cache=cache,
+		block_memo_size=memo.max_entries if memo is not None else 0,
+		graph=graph,
+		collect_links=links is not None
+	)
+	with ProcessPoolExecutor(max_workers=jobs) as executor:
+		futures = [executor.submit(render_batch, batch, options) for batch in make_batches(pages, jobs, batch_size)]
+		done = 0
+		for future in futures:
+			result = future.result()
+			if result.texts is not None:
+				collected.update(result.texts)
+			if result.links is not None:
+				links.update(result.links)
+			if result.dependencies is not None:
+				graph.collecting.update(result.dependencies)
+			if "render_cache" in result.counters:
+				cache.merge(result.counters["render_cache"])
+			if "block_memo" in result.counters:
+				memo.merge(result.counters["block_memo"])
+			done += result.pages
+			console.progress("pages", done, len(pages))
+			if result.timings is not None:
+				probe.merge(result.timings)
+			worker = stats.setdefault(result.pid, WorkerStats(result.pid))
+			worker.pages += result.pages
+			worker.seconds += result.seconds
+	return stats
+
+
+def report_throughput(stats: dict[int, WorkerStats]):
+	"""
+	Log the per-worker throughput of a parallel build, at the normal level
+	so an uneven split shows without -v.
+	"""
+	total_pages = sum(worker.pages for worker in stats.values())
+	console.info("Rendered %d pages across %d workers", total_pages, len(stats))
+	for worker in sorted(stats.values(), key=lambda w: w.pid):
+		console.info("worker %d: %d pages in %.3fs (%.1f pages/s)", worker.pid, worker.pages, worker.seconds, worker.pages_per_second())
@@ -0,0 +1,270 @@
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import frontmatter
+import htmlnode
+from htmlnode import Fragments
+import source
+import textnode
+import utils
+
+RENDER_CACHE_DIR = ".build/render-cache"
+RENDER_CACHE_FILE = "pages.sqlite3"
+# Bump when the table changes; older databases are emptied
+RENDER_CACHE_SCHEMA = 3
+RENDER_CACHE_SIZE = 256 << 20
+# New entries are inserted once this much html is waiting
+PENDING_BYTES = 8 << 20
+# Pages rendering to more html than this are not cached, so recording
+# them does not hold their whole html in memory
+MAX_ENTRY_BYTES = 1 << 20
+
+# The RenderCache of the running build, or None when caching is off
+active = None
+
+
+@functools.lru_cache(maxsize=None)
+def parser_version() -> bytes:
+	"""
+	Hash of the code that turns markdown into html. Part of every cache
+	key, so a checkout with a different parser never reuses the html of
+	this one.
+	"""
+	digest = hashlib.sha256()
+	for module in (frontmatter, htmlnode, source, textnode, utils):
+		with open(module.__file__, "rb") as f:
+			digest.update(f.read())
+	return digest.digest()
+
+
+class RenderCache:
+	"""
+	On-disk cache of rendered page content, keyed by the hash of the
+	markdown body (front matter excluded) and the parser version.
+
+	Every entry holds the content html of a page, the title taken from its
+	h1, the includes and linked page titles the html shows (with their
+	fingerprints, see depgraph) and, once a build asked for them, the text
+	collected for the search index and the targets of its links and
+	images (see linkcheck). The entries live in one sqlite database in directory, which
+	several checkouts (and the worker processes of a parallel build) can
+	share. New entries are buffered and inserted a few megabytes at a time
+	in one short transaction each, so a cold build pays for a handful of
+	commits rather than a file per page. The database is kept below
+	max_bytes of html by evicting the least recently used entries.
+
+	Example:
+	cache = RenderCache("~/.cache/static-site")
+	entry = cache.lookup(key)
+	# {"title": "Home", "text": None, "dependencies": [], "links": None, "html": "<div>...</div>"}
+	"""
+
+	def __init__(self, directory: str=RENDER_CACHE_DIR, max_bytes: int=RENDER_CACHE_SIZE):
+		self.directory = os.path.expanduser(directory)
+		self.path = os.path.join(self.directory, RENDER_CACHE_FILE)
+		self.max_bytes = max_bytes
+		self.hits = 0
+		self.misses = 0
+		self._db = None
+		self._pending = []
+		self._pending_bytes = 0
+		self._used = set()
+
+	def __getstate__(self) -> dict:
+		# Worker processes open their own connection
+		return {**self.__dict__, "_db": None, "_pending": [], "_pending_bytes": 0, "_used": set()}
+
+	def connect(self) -> sqlite3.Connection:
+		if self._db is None:
+			os.makedirs(self.directory, exist_ok=True)
+			self._db = sqlite3.connect(self.path, timeout=60)
+			self._db.execute("PRAGMA journal_mode=WAL")
+			self._db.execute("PRAGMA synchronous=NORMAL")
+			with self._db:
+				if self._db.execute("PRAGMA user_version").fetchone()[0] != RENDER_CACHE_SCHEMA:
+					self._db.execute("DROP TABLE IF EXISTS pages")
+					self._db.execute(f"PRAGMA user_version = {RENDER_CACHE_SCHEMA}")
+				self._db.execute(
+					"CREATE TABLE IF NOT EXISTS pages ("
+					"key TEXT PRIMARY KEY, title TEXT, text TEXT, dependencies TEXT, links TEXT, html TEXT NOT NULL, "
+					"size INTEGER NOT NULL, used REAL NOT NULL)"
+				)
+				self._db.execute("CREATE INDEX IF NOT EXISTS pages_used ON pages (used)")
+		return self._db
+
+	def get(self, key: str) -> dict:
+		"""
+		return:
+		* the entry stored under key
+		* None on a miss
+		"""
+		row = self.connect().execute("SELECT title, text, dependencies, links, html FROM pages WHERE key = ?", (key,)).fetchone()
+		if row is None:
+			return None
+		self._used.add(key)
+		title, text, dependencies, links, html = row
+		return {
+			"title": title,
+			"text": json.loads(text) if text is not None else None,
+			"dependencies": json.loads(dependencies),
+			"links": json.loads(links) if links is not None else None,
+			"html": html,
+		}
+
+	def lookup(self, key: str, need_title: bool=False, need_text: bool=False, need_links: bool=False, graph=None) -> dict:
+		"""
+		Like get(), but counted, and an entry that lacks the title, the
+		collected text or the links the caller needs is a miss. A page is
+		stored without its h1 title when its front matter has one, without
+		its text when it was rendered by a build without --feeds and
+		without its links when links were not checked.
+		So is an entry whose html shows an include or page title that
+		changed since, as told by graph (a depgraph.DependencyGraph).
+		"""
+		entry = self.get(key)
+		if (
+				entry is None
+				or (need_title and entry["title"] is None)
+				or (need_text and entry["text"] is None)
+				or (need_links and entry["links"] is None)
+				or (entry["dependencies"] and (graph is None or not graph.is_fresh(entry["dependencies"])))):
+			self.misses += 1
+			return None
+		self.hits += 1
+		return entry
+
+	def reset(self):
+		self.hits = 0
+		self.misses = 0
+
+	def stats(self) -> dict:
+		return {"hits": self.hits, "misses": self.misses}
+
+	def merge(self, stats: dict):
+		"""
+		Add the counters of a worker process to this cache's.
+		"""
+		self.hits += stats["hits"]
+		self.misses += stats["misses"]
+
+	def put(self, key: str, html: str, title: str=None, text: dict=None, dependencies: list=(), links: list=None):
+		"""
+		parameters:
+		* dependencies: list of (kind, target, fingerprint) the html depends on
+		* links: list of (url, include path or None) of the links and images in the html
+		"""
+		row = (
+			key,
+			title,
+			json.dumps(text) if text is not None else None,
+			json.dumps(list(dependencies)),
+			json.dumps(links) if links is not None else None,
+			html,
+			len(html)
+		)
+		self._pending.append(row)
+		self._pending_bytes += len(html)
+		if self._pending_bytes >= PENDING_BYTES:
+			self.flush()
+
+	def flush(self):
+		"""
+		Insert the pending entries and mark the entries read since the last
+		flush as used.
+		"""
+		if not self._pending and not self._used:
+			return
+		now = time.time()
+		db = self.connect()
+		with db:
+			db.executemany(
+				"INSERT OR REPLACE INTO pages (key, title, text, dependencies, links, html, size, used) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+				[(*row, now) for row in self._pending]
+			)
+			db.executemany("UPDATE pages SET used = ? WHERE key = ?", [(now, key) for key in self._used])
+		self._pending = []
+		self._pending_bytes = 0
+		self._used = set()
+
+	def prune(self) -> int:
+		"""
+		Delete the least recently used entries until the html in the cache
+		is below max_bytes. Pending entries are inserted first.
+
+		return:
+		* number of entries deleted
+		"""
+		self.flush()
+		db = self.connect()
+		total = db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+		if total <= self.max_bytes:
+			return 0
+		evicted = []
+		for key, size in db.execute("SELECT key, size FROM pages ORDER BY used"):
+			if total <= self.max_bytes:
+				break
+			evicted.append((key,))
+			total -= size
+		with db:
+			db.executemany("DELETE FROM pages WHERE key = ?", evicted)
+		return len(evicted)
+
+	def close(self):
+		self.flush()
+		if self._db is not None:
+			self._db.close()
+			self._db = None
+
+
+def cache_key(markdown_source: source.MarkdownSource) -> str:
+	return markdown_source.body_digest(parser_version())
+
+
+class RecordingContent:
+	"""
+	Wraps page content (e.g. a MarkdownStream) for Template.write. The html
+	is streamed to the output as it renders and kept on the side, to be
+	stored in the cache afterwards. Past max_bytes (MAX_ENTRY_BYTES by
+	default) what was kept is dropped, and html stays None: the page is
+	too large to be worth caching, and keeping it would undo the
+	streaming.
+	"""
+
+	def __init__(self, content, max_bytes: int=None):
+		self.content = content
+		self.max_bytes = MAX_ENTRY_BYTES if max_bytes is None else max_bytes
+		self.html = None
+		self._out = None
+		self._fragments = None
+		self._size = 0
+
+	def write_html(self, out):
+		self._out = out
+		self._fragments = Fragments()
+		self._size = 0
+		self.content.write_html(self)
+		if self._fragments is not None:
+			self.html = "".join(self._fragments)
+		self._out = self._fragments = None
+
+	def write(self, text: str):
+		self._out.write(text)
+		if self._fragments is not None:
+			self._keep([text], len(text))
+
+	def writelines(self, lines):
+		lines = list(lines)
+		self._out.writelines(lines)
+		if self._fragments is not None:
+			self._keep(lines, sum(map(len, lines)))
+
+	def _keep(self, lines: list[str], size: int):
+		self._size += size
+		if self._size > self.max_bytes:
+			self._fragments = None
+		else:
+			self._fragments.extend(lines)
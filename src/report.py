@@ -0,0 +1,34 @@
+import json
+import os
+
+REPORT_PATH = ".build/report.json"
+
+
+class BuildReport:
+	"""
+	Machine-readable summary of one build, written to .build/report.json.
+	Every build stage adds its own section.
+
+	Example report.json:
+	{
+		"compression": {
+			"public/index.html": {"size": 1523, "gzip": 611, "gzip_ratio": 0.401}
+		}
+	}
+	"""
+
+	def __init__(self, path: str=REPORT_PATH):
+		self.path = path
+		self.sections = {}
+
+	def section(self, name: str) -> dict:
+		return self.sections.setdefault(name, {})
+
+	def save(self):
+		directory = os.path.dirname(self.path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		tmp_path = f"{self.path}.tmp"
+		with open(tmp_path, "w") as f:
+			json.dump(self.sections, f, indent=1, sort_keys=True)
+		os.replace(tmp_path, self.path)
@@ -0,0 +1,358 @@
+import asyncio
+import mimetypes
+import os
+import posixpath
+from collections import OrderedDict
+from urllib.parse import unquote, urlsplit
+
+from console import console
+
+# Precompressed siblings, in order of preference
+ENCODINGS = [("br", ".br"), ("zstd", ".zst"), ("gzip", ".gz")]
+
+REASONS = {
+	200: "OK",
+	206: "Partial Content",
+	301: "Moved Permanently",
+	304: "Not Modified",
+	400: "Bad Request",
+	404: "Not Found",
+	405: "Method Not Allowed",
+	416: "Range Not Satisfiable",
+}
+
+
+class CachedFile:
+	"""
+	One representation of a file under the served root: its body (None
+	when too large to be kept in memory), validators and content type.
+	"""
+	__slots__ = ("path", "body", "size", "mtime_ns", "etag", "content_type", "encoding")
+
+	def __init__(self, path: str, body: bytes, size: int, mtime_ns: int, content_type: str, encoding: str=None):
+		self.path = path
+		self.body = body
+		self.size = size
+		self.mtime_ns = mtime_ns
+		self.content_type = content_type
+		self.encoding = encoding
+		suffix = f"-{encoding}" if encoding else ""
+		self.etag = f'"{mtime_ns:x}-{size:x}{suffix}"'
+
+	def __repr__(self) -> str:
+		return f"CachedFile({self.path}, size={self.size}, encoding={self.encoding})"
+
+
+class FileCache:
+	"""
+	LRU cache of file representations, bounded by the total body size.
+	Keys are paths of the uncompressed files; each entry maps an encoding
+	(None for identity) to a CachedFile.
+	"""
+
+	def __init__(self, max_bytes: int=64 << 20, max_file_bytes: int=4 << 20):
+		self.max_bytes = max_bytes
+		self.max_file_bytes = max_file_bytes
+		self.entries = OrderedDict()
+		self.bytes = 0
+		self.hits = 0
+		self.misses = 0
+
+	def get(self, path: str, validate: bool=False) -> dict:
+		"""
+		return:
+		* dict of encoding to CachedFile for path, loaded from disk on a miss
+		* None if path is not a file
+		"""
+		entry = self.entries.get(path)
+		if entry is not None and validate and not self._is_current(entry):
+			self.invalidate([path])
+			entry = None
+		if entry is not None:
+			self.entries.move_to_end(path)
+			self.hits += 1
+			return entry
+
+		self.misses += 1
+		entry = self._load(path)
+		if entry is None:
+			return None
+		self.entries[path] = entry
+		self.bytes += self._entry_bytes(entry)
+		while self.bytes > self.max_bytes and len(self.entries) > 1:
+			_, evicted = self.entries.popitem(last=False)
+			self.bytes -= self._entry_bytes(evicted)
+		return entry
+
+	def invalidate(self, paths):
+		"""
+		Drop the entries of the given paths, e.g. the outputs of a rebuild.
+		Compressed siblings invalidate the file they belong to.
+		"""
+		for path in paths:
+			path = os.path.abspath(path)
+			for _, suffix in ENCODINGS:
+				if path.endswith(suffix):
+					path = path[:-len(suffix)]
+			entry = self.entries.pop(path, None)
+			if entry is not None:
+				self.bytes -= self._entry_bytes(entry)
+
+	def _load(self, path: str) -> dict:
+		try:
+			stat = os.stat(path)
+		except OSError:
+			return None
+		if not os.path.isfile(path):
+			return None
+		content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+		entry = {None: self._load_file(path, stat, content_type)}
+		for encoding, suffix in ENCODINGS:
+			try:
+				sibling_stat = os.stat(path + suffix)
+			except OSError:
+				continue
+			# A sibling older than its source is left over from an old build
+			if sibling_stat.st_mtime_ns >= stat.st_mtime_ns:
+				entry[encoding] = self._load_file(path + suffix, sibling_stat, content_type, encoding)
+		return entry
+
+	def _load_file(self, path: str, stat: os.stat_result, content_type: str, encoding: str=None) -> CachedFile:
+		body = None
+		if stat.st_size <= self.max_file_bytes:
+			with open(path, "rb") as f:
+				body = f.read()
+		return CachedFile(path, body, stat.st_size, stat.st_mtime_ns, content_type, encoding)
+
+	def _is_current(self, entry: dict) -> bool:
+		for cached in entry.values():
+			try:
+				stat = os.stat(cached.path)
+			except OSError:
+				return False
+			if (stat.st_mtime_ns, stat.st_size) != (cached.mtime_ns, cached.size):
+				return False
+		return True
+
+	@staticmethod
+	def _entry_bytes(entry: dict) -> int:
+		return sum(len(cached.body) for cached in entry.values() if cached.body is not None)
+
+
+def parse_range(header: str, size: int) -> tuple[int, int]:
+	"""
+	Parse a single-range Range header into inclusive (start, end) offsets.
+
+	return:
+	* (start, end) for a satisfiable range
+	* None if the header should be ignored (not bytes, or several ranges)
+	raises:
+	* ValueError if the range cannot be satisfied
+	"""
+	unit, _, spec = header.partition("=")
+	if unit.strip().lower() != "bytes" or "," in spec:
+		return None
+	first, dash, last = spec.strip().partition("-")
+	if not dash:
+		return None
+	try:
+		if first == "":
+			length = int(last)
+			if length <= 0:
+				raise ValueError("Empty suffix range")
+			return max(0, size - length), size - 1
+		start = int(first)
+		end = int(last) if last else size - 1
+	except ValueError:
+		raise ValueError(f"Invalid range {header}")
+	if start >= size or end < start:
+		raise ValueError(f"Unsatisfiable range {header}")
+	return start, min(end, size - 1)
+
+
+def accepted_encodings(header: str) -> set[str]:
+	encodings = set()
+	for item in header.split(","):
+		name, _, params = item.strip().partition(";")
+		if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+			continue
+		encodings.add(name.strip().lower())
+	return encodings
+
+
+class DevServer:
+	"""
+	An asyncio http server for the built site.
+
+	Serves GET and HEAD with keep-alive, from an LRU cache of file bodies.
+	Precompressed .br/.zst/.gz siblings are served to clients that accept them,
+	ETag/If-None-Match revalidation answers 304 and single byte ranges
+	answer 206.
+
+	With a BuildGraph the server also rebuilds the site as sources change
+	and drops exactly the rebuilt outputs from its cache; without one,
+	cached files are checked against the disk on every request.
+	"""
+
+	def __init__(self, root: str="public", cache: FileCache=None, graph=None, poll_interval: float=0.05):
+		self.root = os.path.abspath(root)
+		self.cache = cache if cache is not None else FileCache()
+		self.graph = graph
+		self.poll_interval = poll_interval
+
+	async def start(self, host: str="127.0.0.1", port: int=8888) -> asyncio.AbstractServer:
+		server = await asyncio.start_server(self.handle, host, port)
+		if self.graph is not None:
+			self._watcher = asyncio.create_task(self.watch_graph())
+		return server
+
+	async def watch_graph(self):
+		while True:
+			outputs = await asyncio.to_thread(self.graph.refresh)
+			if outputs:
+				self.cache.invalidate(outputs)
+			await asyncio.sleep(self.poll_interval)
+
+	async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+		try:
+			while True:
+				request_line = await reader.readline()
+				if not request_line:
+					break
+				headers = {}
+				while True:
+					line = await reader.readline()
+					if line in (b"\r\n", b"\n", b""):
+						break
+					name, _, value = line.decode("latin-1").partition(":")
+					headers[name.strip().lower()] = value.strip()
+
+				parts = request_line.decode("latin-1").split()
+				if len(parts) != 3:
+					await self.send(writer, 400, {}, b"Bad Request\n", "GET")
+					break
+				method, target, version = parts
+				connection = headers.get("connection", "").lower()
+				keep_alive = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+
+				await self.respond(writer, method, target, headers, keep_alive)
+				if not keep_alive:
+					break
+		except (ConnectionError, asyncio.IncompleteReadError):
+			pass
+		finally:
+			writer.close()
+
+	def resolve(self, target: str) -> str:
+		"""
+		Map a request target to a path below the root, or None if it
+		escapes the root.
+		"""
+		path = posixpath.normpath(unquote(urlsplit(target).path))
+		full_path = os.path.abspath(os.path.join(self.root, *[part for part in path.split("/") if part]))
+		if full_path != self.root and not full_path.startswith(self.root + os.sep):
+			return None
+		return full_path
+
+	async def respond(self, writer, method: str, target: str, headers: dict, keep_alive: bool):
+		base = {"Connection": "keep-alive" if keep_alive else "close"}
+		if method not in ("GET", "HEAD"):
+			await self.send(writer, 405, {**base, "Allow": "GET, HEAD"}, b"Method Not Allowed\n", method)
+			return
+
+		path = self.resolve(target)
+		if path is not None and os.path.isdir(path):
+			url_path = urlsplit(target).path
+			if not url_path.endswith("/"):
+				await self.send(writer, 301, {**base, "Location": url_path + "/"}, b"", method)
+				return
+			path = os.path.join(path, "index.html")
+
+		entry = self.cache.get(path, validate=self.graph is None) if path is not None else None
+		if entry is None:
+			await self.send(writer, 404, base, b"Not Found\n", method)
+			return
+
+		accepted = accepted_encodings(headers.get("accept-encoding", ""))
+		cached = entry[None]
+		for encoding, _ in ENCODINGS:
+			if encoding in entry and encoding in accepted:
+				cached = entry[encoding]
+				break
+
+		response_headers = {
+			**base,
+			"Content-Type": cached.content_type,
+			"ETag": cached.etag,
+			"Cache-Control": "no-cache",
+			"Accept-Ranges": "bytes",
+		}
+		if len(entry) > 1:
+			response_headers["Vary"] = "Accept-Encoding"
+		if cached.encoding:
+			response_headers["Content-Encoding"] = cached.encoding
+
+		if_none_match = headers.get("if-none-match")
+		if if_none_match and (if_none_match.strip() == "*" or cached.etag in [tag.strip() for tag in if_none_match.split(",")]):
+			await self.send(writer, 304, response_headers, b"", "HEAD")
+			return
+
+		status = 200
+		start, end = 0, cached.size - 1
+		if "range" in headers and cached.size > 0:
+			try:
+				byte_range = parse_range(headers["range"], cached.size)
+			except ValueError:
+				await self.send(writer, 416, {**base, "Content-Range": f"bytes */{cached.size}"}, b"", method)
+				return
+			if byte_range is not None:
+				status = 206
+				start, end = byte_range
+				response_headers["Content-Range"] = f"bytes {start}-{end}/{cached.size}"
+
+		if cached.body is None:
+			# Too large to be cached, so streamed from the disk
+			response_headers["Content-Length"] = str(end - start + 1)
+			await self.send(writer, status, response_headers, b"", method)
+			if method != "HEAD":
+				await self.send_file(writer, cached.path, start, end - start + 1)
+			return
+		body = cached.body if status == 200 else cached.body[start:end + 1]
+		await self.send(writer, status, response_headers, body, method)
+
+	@staticmethod
+	async def send_file(writer, path: str, offset: int, count: int):
+		"""
+		Write count bytes of path from offset to the client without
+		reading them into memory at once: loop.sendfile hands them to
+		os.sendfile where it can, and copies them a chunk at a time
+		otherwise.
+		"""
+		with open(path, "rb") as f:
+			await asyncio.get_running_loop().sendfile(writer.transport, f, offset, count)
+
+	async def send(self, writer, status: int, headers: dict, body: bytes, method: str):
+		headers.setdefault("Content-Length", str(len(body)))
+		head = [f"HTTP/1.1 {status} {REASONS[status]}", "Server: static-site"]
+		head.extend(f"{name}: {value}" for name, value in headers.items())
+		writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+		if method != "HEAD" and body:
+			writer.write(body)
+		await writer.drain()
+
+
+def serve(root: str="public", host: str="127.0.0.1", port: int=8888, graph=None):
+	"""
+	Serve root until interrupted.
+	"""
+	async def run():
+		server = await DevServer(root, graph=graph).start(host, port)
+		console.info("Serving %s/ on http://%s:%d/ (Ctrl+C to stop)", root, host, port)
+		async with server:
+			await server.serve_forever()
+
+	try:
+		asyncio.run(run())
+	except KeyboardInterrupt:
+		if graph is not None:
+			graph.manifest.save()
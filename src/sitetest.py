@@ -0,0 +1,74 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from main import main
+
+TEMPLATE = "<title>{{ Title }}</title>{{ Content }}"
+
+
+class SiteTestCase(unittest.TestCase):
+	"""
+	Base class of the tests that build a site.
+
+	Every test runs in a temporary directory of its own, made the working
+	directory, which starts out with an empty content/ and static/ and a
+	template.html of TEMPLATE. Subclasses write their files in setUp after
+	calling this one's, and pass the arguments every build of theirs needs
+	in build_args.
+
+	Example:
+	class TestBlog(SiteTestCase):
+		build_args = ("--no-compress",)
+
+		def setUp(self):
+			super().setUp()
+			self.write("content/index.md", "# Home")
+
+		def test_home(self):
+			self.build("--clean")
+			self.assertEqual(self.read("public/index.html"), "<title>Home</title><div><h1>Home</h1></div>")
+	"""
+
+	build_args = ()
+
+	def setUp(self):
+		self.cwd = os.getcwd()
+		self.tmp = tempfile.TemporaryDirectory()
+		os.chdir(self.tmp.name)
+		os.makedirs("content")
+		os.makedirs("static")
+		self.write("template.html", TEMPLATE)
+
+	def tearDown(self):
+		os.chdir(self.cwd)
+		self.tmp.cleanup()
+
+	def write(self, path: str, text: str):
+		"""
+		Write text into path, creating the directories above it.
+		"""
+		directory = os.path.dirname(path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		with open(path, "w") as f:
+			f.write(text)
+
+	def read(self, path: str) -> str:
+		with open(path) as f:
+			return f.read()
+
+	def build(self, *args: str) -> str:
+		"""
+		Run main() with -q, build_args and args, so the summary line is
+		not printed.
+
+		return:
+		* what the build wrote to stderr, e.g. its broken links
+		"""
+		errors = io.StringIO()
+		with contextlib.redirect_stderr(errors):
+			main(["-q", *self.build_args, *args])
+		return errors.getvalue()
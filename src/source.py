@@ -0,0 +1,123 @@
+import hashlib
+import io
+import mmap
+import os
+
+from frontmatter import normalize, split_front_matter
+from utils import iter_blocks, lines_to_block_type, split_blocks, strip_block
+
+# Files smaller than this are read in one go; mapping them costs more
+# than the copy it saves.
+MMAP_THRESHOLD = 1 << 16
+
+
+class MarkdownSource:
+	"""
+	A markdown file opened for block-wise reading.
+
+	Files below MMAP_THRESHOLD are read and decoded whole and split with
+	utils.split_blocks. Larger files are memory-mapped. Block boundaries are found on the raw
+	bytes and each block is handed out as a memoryview slice of the map,
+	so the file is never copied or decoded as a whole: only one block at
+	a time is decoded into a str, right before it is parsed.
+
+	Front matter at the start of the file is parsed into front_matter and
+	skipped by iter_blocks.
+
+	Example:
+	with MarkdownSource("content/index.md") as source:
+		source.front_matter["title"]
+		for block_type, lines in source.iter_blocks():
+			...
+	"""
+
+	def __init__(self, path: str):
+		self.path = path
+		self.front_matter = normalize({})
+		self._file = None
+		self._buffer = None
+		self._offset = 0
+		self._iterators = []
+
+	def __enter__(self) -> "MarkdownSource":
+		self._file = open(self.path, "rb")
+		size = os.fstat(self._file.fileno()).st_size
+		if size == 0:
+			self._buffer = b""
+		elif size < MMAP_THRESHOLD:
+			self._buffer = self._file.read()
+		else:
+			self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+		self.front_matter, self._offset = split_front_matter(self._buffer)
+		return self
+
+	def __exit__(self, *exc):
+		# Suspended block iterators still hold slices of the map
+		for iterator in self._iterators:
+			iterator.close()
+		if isinstance(self._buffer, mmap.mmap):
+			self._buffer.close()
+		self._file.close()
+		self._buffer = None
+
+	def body_digest(self, salt: bytes=b"") -> str:
+		"""
+		sha256 hex digest of salt and the raw body, front matter excluded.
+		"""
+		digest = hashlib.sha256(salt)
+		with memoryview(self._buffer) as view, view[self._offset:] as body:
+			digest.update(body)
+		return digest.hexdigest()
+
+	def iter_blocks(self):
+		"""
+		Yield (block_type, lines) for every block, exactly like
+		utils.iter_blocks does for the decoded text.
+		"""
+		iterator = self._iter_blocks()
+		self._iterators.append(iterator)
+		return iterator
+
+	def _iter_blocks(self):
+		if not isinstance(self._buffer, mmap.mmap):
+			# Small enough to have been read whole: decoding and splitting
+			# it in one go is cheaper than going block by block
+			text = self._buffer[self._offset:].decode("utf-8")
+			if "\r" in text:
+				text = text.replace("\r\n", "\n").replace("\r", "\n")
+			yield from split_blocks(text)
+			return
+
+		if self._buffer.find(b"\r", self._offset) != -1:
+			# Windows line endings: let the text layer translate them
+			with open(self.path, "rb") as raw:
+				raw.seek(self._offset)
+				with io.TextIOWrapper(raw, encoding="utf-8") as f:
+					yield from iter_blocks(f)
+			return
+
+		with memoryview(self._buffer) as view:
+			for start, end in iter_block_spans(self._buffer, self._offset):
+				with view[start:end] as raw:
+					block = strip_block(str(raw, "utf-8").split("\n"))
+				if block:
+					yield lines_to_block_type(block), block
+
+
+def iter_block_spans(buffer, position: int=0) -> tuple[int, int]:
+	"""
+	Yield the (start, end) byte offsets of every block in a buffer,
+	starting at position. Blocks are separated by one or more empty
+	lines, i.e. by a run of two or more newlines.
+	"""
+	size = len(buffer)
+	while position < size:
+		separator = buffer.find(b"\n\n", position)
+		if separator == -1:
+			yield position, size
+			return
+		if separator > position:
+			yield position, separator
+		position = separator + 2
+		while position < size and buffer[position] == 0x0A:
+			position += 1
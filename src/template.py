@@ -0,0 +1,108 @@
+import html
+import re
+
+# Matches placeholders such as {{ Title }} or {{Content}}
+PLACEHOLDER_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+class Template:
+	"""
+	An html template compiled into literal segments and placeholder slots.
+
+	The template text is parsed once; rendering fills the slots of a copy of
+	the segment list and joins it, so each page costs a single join instead
+	of one full-document str.replace per placeholder.
+
+	Example:
+	tmpl = Template("<title>{{ Title }}</title><body>{{ Content }}</body>")
+	tmpl.render(Title="Home", Content="<p>Hi</p>")
+	# "<title>Home</title><body><p>Hi</p></body>"
+
+	Placeholders without a value are left in the output untouched.
+	"""
+
+	def __init__(self, text: str):
+		self.text = text
+		self.parts = []
+		self.slots = []
+		position = 0
+		for match in PLACEHOLDER_RE.finditer(text):
+			self.parts.append(text[position:match.start()])
+			self.slots.append((len(self.parts), match.group(1)))
+			self.parts.append(match.group(0))
+			position = match.end()
+		self.parts.append(text[position:])
+
+	@classmethod
+	def load(cls, template_path: str) -> "Template":
+		with open(template_path, "r") as f:
+			return cls(f.read())
+
+	@property
+	def names(self) -> set[str]:
+		return {name for _, name in self.slots}
+
+	def render(self, values: dict=None, **kwargs) -> str:
+		"""
+		Fill every {{ Name }} slot from values/kwargs and return the page.
+		"""
+		if values is None:
+			values = kwargs
+		elif kwargs:
+			values = {**values, **kwargs}
+		parts = self.parts.copy()
+		for index, name in self.slots:
+			value = values.get(name)
+			if value is not None:
+				parts[index] = str(value)
+		return "".join(parts)
+
+	def write(self, out, values: dict=None, **kwargs):
+		"""
+		Like render(), but write the page straight into a file-like object.
+		Values that can stream themselves (anything with a write_html
+		method, such as an HTMLNode tree) are written fragment by fragment,
+		so the page content never exists as one string in memory.
+		"""
+		if values is None:
+			values = kwargs
+		elif kwargs:
+			values = {**values, **kwargs}
+		slots = dict(self.slots)
+		for index, part in enumerate(self.parts):
+			value = values.get(slots[index]) if index in slots else None
+			if value is None:
+				out.write(part)
+			elif hasattr(value, "write_html"):
+				value.write_html(out)
+			else:
+				out.write(str(value))
+
+	def front_matter_values(self, meta: dict=None) -> dict:
+		"""
+		Slot values for a page with the given front matter: every field by
+		its own name, html escaped, lists joined with ", ". Slots of this
+		template the page has no field for are empty, so a published page
+		never shows a literal {{ name }}.
+
+		Example:
+		tmpl = Template("{{ Title }} on {{ date }} in {{ tags }}{{ author }}")
+		tmpl.render(tmpl.front_matter_values({"date": "2024-01-01", "tags": ["a", "b"]}), Title="Post")
+		# "Post on 2024-01-01 in a, b"
+		"""
+		values = dict.fromkeys(self.names, "")
+		for key, value in (meta or {}).items():
+			if value is None:
+				continue
+			if isinstance(value, list):
+				value = ", ".join(str(item) for item in value if item is not None)
+			elif isinstance(value, bool):
+				value = str(value).lower()
+			values[key] = html.escape(str(value))
+		return values
+
+	def __eq__(self, other: object) -> bool:
+		return isinstance(other, Template) and self.text == other.text
+
+	def __repr__(self) -> str:
+		return f"Template(names={sorted(self.names)})"
@@ -0,0 +1,65 @@
+import os
+import unittest
+
+from assets import sync_tree
+from manifest import BuildManifest
+from sitetest import SiteTestCase
+
+
+class TestSyncTree(SiteTestCase):
+
+	def setUp(self):
+		super().setUp()
+		self.write("static/index.css", "body {}")
+		self.write("static/images/logo.png", "png")
+
+	def test_copies_then_skips(self):
+		res = sync_tree("static", "public")
+		self.assertEqual(len(res.copied), 2)
+		self.assertEqual(self.read("public/images/logo.png"), "png")
+
+		res = sync_tree("static", "public")
+		self.assertEqual(len(res.copied), 0)
+		self.assertEqual(len(res.unchanged), 2)
+
+		self.write("static/index.css", "body { color: red; }")
+		res = sync_tree("static", "public")
+		self.assertEqual(res.copied, [os.path.abspath("public/index.css")])
+		self.assertEqual(self.read("public/index.css"), "body { color: red; }")
+
+	def test_checksum_ignores_mtime(self):
+		sync_tree("static", "public")
+		os.utime("static/index.css", ns=(0, 0))
+		res = sync_tree("static", "public", checksum=True)
+		self.assertEqual(len(res.copied), 0)
+		self.assertEqual(os.stat("public/index.css").st_mtime_ns, 0)
+
+		# Same size and mtime but different content is caught by the checksum
+		self.write("public/index.css", "body ()")
+		os.utime("public/index.css", ns=(0, 0))
+		self.assertEqual(len(sync_tree("static", "public").copied), 0)
+		self.assertEqual(len(sync_tree("static", "public", checksum=True).copied), 1)
+		self.assertEqual(self.read("public/index.css"), "body {}")
+
+	def test_hardlink(self):
+		res = sync_tree("static", "public", hardlink=True)
+		self.assertEqual(len(res.linked), 2)
+		self.assertTrue(os.path.samefile("static/index.css", "public/index.css"))
+		res = sync_tree("static", "public", hardlink=True)
+		self.assertEqual(len(res.unchanged), 2)
+
+	def test_stale_assets_removed_through_manifest(self):
+		manifest = BuildManifest("manifest.json")
+		sync_tree("static", "public", manifest=manifest)
+		manifest.save()
+
+		os.remove("static/images/logo.png")
+		manifest = BuildManifest.load("manifest.json")
+		sync_tree("static", "public", manifest=manifest)
+		self.assertEqual(manifest.remove_stale(), [os.path.join("public", "images", "logo.png")])
+		self.assertFalse(os.path.exists("public/images"))
+		self.assertTrue(os.path.exists("public/index.css"))
+
+
+if __name__ == "__main__":
+	unittest.main()
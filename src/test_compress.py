@@ -0,0 +1,102 @@
+import gzip
+import json
+import os
+import unittest
+from unittest import mock
+
+import compress
+from compress import compress_outputs, compress_file
+from manifest import BuildManifest, hash_file
+from sitetest import SiteTestCase
+
+
+class TestCompress(SiteTestCase):
+
+	def setUp(self):
+		super().setUp()
+		self.write("content/index.md", "# Home\n\n" + "Welcome to the **home** page. " * 40)
+		self.write("content/blog/index.md", "# Blog\n\n" + "A *blog* post. " * 40)
+		self.write("static/index.css", "body { margin: 0; }\n" * 40)
+		self.write("static/images/logo.png", "png")
+
+	def test_compress_file(self):
+		self.write("page.html", "<p>hello</p>" * 100)
+		path, size, sizes = compress_file("page.html", ["gzip"])
+		self.assertEqual(size, 1200)
+		with open("page.html.gz", "rb") as f:
+			self.assertEqual(gzip.decompress(f.read()), b"<p>hello</p>" * 100)
+		self.assertEqual(sizes["gzip"], os.path.getsize("page.html.gz"))
+
+		# Incompressible content gets no sibling
+		self.write("tiny.txt", "x")
+		_, _, sizes = compress_file("tiny.txt", ["gzip"])
+		self.assertEqual(sizes, {})
+		self.assertFalse(os.path.exists("tiny.txt.gz"))
+
+	def test_recompress_records_the_new_hash(self):
+		self.write("page.html", "<p>hello</p>" * 100)
+		manifest = BuildManifest("manifest.json")
+		manifest.file_hash("page.html")
+		self.write("page.html", "<p>hello again</p>" * 100)
+		self.assertIn("page.html.gz", compress.recompress(manifest, "page.html"))
+		self.assertEqual(manifest.outputs["page.html.gz"]["source_hash"], hash_file("page.html"))
+		self.assertTrue(manifest.is_fresh("page.html", "page.html.gz"))
+
+	def test_build_writes_siblings_and_report(self):
+		self.build()
+		for path in ["public/index.html", "public/blog/index.html", "public/index.css"]:
+			with open(path, "rb") as f, open(path + ".gz", "rb") as gz:
+				self.assertEqual(gzip.decompress(gz.read()), f.read())
+		self.assertFalse(os.path.exists("public/images/logo.png.gz"))
+
+		with open(".build/report.json") as f:
+			report = json.load(f)
+		entry = report["compression"][os.path.join("public", "index.html")]
+		self.assertLess(entry["gzip_ratio"], 1)
+		self.assertEqual(entry["gzip"], os.path.getsize("public/index.html.gz"))
+
+	def test_unchanged_outputs_are_skipped(self):
+		self.build()
+		blog_mtime = os.stat("public/blog/index.html.gz").st_mtime_ns
+		self.write("content/index.md", "# Home\n\n" + "Changed **home** page. " * 40)
+		self.build()
+		self.assertEqual(os.stat("public/blog/index.html.gz").st_mtime_ns, blog_mtime)
+		with open("public/index.html.gz", "rb") as gz:
+			self.assertIn(b"Changed", gzip.decompress(gz.read()))
+
+	def test_incompressible_outputs_are_not_tried_again(self):
+		with open("static/noise.txt", "wb") as f:
+			f.write(os.urandom(4096))
+		self.build()
+		self.assertFalse(os.path.exists("public/noise.txt.gz"))
+		with mock.patch.object(compress, "compress_file", side_effect=AssertionError("compressed")):
+			self.build()
+		with open("static/noise.txt", "wb") as f:
+			f.write(b"noise " * 1000)
+		self.build()
+		self.assertTrue(os.path.exists("public/noise.txt.gz"))
+
+	def test_siblings_of_removed_outputs_are_removed(self):
+		self.build()
+		os.remove("content/blog/index.md")
+		self.build()
+		self.assertFalse(os.path.exists("public/blog"))
+
+	def test_parallel_compression(self):
+		self.build()
+		manifest = BuildManifest.load(".build/manifest.json")
+		manifest.seen = set(manifest.outputs)
+		for path in list(manifest.outputs):
+			if path.endswith(".gz"):
+				os.remove(path)
+		results = compress_outputs(manifest, jobs=2)
+		self.assertTrue(os.path.exists("public/index.html.gz"))
+		self.assertIn("gzip", results[os.path.join("public", "index.css")])
+
+	def test_no_compress(self):
+		self.build("--no-compress")
+		self.assertFalse(os.path.exists("public/index.html.gz"))
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,76 @@
+import io
+import unittest
+
+from console import Console, QUIET, NORMAL, VERBOSE
+
+
+class FakeTerminal(io.StringIO):
+
+	def isatty(self):
+		return True
+
+
+class TestConsole(unittest.TestCase):
+
+	def test_levels(self):
+		out = io.StringIO()
+		console = Console(NORMAL, out)
+		console.debug("page %s", "a")
+		console.info("built %d pages", 2)
+		console.flush()
+		self.assertEqual(out.getvalue(), "built 2 pages\n")
+
+		out = io.StringIO()
+		console = Console(QUIET, out)
+		console.info("built")
+		console.debug("page")
+		console.flush()
+		self.assertEqual(out.getvalue(), "")
+
+	def test_debug_is_not_formatted_below_verbose(self):
+		console = Console(NORMAL, io.StringIO())
+		# Would raise if it was formatted
+		console.debug("%d", "not a number")
+
+	def test_verbose_lines_are_batched(self):
+		out = io.StringIO()
+		console = Console(VERBOSE, out, batch_size=3)
+		console.debug("one")
+		console.debug("two")
+		self.assertEqual(out.getvalue(), "")
+		console.debug("three")
+		self.assertEqual(out.getvalue(), "one\ntwo\nthree\n")
+		console.debug("four")
+		console.flush()
+		self.assertEqual(out.getvalue(), "one\ntwo\nthree\nfour\n")
+
+	def test_progress_only_on_terminals(self):
+		out = io.StringIO()
+		Console(NORMAL, out).progress("pages", 1, 1)
+		self.assertEqual(out.getvalue(), "")
+
+		out = FakeTerminal()
+		console = Console(NORMAL, out, refresh=60)
+		console.progress("pages", 1, 3)
+		# Throttled until the last one
+		console.progress("pages", 2, 3)
+		console.progress("pages", 3, 3)
+		self.assertEqual(out.getvalue(), "\r\x1b[Kpages: 1/3\r\x1b[K\r\x1b[Kpages: 3/3")
+		console.info("done")
+		self.assertTrue(out.getvalue().endswith("pages: 3/3\r\x1b[Kdone\n"))
+
+	def test_summary(self):
+		out = io.StringIO()
+		console = Console(NORMAL, out)
+		console.count("pages rendered", 3)
+		console.count("pages rendered")
+		console.count("stale outputs removed", 0)
+		console.summary()
+		self.assertRegex(out.getvalue(), r"^Done in \d+\.\d\ds: 4 pages rendered\n$")
+
+		console.reset()
+		self.assertEqual(console.counters, {})
+
+
+if __name__ == "__main__":
+	unittest.main()
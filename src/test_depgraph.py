@@ -0,0 +1,131 @@
+import json
+import unittest
+
+from console import console
+from depgraph import DependencyGraph, normalize_url
+from sitetest import SiteTestCase
+from watch import BuildGraph
+
+
+class TestDependencyGraph(unittest.TestCase):
+
+	def test_normalize_url(self):
+		for url in ["/majesty", "/majesty/", "/majesty/index.html", "/majesty/#top", "/majesty?page=2"]:
+			self.assertEqual(normalize_url(url), "/majesty")
+		self.assertEqual(normalize_url("/"), "/")
+		self.assertEqual(normalize_url("/index.html"), "/")
+
+	def test_order_puts_linked_pages_first(self):
+		graph = DependencyGraph()
+		graph.urls = {"/a": "content/a.md", "/b": "content/b.md", "/c": "content/c.md"}
+		graph.pages = {
+			"content/a.md": [["page", "/b", "B"]],
+			"content/b.md": [["page", "/c", "C"]],
+		}
+		pages = [("content/a.md", "a"), ("content/b.md", "b"), ("content/c.md", "c"), ("content/d.md", "d")]
+		self.assertEqual([dest for _, dest in graph.order(pages)], ["c", "b", "a", "d"])
+
+	def test_order_survives_cycles(self):
+		graph = DependencyGraph()
+		graph.urls = {"/a": "content/a.md", "/b": "content/b.md"}
+		graph.pages = {
+			"content/a.md": [["page", "/b", "B"]],
+			"content/b.md": [["page", "/a", "A"]],
+		}
+		pages = [("content/a.md", "a"), ("content/b.md", "b")]
+		self.assertEqual([dest for _, dest in graph.order(pages)], ["a", "b"])
+
+
+class TestDependencyBuild(SiteTestCase):
+
+	build_args = ("--no-compress",)
+
+	def setUp(self):
+		super().setUp()
+		self.write("includes/footer.md", "Licensed under **MIT**.")
+		self.write("content/index.md", "# Home\n\nRead [](/majesty) first.\n\n{{ include footer.md }}")
+		self.write("content/majesty/index.md", "# Majesty\n\nNo links here.")
+		self.write("content/other.md", "# Other\n\n{{ include footer.md }}")
+		self.write("content/plain.md", "# Plain\n\nNothing shared.")
+
+	def build(self, *args):
+		super().build(*args)
+		return console.counters
+
+	def test_includes_and_titles_are_rendered(self):
+		self.build("--clean")
+		self.assertEqual(
+			self.read("public/index.html"),
+			'<title>Home</title><div><h1>Home</h1><p>Read <a href="/majesty">Majesty</a> first.</p>'
+			"<p>Licensed under <b>MIT</b>.</p></div>"
+		)
+		with open(".build/deps.json") as f:
+			pages = json.load(f)["pages"]
+		self.assertEqual([dependency[:2] for dependency in pages["content/index.md"]], [
+			["template", "template.html"],
+			["page", "/majesty"],
+			["include", "includes/footer.md"],
+		])
+		self.assertEqual(pages["content/index.md"][1][2], "Majesty")
+
+	def test_changed_include_rebuilds_its_pages(self):
+		self.build("--clean")
+		self.write("includes/footer.md", "Licensed under **GPL**.")
+		counters = self.build()
+		self.assertEqual(counters["pages rebuilt for dependencies"], 2)
+		self.assertEqual(counters["pages rendered"], 2)
+		self.assertIn("<b>GPL</b>", self.read("public/other.html"))
+		self.assertIn("<b>GPL</b>", self.read("public/index.html"))
+
+	def test_changed_title_rebuilds_linking_pages(self):
+		self.build("--clean")
+		self.write("content/majesty/index.md", "# The Unparalleled Majesty\n\nNo links here.")
+		counters = self.build()
+		self.assertEqual(counters["pages rebuilt for dependencies"], 1)
+		self.assertEqual(counters["pages rendered"], 2)
+		self.assertIn('<a href="/majesty">The Unparalleled Majesty</a>', self.read("public/index.html"))
+
+	def test_body_change_keeps_linking_pages(self):
+		self.build("--clean")
+		self.write("content/majesty/index.md", "# Majesty\n\nStill no links here.")
+		counters = self.build()
+		self.assertNotIn("pages rebuilt for dependencies", counters)
+		self.assertEqual(counters["pages rendered"], 1)
+
+	def test_added_page_fills_in_links_to_it(self):
+		self.write("content/plain.md", "# Plain\n\nSee [](/later.html).")
+		self.build("--clean")
+		self.assertIn('<a href="/later.html"></a>', self.read("public/plain.html"))
+		self.write("content/later.md", "# Later")
+		self.build()
+		self.assertIn('<a href="/later.html">Later</a>', self.read("public/plain.html"))
+
+	def test_render_cache_checks_dependencies(self):
+		self.build("--clean")
+		self.write("includes/footer.md", "Licensed under **GPL**.")
+		self.build("--clean")
+		self.assertIn("<b>GPL</b>", self.read("public/other.html"))
+		self.build("--clean")
+		with open(".build/report.json") as f:
+			self.assertEqual(json.load(f)["render_cache"]["hits"], 4)
+
+	def test_parallel_build_records_dependencies(self):
+		self.build("--clean", "--jobs", "2", "--no-render-cache")
+		with open(".build/deps.json") as f:
+			pages = json.load(f)["pages"]
+		self.assertEqual(len(pages), 4)
+		self.assertIn(["include", "includes/footer.md"], [dependency[:2] for dependency in pages["content/other.md"]])
+
+	def test_watch_rebuilds_dependents(self):
+		self.build("--clean")
+		graph = BuildGraph(compress=False)
+		self.write("content/majesty/index.md", "# Renamed\n\nNo links here.")
+		self.write("includes/footer.md", "Licensed under **GPL**.")
+		outputs = graph.rebuild(*graph.poll())
+		self.assertEqual(sorted(outputs), ["public/index.html", "public/majesty/index.html", "public/other.html"])
+		self.assertIn('<a href="/majesty">Renamed</a>', self.read("public/index.html"))
+		self.assertIn("<b>GPL</b>", self.read("public/index.html"))
+
+
+if __name__ == "__main__":
+	unittest.main()
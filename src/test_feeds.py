@@ -0,0 +1,95 @@
+import json
+import unittest
+import xml.etree.ElementTree as ET
+
+import feeds
+from sitetest import SiteTestCase
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+SITEMAP = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+
+class TestFeeds(SiteTestCase):
+
+	build_args = ("--no-compress",)
+
+	def setUp(self):
+		super().setUp()
+		self.write("content/index.md", "# Home\n\nWelcome to the **shire**.")
+		self.write("content/posts/a.md", "---\ndate: 2024-01-01\n---\n# First & Best\n\nThe *ring* goes [east](/east).\n\n* a hobbit")
+		self.write("content/posts/b.md", "---\ntitle: Second\ndate: 2024-02-01\n---\nMore about the ring.")
+		self.write("content/posts/draft.md", "---\ntitle: Secret\ndraft: true\n---\nsecret words")
+
+	def build(self, *args):
+		return super().build("--feeds", "--base-url", "https://example.com/", *args)
+
+	def search_index(self):
+		with open("public/search.json") as f:
+			return json.load(f)
+
+	def test_sitemap_and_feed(self):
+		self.build("--clean")
+		sitemap = ET.parse("public/sitemap.xml").getroot()
+		locations = sorted(url.find(f"{SITEMAP}loc").text for url in sitemap)
+		self.assertEqual(locations, ["https://example.com/", "https://example.com/posts/a.html", "https://example.com/posts/b.html"])
+
+		feed = ET.parse("public/atom.xml").getroot()
+		self.assertEqual(feed.find(f"{ATOM}title").text, "Home")
+		self.assertEqual(feed.find(f"{ATOM}updated").text, "2024-02-01T00:00:00Z")
+		entries = feed.findall(f"{ATOM}entry")
+		self.assertEqual([entry.find(f"{ATOM}title").text for entry in entries], ["Second", "First & Best"])
+		self.assertEqual(entries[1].find(f"{ATOM}summary").text, "The ring goes east. a hobbit")
+		self.assertEqual(feed.find(f"{ATOM}author/{ATOM}name").text, "Home")
+
+	def test_feed_author_and_dates(self):
+		self.write("content/posts/b.md", "---\ntitle: Second\ndate: 2024-02-01 14:30+02:00\n---\nMore about the ring.")
+		self.write("content/posts/c.md", "---\ntitle: Third\ndate: next tuesday\n---\nSoon.")
+		errors = self.build("--clean", "--site-author", "Bilbo & Frodo")
+		self.assertIn("content/posts/c.md: date 'next tuesday' is not an ISO 8601 date", errors)
+		feed = ET.parse("public/atom.xml").getroot()
+		self.assertEqual(feed.find(f"{ATOM}author/{ATOM}name").text, "Bilbo & Frodo")
+		self.assertEqual(feed.find(f"{ATOM}updated").text, "2024-02-01T12:30:00Z")
+		self.assertEqual([entry.find(f"{ATOM}title").text for entry in feed.findall(f"{ATOM}entry")], ["Second", "First & Best"])
+
+	def test_rfc3339(self):
+		self.assertEqual(feeds.rfc3339("2024-06-10"), "2024-06-10T00:00:00Z")
+		self.assertEqual(feeds.rfc3339("2024-06-10T08:15:00"), "2024-06-10T08:15:00Z")
+		self.assertEqual(feeds.rfc3339("2024-06-10T23:30:00-01:00"), "2024-06-11T00:30:00Z")
+		for date in ["10/06/2024", "2024-13-01", "", None]:
+			self.assertIsNone(feeds.rfc3339(date), date)
+
+	def test_search_index(self):
+		self.build("--clean")
+		index = self.search_index()
+		docs = [url for url, _ in index["docs"]]
+		self.assertEqual(docs, ["/posts/b.html", "/posts/a.html", "/"])
+		self.assertEqual(index["terms"]["ring"], [0, 1])
+		self.assertEqual(index["terms"]["shire"], [2])
+		self.assertEqual(index["terms"]["hobbit"], [1])
+		self.assertNotIn("secret", index["terms"])
+
+	def test_unchanged_pages_come_from_the_cache(self):
+		self.build("--clean")
+		first = self.search_index()
+		self.build()
+		self.assertEqual(self.search_index(), first)
+
+		self.write("content/posts/b.md", "---\ntitle: Second\ndate: 2024-02-01\n---\nNow about elves.")
+		self.build()
+		terms = self.search_index()["terms"]
+		self.assertEqual(terms["elves"], [0])
+		self.assertEqual(terms["ring"], [1])
+
+	def test_parallel_build_collects_text(self):
+		self.build("--clean", "--jobs", "2")
+		self.assertEqual(self.search_index()["terms"]["ring"], [0, 1])
+		self.assertIsNone(feeds.collecting)
+
+	def test_cache_filled_after_plain_build(self):
+		SiteTestCase.build(self, "--clean")
+		self.build()
+		self.assertEqual(self.search_index()["terms"]["ring"], [0, 1])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+
+from frontmatter import parse_front_matter, read_header, split_front_matter
+from source import MarkdownSource
+
+
+class TestFrontMatter(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def write(self, text, newline=None):
+		path = os.path.join(self.tmp.name, "page.md")
+		with open(path, "w", newline=newline) as f:
+			f.write(text)
+		return path
+
+	def test_parse_front_matter(self):
+		meta = parse_front_matter([
+			"title: \"Hello: World\"",
+			"# a comment",
+			"date: 2024-06-10",
+			"tags: [tolkien, 'books']",
+			"draft: true",
+			"authors:",
+			"  - Frodo",
+			"  - Sam",
+		])
+		self.assertEqual(meta, {
+			"title": "Hello: World",
+			"date": "2024-06-10",
+			"tags": ["tolkien", "books"],
+			"draft": True,
+			"authors": ["Frodo", "Sam"],
+		})
+		with self.assertRaises(ValueError):
+			parse_front_matter(["not a key value pair"])
+
+	def test_split_front_matter(self):
+		buffer = b"---\ntitle: Hi\ntags: a, b\n---\n# Body\n"
+		meta, offset = split_front_matter(buffer)
+		self.assertEqual(meta["title"], "Hi")
+		self.assertEqual(meta["tags"], ["a", "b"])
+		self.assertFalse(meta["draft"])
+		self.assertIsNone(meta["template"])
+		self.assertEqual(buffer[offset:], b"# Body\n")
+
+		# A lone --- is a horizontal rule, not front matter
+		self.assertEqual(split_front_matter(b"---\n# Body\n")[1], 0)
+		self.assertEqual(split_front_matter(b"# Body\n")[1], 0)
+
+	def test_read_header(self):
+		path = self.write("---\ndate: 2024-01-02\n---\n\n# The Title\n\nBody text\n")
+		meta = read_header(path)
+		self.assertEqual(meta["title"], "The Title")
+		self.assertEqual(meta["date"], "2024-01-02")
+
+		path = self.write("---\ntitle: From Front Matter\n---\n# The Title\n")
+		self.assertEqual(read_header(path)["title"], "From Front Matter")
+
+		path = self.write("# Plain page\n\ntext")
+		self.assertEqual(read_header(path)["title"], "Plain page")
+
+		path = self.write("Not a heading\n")
+		self.assertIsNone(read_header(path)["title"])
+
+	def test_source_skips_front_matter(self):
+		for newline in ("\n", "\r\n"):
+			path = self.write("---\ntitle: Hi\n---\n# Heading\n\nA paragraph", newline=newline)
+			with MarkdownSource(path) as source:
+				self.assertEqual(source.front_matter["title"], "Hi")
+				blocks = list(source.iter_blocks())
+			self.assertEqual(blocks, [("heading", ["# Heading"]), ("paragraph", ["A paragraph"])])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -1,6 +1,8 @@
+import io
 import unittest
 
-from htmlnode import HTMLNode, LeafNode, ParentNode
+import htmlnode
+from htmlnode import HTMLNode, LeafNode, ParentNode, collect_html, iter_html
 
 
 class TestHTMLNode(unittest.TestCase):
@@ -20,6 +22,12 @@ class TestHTMLNode(unittest.TestCase):
 		prop_str = node.props_to_html()
 		self.assertEqual(prop_str, ' href="www.google.com" target="_blank"')
 
+	def test_slots(self):
+		for node in [HTMLNode("p", "text"), LeafNode("b", "text"), ParentNode("p", [LeafNode("b", "text")])]:
+			self.assertFalse(hasattr(node, "__dict__"))
+			with self.assertRaises(AttributeError):
+				node.extra = "not allowed"
+
 class TestLeafNode(unittest.TestCase):
 
 	def test_missing_value(self):
@@ -154,4 +162,48 @@ class TestParentNode(unittest.TestCase):
 			'<h1><p class="some-cool-css-class"><b>Bold text</b>Normal text<i>italic text</i>Normal text</p><h2><b>Bold text</b>Normal text<i>italic text</i>Normal text</h2></h1>'
 		)
 		
-	
\ No newline at end of file
+	
+class TestIterHTML(unittest.TestCase):
+
+	def test_fragments(self):
+		node = ParentNode("p", [LeafNode("b", "Bold"), LeafNode(None, " text")], {"class" : "x"})
+		self.assertEqual(list(iter_html(node)), ['<p class="x">', "<b>Bold</b>", " text", "</p>"])
+
+	def test_deep_tree(self):
+		depth = 5000
+		node = LeafNode("i", "deep")
+		for _ in range(depth):
+			node = ParentNode("span", [node, LeafNode(None, ".")])
+		html = node.to_html()
+		self.assertTrue(html.startswith(depth * "<span>" + "<i>deep</i>."))
+		self.assertTrue(html.endswith("</span>"))
+		self.assertEqual(html.count("</span>"), depth)
+
+	def test_recursion_falls_back_to_the_stack(self):
+		for depth in (htmlnode.RECURSION_DEPTH - 1, htmlnode.RECURSION_DEPTH, htmlnode.RECURSION_DEPTH + 1):
+			node = LeafNode("i", "deep")
+			for _ in range(depth):
+				node = ParentNode("span", [LeafNode(None, "<"), node, LeafNode(None, ">")])
+			fragments = []
+			collect_html(node, fragments)
+			self.assertEqual("".join(fragments), "".join(iter_html(node)))
+
+	def test_write_html(self):
+		node = ParentNode("ul", [ParentNode("li", [LeafNode(None, "one")]), ParentNode("li", [LeafNode("b", "two")])])
+		out = io.StringIO()
+		node.write_html(out)
+		self.assertEqual(out.getvalue(), node.to_html())
+		self.assertEqual(out.getvalue(), "<ul><li>one</li><li><b>two</b></li></ul>")
+
+	def test_invalid_nested_nodes(self):
+		node = ParentNode("div", [ParentNode("p", [])])
+		with self.assertRaises(ValueError):
+			node.to_html()
+
+		node = ParentNode("div", [LeafNode("b", None)])
+		with self.assertRaises(ValueError):
+			node.to_html()
+
+		node = ParentNode("div", [HTMLNode("b", "text")])
+		with self.assertRaises(NotImplementedError):
+			node.to_html()
@@ -0,0 +1,222 @@
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+from unittest import mock
+
+from console import console
+from images import ImageIndex, downscale, image_size, read_png, variant_path, write_png, PNG_SIGNATURE
+from sitetest import SiteTestCase
+from watch import BuildGraph
+
+
+def png_chunk(kind: bytes, data: bytes) -> bytes:
+	return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def paeth(left: int, up: int, upper_left: int) -> int:
+	estimate = left + up - upper_left
+	distances = [abs(estimate - left), abs(estimate - up), abs(estimate - upper_left)]
+	return [left, up, upper_left][distances.index(min(distances))]
+
+
+def filtered_png(width: int, height: int, color: int, channels: int, rows: list[bytes], filters: list[int], chunks: bytes=b"") -> bytes:
+	"""
+	Encode rows with the given filter type per row, the slow and obvious way.
+	"""
+	raw = b""
+	previous = bytes(width * channels)
+	for row, kind in zip(rows, filters):
+		out = bytearray()
+		for i, value in enumerate(row):
+			left = row[i - channels] if i >= channels else 0
+			upper_left = previous[i - channels] if i >= channels else 0
+			predictor = [0, left, previous[i], (left + previous[i]) // 2, paeth(left, previous[i], upper_left)][kind]
+			out.append((value - predictor) & 0xFF)
+		raw += bytes([kind]) + out
+		previous = row
+	return (
+		PNG_SIGNATURE
+		+ png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color, 0, 0, 0))
+		+ chunks
+		+ png_chunk(b"IDAT", zlib.compress(raw))
+		+ png_chunk(b"IEND", b"")
+	)
+
+
+class TestImageFormats(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def write(self, name, data):
+		path = os.path.join(self.tmp.name, name)
+		with open(path, "wb") as f:
+			f.write(data)
+		return path
+
+	def test_png_and_gif_size(self):
+		png = self.write("a.png", filtered_png(3, 2, 0, 1, [b"abc", b"def"], [0, 0]))
+		self.assertEqual(image_size(png), (3, 2))
+		gif = self.write("a.gif", b"GIF89a" + struct.pack("<HH", 640, 480) + b"\x00" * 16)
+		self.assertEqual(image_size(gif), (640, 480))
+		self.assertIsNone(image_size(self.write("a.txt", b"not an image")))
+
+	def test_jpeg_size_and_orientation(self):
+		frame = b"\xff\xc0" + struct.pack(">HBHHB", 11, 8, 480, 640, 1) + b"\x01\x11\x00"
+		jpeg = self.write("a.jpg", b"\xff\xd8\xff\xe0" + struct.pack(">H", 6) + b"JFIF" + frame + b"\xff\xd9")
+		self.assertEqual(image_size(jpeg), (640, 480))
+		# Orientation 6: shot sideways, shown turned by 90 degrees
+		tiff = b"MM\x00\x2a" + struct.pack(">I", 8) + struct.pack(">H", 1) + struct.pack(">HHIHH", 0x0112, 3, 1, 6, 0) + b"\x00" * 4
+		exif = b"Exif\x00\x00" + tiff
+		rotated = self.write("b.jpg", b"\xff\xd8\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif + frame + b"\xff\xd9")
+		self.assertEqual(image_size(rotated), (480, 640))
+
+	def test_read_png_undoes_every_filter(self):
+		rows = [bytes((x * 37 + y * 91) % 256 for x in range(12)) for y in range(5)]
+		path = self.write("a.png", filtered_png(4, 5, 2, 3, rows, [0, 1, 2, 3, 4]))
+		self.assertEqual(read_png(path), (4, 5, 3, rows))
+
+	def test_read_png_expands_palettes(self):
+		chunks = png_chunk(b"PLTE", b"\xff\x00\x00\x00\xff\x00") + png_chunk(b"tRNS", b"\x80")
+		path = self.write("a.png", filtered_png(2, 1, 3, 1, [b"\x00\x01"], [0], chunks))
+		self.assertEqual(read_png(path), (2, 1, 4, [b"\xff\x00\x00\x80\x00\xff\x00\xff"]))
+
+	def test_write_png_round_trip(self):
+		rows = [bytes((x * 13 + y * 7) % 256 for x in range(8)) for y in range(3)]
+		path = os.path.join(self.tmp.name, "a.png")
+		write_png(path, 2, 3, 4, rows)
+		self.assertEqual(read_png(path), (2, 3, 4, rows))
+
+	def test_downscale_averages_boxes(self):
+		rows = [bytes([0, 10, 20, 30]), bytes([2, 12, 22, 32])]
+		self.assertEqual(downscale(rows, 4, 2, 1, 2, 1), [bytes([6, 26])])
+
+	def test_variant_path(self):
+		self.assertEqual(variant_path("/images/rivendell.png", 480), "/images/rivendell-480w.png")
+
+
+class TestImageIndex(unittest.TestCase):
+
+	def setUp(self):
+		self.cwd = os.getcwd()
+		self.tmp = tempfile.TemporaryDirectory()
+		os.chdir(self.tmp.name)
+		os.makedirs("static/images")
+		self.write_png("static/images/map.png", 40, 20)
+		with open("static/images/photo.gif", "wb") as f:
+			f.write(b"GIF89a" + struct.pack("<HH", 800, 600) + b"\x00" * 16)
+
+	def tearDown(self):
+		os.chdir(self.cwd)
+		self.tmp.cleanup()
+
+	def write_png(self, path, width, height):
+		write_png(path, width, height, 3, [bytes((x + y) % 256 for x in range(width * 3)) for y in range(height)])
+
+	def test_update_reads_sizes_and_writes_variants(self):
+		index = ImageIndex(widths=[10, 20, 80])
+		update = index.update("static", "public")
+		self.assertEqual(sorted(update.read), ["static/images/map.png", "static/images/photo.gif"])
+		self.assertEqual(index.images["images/map.png"]["variants"], [10, 20])
+		self.assertEqual(index.images["images/photo.gif"]["variants"], [])
+		self.assertEqual(image_size("public/images/map-10w.png"), (10, 5))
+		self.assertEqual(index.attributes("images/map.png"), {
+			"width": "40",
+			"height": "20",
+			"srcset": "/images/map-10w.png 10w, /images/map-20w.png 20w, /images/map.png 40w",
+		})
+		self.assertEqual(index.attributes("images/photo.gif"), {"width": "800", "height": "600"})
+		self.assertEqual(index.attributes("images/missing.png"), {})
+
+	def test_unchanged_images_are_not_read_again(self):
+		index = ImageIndex(widths=[10])
+		index.update("static", "public")
+		index.save()
+		index = ImageIndex.load()
+		os.utime("static/images/map.png", ns=(0, 0))
+		update = index.update("static", "public")
+		self.assertEqual(update.read, [])
+		self.assertEqual(update.variants_written, [])
+		self.assertEqual(len(update.unchanged), 2)
+
+	def test_changed_image_replaces_its_variants(self):
+		index = ImageIndex(widths=[10])
+		index.update("static", "public")
+		old = index.cache_path(index.images["images/map.png"], 10)
+		self.write_png("static/images/map.png", 30, 30)
+		update = index.update("static", "public")
+		self.assertEqual(update.variants_written, [("static/images/map.png", 10)])
+		self.assertEqual(image_size("public/images/map-10w.png"), (10, 10))
+		self.assertFalse(os.path.exists(old))
+
+
+class TestImageBuild(SiteTestCase):
+	build_args = ("--no-compress",)
+
+	def setUp(self):
+		super().setUp()
+		os.makedirs("static/images")
+		write_png("static/images/map.png", 40, 20, 1, [bytes(40)] * 20)
+		self.write("template.html", "{{ Content }}")
+		self.write("content/index.md", "# Home\n\n![The map](/images/map.png) ![Elsewhere](https://example.com/x.png)")
+
+	def test_sizes_are_injected(self):
+		self.build("--clean")
+		self.assertIn(
+			'<img src="/images/map.png" alt="The map" width="40" height="20">The map</img> '
+			'<img src="https://example.com/x.png" alt="Elsewhere">Elsewhere</img>',
+			self.read("public/index.html")
+		)
+
+	def test_variants_and_srcset(self):
+		self.build("--clean", "--image-widths", "20", "--jobs", "2")
+		self.assertIn('srcset="/images/map-20w.png 20w, /images/map.png 40w"', self.read("public/index.html"))
+		self.assertEqual(image_size("public/images/map-20w.png"), (20, 10))
+		self.build("--clean", "--image-widths", "20")
+		self.assertEqual(console.counters["image variants written"], 0)
+		# Later builds keep the widths, and do not decode the image again
+		with mock.patch("images.read_png", side_effect=AssertionError("decoded")):
+			self.build()
+			self.build("--clean")
+		self.assertTrue(os.path.exists("public/images/map-20w.png"))
+		self.assertIn("srcset", self.read("public/index.html"))
+		self.build("--image-widths", "")
+		self.assertFalse(os.path.exists("public/images/map-20w.png"))
+		self.assertNotIn("srcset", self.read("public/index.html"))
+
+	def test_widths_must_be_positive(self):
+		for widths in ["0", "20,-5"]:
+			with self.assertRaises(SystemExit):
+				self.build("--image-widths", widths)
+		self.assertFalse(os.path.exists("public"))
+
+	def test_changed_size_rebuilds_the_page(self):
+		self.build("--clean")
+		write_png("static/images/map.png", 60, 30, 1, [bytes(60)] * 30)
+		self.build()
+		self.assertEqual(console.counters["pages rebuilt for dependencies"], 1)
+		self.assertIn('width="60" height="30"', self.read("public/index.html"))
+
+	def test_no_images(self):
+		self.build("--clean", "--no-images")
+		self.assertIn('<img src="/images/map.png" alt="The map">The map</img>', self.read("public/index.html"))
+		self.build()
+		self.assertEqual(console.counters["pages rebuilt for dependencies"], 1)
+		self.assertIn('width="40"', self.read("public/index.html"))
+
+	def test_watch_rebuilds_pages_showing_a_changed_image(self):
+		self.build("--clean")
+		graph = BuildGraph(compress=False)
+		write_png("static/images/map.png", 60, 30, 1, [bytes(60)] * 30)
+		outputs = graph.rebuild(*graph.poll())
+		self.assertEqual(sorted(outputs), ["public/images/map.png", "public/index.html"])
+		self.assertIn('width="60" height="30"', self.read("public/index.html"))
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,87 @@
+import json
+import os
+import pstats
+import unittest
+
+import htmlnode
+import instrument
+import utils
+from instrument import Instrumentation, STAGES
+from sitetest import SiteTestCase
+
+
+class TestInstrument(SiteTestCase):
+
+	def setUp(self):
+		super().setUp()
+		self.write("content/index.md", "# Home\n\nSome **bold** text.\n\n* one\n* two")
+		self.write("content/blog/index.md", "# Blog\n\nA [link](/) and `code`.")
+
+	def read_report(self):
+		with open(".build/report.json") as f:
+			return json.load(f)
+
+	def test_install_and_uninstall(self):
+		text_to_textnode = utils.text_to_textnode
+		write_html = htmlnode.HTMLNode.write_html
+		converters = dict(utils.block_converters)
+		with Instrumentation() as probe:
+			self.assertIs(instrument.active, probe)
+			self.assertIsNot(utils.text_to_textnode, text_to_textnode)
+		self.assertIsNone(instrument.active)
+		self.assertIs(utils.text_to_textnode, text_to_textnode)
+		self.assertIs(htmlnode.HTMLNode.write_html, write_html)
+		self.assertEqual(utils.block_converters, converters)
+
+	def test_stage_times_are_exclusive(self):
+		probe = Instrumentation()
+		probe.enter("convert")
+		probe.enter("inline")
+		probe.exit()
+		probe.exit()
+		self.assertGreaterEqual(probe.stages["inline"], 0)
+		self.assertGreaterEqual(probe.stages["convert"], 0)
+		self.assertEqual(probe._stack, [])
+
+	def test_build_report(self):
+		self.build("--clean", "--instrument")
+		report = self.read_report()["instrument"]
+		self.assertEqual(set(report["stages"]), set(STAGES))
+		self.assertEqual(set(report["phases"]), {"assets", "images", "pages", "compress", "cleanup", "links"})
+		self.assertEqual(report["totals"]["pages"], 2)
+
+		page = report["pages"][os.path.join("public", "index.html")]
+		self.assertEqual(page["source"], os.path.join("content", "index.md"))
+		self.assertEqual(page["blocks"], 3)
+		# "Home", "Some ", "bold", " text.", "one", "two"
+		self.assertEqual(page["inline_nodes"], 6)
+		self.assertEqual(page["bytes_in"], os.path.getsize("content/index.md"))
+		self.assertEqual(page["bytes_out"], os.path.getsize("public/index.html"))
+
+	def test_instrumented_output_matches(self):
+		self.build("--clean", "--no-compress")
+		with open("public/index.html") as f:
+			plain = f.read()
+		self.build("--clean", "--no-compress", "--instrument")
+		with open("public/index.html") as f:
+			self.assertEqual(f.read(), plain)
+		self.assertIsNone(instrument.active)
+
+	def test_parallel_workers_are_merged(self):
+		self.build("--clean", "--instrument", "--jobs", "2")
+		report = self.read_report()["instrument"]
+		self.assertEqual(report["totals"]["pages"], 2)
+		self.assertGreater(report["totals"]["blocks"], 0)
+
+	def test_uninstrumented_build_has_no_section(self):
+		self.build("--clean")
+		self.assertNotIn("instrument", self.read_report())
+
+	def test_profile(self):
+		self.build("--clean", "--profile", "build.prof")
+		stats = pstats.Stats("build.prof")
+		self.assertTrue(any(name == "generate_page" for _, _, name in stats.stats))
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,131 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from console import console
+from linkcheck import UrlIndex, link_lines
+from sitetest import SiteTestCase
+from watch import BuildGraph
+
+
+class TestUrlIndex(unittest.TestCase):
+
+	def setUp(self):
+		self.index = UrlIndex("public", ["index.html", "majesty/index.html", "posts/a.html", "images/rivendell.png"])
+
+	def test_site_urls(self):
+		for url in ["/", "/majesty", "/majesty/", "/majesty/index.html#top", "/posts/a.html?x=1", "/images/rivendell.png"]:
+			self.assertTrue(self.index.resolves(url, "public/index.html"), url)
+		for url in ["/images/mordor.png", "/posts/a", "/posts/", "/../index.html"]:
+			self.assertFalse(self.index.resolves(url, "public/index.html"), url)
+
+	def test_relative_urls(self):
+		self.assertTrue(self.index.resolves("a.html", "public/posts/b.html"))
+		self.assertTrue(self.index.resolves("../images/rivendell.png", "public/posts/b.html"))
+		self.assertTrue(self.index.resolves("..", "public/posts/b.html"))
+		self.assertFalse(self.index.resolves("b.html", "public/index.html"))
+		self.assertFalse(self.index.resolves("../../index.html", "public/posts/b.html"))
+
+	def test_external_urls_are_skipped(self):
+		for url in ["https://example.com/missing", "mailto:frodo@shire.me", "//cdn.example.com/x.js", "#top", "?page=2"]:
+			self.assertIsNone(self.index.resolves(url, "public/index.html"), url)
+
+	def test_scan(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			os.makedirs(os.path.join(tmp, "posts"))
+			for path in ["index.html", "posts/a.html"]:
+				open(os.path.join(tmp, path), "w").close()
+			self.assertEqual(UrlIndex.scan(tmp).paths, {"index.html", "posts/a.html"})
+
+	def test_link_lines(self):
+		text = "# Home\n\nSee [a](/a) and ![b](/b.png).\n\nThen [a again](/a) and [once more](/a)."
+		self.assertEqual(link_lines(text, "/a"), [3, 5])
+		self.assertEqual(link_lines(text, "/b.png"), [3])
+		self.assertEqual(link_lines(text, "/c"), [])
+
+
+class TestLinkCheckBuild(SiteTestCase):
+	build_args = ("--no-compress",)
+
+	def setUp(self):
+		super().setUp()
+		self.write("static/images/map.png", "png")
+		self.write("includes/footer.md", "Read the [license](/license).")
+		self.write("content/index.md", "# Home\n\nSee [the map](/images/map.png) and [a post](/posts/a.html).\n\n"
+			"![Rivendell](/images/rivendell.png)\n\n[Elsewhere](https://example.com/missing)")
+		self.write("content/posts/a.md", "# A\n\nBack [home](../index.html) or to [b](b.html).\n\n{{ include footer.md }}")
+
+	def build(self, *args):
+		errors = super().build(*args)
+		if not os.path.exists(".build/links.json"):
+			return None, errors
+		with open(".build/links.json") as f:
+			return json.load(f)["broken"], errors
+
+	def test_broken_links_are_reported_with_file_and_line(self):
+		broken, errors = self.build("--clean")
+		self.assertEqual(broken, [
+			{"file": "content/index.md", "line": 5, "url": "/images/rivendell.png", "page": "content/index.md"},
+			{"file": "content/posts/a.md", "line": 3, "url": "b.html", "page": "content/posts/a.md"},
+			{"file": "includes/footer.md", "line": 1, "url": "/license", "page": "content/posts/a.md"},
+		])
+		self.assertIn("content/index.md:5: broken link /images/rivendell.png\n", errors)
+		self.assertIn("includes/footer.md:1: broken link /license (included by content/posts/a.md)\n", errors)
+		self.assertEqual(console.counters["broken links"], 3)
+		with open(".build/report.json") as f:
+			self.assertEqual(json.load(f)["links"], {"broken": 3})
+
+	def test_fixed_links_are_not_reported(self):
+		self.build("--clean")
+		self.write("static/images/rivendell.png", "png")
+		self.write("content/posts/b.md", "# B")
+		os.makedirs("content/license")
+		self.write("content/license/index.md", "# License")
+		broken, _ = self.build()
+		self.assertEqual(broken, [])
+
+	def test_unchanged_pages_are_checked_again(self):
+		self.write("content/posts/b.md", "# B")
+		os.makedirs("content/license")
+		self.write("content/license/index.md", "# License")
+		self.build("--clean")
+		os.remove("content/posts/b.md")
+		broken, _ = self.build()
+		self.assertEqual([link["url"] for link in broken], ["/images/rivendell.png", "b.html"])
+		self.assertEqual(console.counters["pages rendered"], 0)
+
+	def test_render_cache_and_parallel_build_keep_the_links(self):
+		expected, _ = self.build("--clean")
+		self.assertEqual(self.build("--clean")[0], expected)
+		self.assertEqual(console.counters["render cache hits"], 2)
+		self.assertEqual(self.build("--clean", "--jobs", "2", "--no-render-cache")[0], expected)
+
+	def test_no_check_links(self):
+		self.build("--clean", "--no-check-links")
+		self.assertFalse(os.path.exists(".build/links.json"))
+		self.assertNotIn("broken links", console.counters)
+
+	def test_strict_links(self):
+		with self.assertRaises(SystemExit):
+			self.build("--clean", "--strict-links")
+
+	def test_watch_checks_links(self):
+		self.build("--clean")
+		graph = BuildGraph(compress=False)
+		self.write("content/posts/a.md", "# A\n\nBack [home](../index.html).\n\n[Gone](/gone)")
+		with contextlib.redirect_stderr(io.StringIO()) as errors:
+			self.assertEqual(graph.refresh(), ["public/posts/a.html"])
+		self.assertIn("content/posts/a.md:5: broken link /gone\n", errors.getvalue())
+		with contextlib.redirect_stderr(io.StringIO()):
+			broken = graph.check_links([])
+		self.assertEqual([(link["file"], link["line"], link["url"]) for link in broken], [
+			("content/index.md", 5, "/images/rivendell.png"),
+			("content/posts/a.md", 5, "/gone"),
+		])
+
+
+if __name__ == "__main__":
+	unittest.main()
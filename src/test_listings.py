@@ -0,0 +1,84 @@
+import os
+import unittest
+
+from listings import collect_listings, slugify
+from pageindex import PageIndex
+from sitetest import SiteTestCase
+
+
+class TestListings(SiteTestCase):
+	build_args = ("--no-compress", "--listings", "--listing-page-size", "2")
+
+	def setUp(self):
+		super().setUp()
+		self.write("content/index.md", "# Home\n\nWelcome.")
+		self.write("content/posts/index.md", "# Posts\n\nAll posts.")
+		for i in range(1, 6):
+			tags = "[books, Middle Earth]" if i % 2 else "[books]"
+			self.write(f"content/posts/2024/p{i}.md", f"---\ntitle: Post {i}\ndate: 2024-0{i}-01\ntags: {tags}\n---\nText {i}.")
+		self.write("content/posts/old.md", "---\ntitle: Old\ndate: 2019-12-31\n---\nOld text.")
+
+	def test_collect_listings(self):
+		index = PageIndex()
+		index.scan([
+			(os.path.join(dir_path, name), os.path.join("public", os.path.relpath(dir_path, "content"), name[:-3] + ".html"))
+			for dir_path, _, files in os.walk("content") for name in files
+		])
+		listings = collect_listings(index)
+		self.assertEqual(
+			sorted(listings),
+			["/archive/2019/", "/archive/2024/", "/list/", "/posts/2024/list/", "/posts/list/", "/tags/books/", "/tags/middle-earth/"]
+		)
+		self.assertEqual([entry["title"] for entry in listings["/tags/middle-earth/"].entries], ["Post 5", "Post 3", "Post 1"])
+		# The section's own index.md is listed by the section above it only
+		self.assertIn("Posts", [entry["title"] for entry in listings["/list/"].entries])
+		self.assertNotIn("Posts", [entry["title"] for entry in listings["/posts/list/"].entries])
+		self.assertEqual(slugify("Middle Earth!"), "middle-earth")
+
+	def test_paginated_output(self):
+		self.build("--clean")
+		first = self.read("public/tags/middle-earth/index.html")
+		self.assertIn('<a href="/posts/2024/p5.html">Post 5</a> <time datetime="2024-05-01">2024-05-01</time>', first)
+		self.assertIn('<a href="/tags/middle-earth/page/2/" rel="next">Older</a>', first)
+		second = self.read("public/tags/middle-earth/page/2/index.html")
+		self.assertIn("Post 1", second)
+		self.assertIn('rel="prev"', second)
+		self.assertNotIn('rel="next"', second)
+		self.assertTrue(os.path.exists("public/archive/2019/index.html"))
+		# Undated pages come last
+		self.assertIn('<a href="/posts/">Posts</a>', self.read("public/list/page/4/index.html"))
+
+	def test_only_changed_listings_are_rewritten(self):
+		self.build("--clean")
+		before = {
+			path: os.stat(path).st_mtime_ns
+			for path in ("public/archive/2019/index.html", "public/tags/middle-earth/index.html", "public/tags/books/index.html")
+		}
+		self.build()
+		for path, mtime in before.items():
+			self.assertEqual(os.stat(path).st_mtime_ns, mtime, path)
+
+		# A body edit does not touch any listing, a title edit touches those listing the page
+		self.write("content/posts/old.md", "---\ntitle: Old\ndate: 2019-12-31\n---\nNew text.")
+		self.build()
+		self.assertEqual(os.stat("public/archive/2019/index.html").st_mtime_ns, before["public/archive/2019/index.html"])
+		self.write("content/posts/2024/p2.md", "---\ntitle: Renamed\ndate: 2024-02-01\ntags: [books]\n---\nText 2.")
+		self.build()
+		self.assertEqual(os.stat("public/tags/middle-earth/index.html").st_mtime_ns, before["public/tags/middle-earth/index.html"])
+		self.assertIn("Renamed", self.read("public/tags/books/page/2/index.html"))
+
+	def test_removed_listings_are_stale(self):
+		self.build("--clean")
+		os.remove("content/posts/old.md")
+		self.build()
+		self.assertFalse(os.path.exists("public/archive/2019"))
+
+	def test_page_size_must_be_positive(self):
+		for size in ["0", "-1"]:
+			with self.assertRaises(SystemExit):
+				self.build("--listing-page-size", size)
+		self.assertFalse(os.path.exists("public"))
+
+
+if __name__ == "__main__":
+	unittest.main()
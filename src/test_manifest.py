@@ -0,0 +1,89 @@
+import os
+import unittest
+from unittest import mock
+
+from manifest import BuildManifest, hash_file
+from sitetest import SiteTestCase
+
+
+class TestBuildManifest(SiteTestCase):
+
+	def setUp(self):
+		super().setUp()
+		os.makedirs("content/blog")
+		os.makedirs("static/images")
+		self.write("content/index.md", "# Home\n\nWelcome!")
+		self.write("content/blog/index.md", "# Blog\n\nSome *words*.")
+		self.write("static/index.css", "body {}")
+		self.write("static/images/logo.png", "png")
+
+	def test_record_and_is_fresh(self):
+		os.makedirs("public")
+		self.write("public/index.css", "body {}")
+		manifest = BuildManifest("manifest.json")
+		self.assertFalse(manifest.is_fresh("static/index.css", "public/index.css"))
+		manifest.record("static/index.css", "public/index.css")
+		manifest.save()
+
+		manifest = BuildManifest.load("manifest.json")
+		self.assertTrue(manifest.is_fresh("static/index.css", "public/index.css"))
+
+		self.write("public/index.css", "tampered")
+		manifest = BuildManifest.load("manifest.json")
+		self.assertFalse(manifest.is_fresh("static/index.css", "public/index.css"))
+
+	def test_outputs_are_hashed_only_when_their_stat_changes(self):
+		os.makedirs("public")
+		self.write("public/index.css", "body {}")
+		manifest = BuildManifest("manifest.json")
+		manifest.record("static/index.css", "public/index.css")
+		with mock.patch("manifest.hash_file", wraps=hash_file) as hashed:
+			self.assertTrue(manifest.is_fresh("static/index.css", "public/index.css"))
+			self.assertEqual(hashed.call_count, 0)
+
+			# Touched but unchanged: hashed once, then the new mtime is kept
+			os.utime("public/index.css", ns=(0, 0))
+			self.assertTrue(manifest.is_fresh("static/index.css", "public/index.css"))
+			self.assertTrue(manifest.is_fresh("static/index.css", "public/index.css"))
+			self.assertEqual(hashed.call_count, 1)
+
+			# Same size, different content
+			self.write("public/index.css", "body {{")
+			self.assertFalse(manifest.is_fresh("static/index.css", "public/index.css"))
+
+	def test_hash_file(self):
+		self.assertEqual(hash_file("static/index.css"), hash_file("static/index.css"))
+		self.assertNotEqual(hash_file("static/index.css"), hash_file("template.html"))
+
+	def test_incremental_build(self):
+		self.build()
+		self.assertIn("<title>Home</title>", self.read("public/index.html"))
+		blog_mtime = os.stat("public/blog/index.html").st_mtime_ns
+		css_mtime = os.stat("public/index.css").st_mtime_ns
+
+		self.write("content/index.md", "# Home again\n\nWelcome!")
+		self.build()
+		self.assertIn("<title>Home again</title>", self.read("public/index.html"))
+		self.assertEqual(os.stat("public/blog/index.html").st_mtime_ns, blog_mtime)
+		self.assertEqual(os.stat("public/index.css").st_mtime_ns, css_mtime)
+
+	def test_template_change_invalidates_pages(self):
+		self.build()
+		self.write("template.html", "<h1>{{ Title }}</h1>{{ Content }}")
+		self.build()
+		self.assertIn("<h1>Home</h1>", self.read("public/index.html"))
+		self.assertIn("<h1>Blog</h1>", self.read("public/blog/index.html"))
+
+	def test_removed_sources_remove_outputs(self):
+		self.build()
+		os.remove("content/blog/index.md")
+		os.remove("static/images/logo.png")
+		self.build()
+		self.assertFalse(os.path.exists("public/blog/index.html"))
+		self.assertFalse(os.path.exists("public/images/logo.png"))
+		self.assertTrue(os.path.exists("public/index.html"))
+		self.assertTrue(os.path.exists("public/index.css"))
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,74 @@
+import os
+import unittest
+
+from pageindex import PageIndex, PAGE_INDEX_PATH
+from sitetest import SiteTestCase
+from watch import BuildGraph
+
+
+class TestPageIndex(SiteTestCase):
+	build_args = ("--no-compress",)
+
+	def setUp(self):
+		super().setUp()
+		os.makedirs("content/posts")
+		self.write("post.html", "<h1>{{ Title }}</h1>{{ Content }}")
+		self.write("content/index.md", "# Home\n\nWelcome.")
+		self.write("content/posts/old.md", "---\ntitle: Old Post\ndate: 2023-05-01\ntags: [books]\n---\nSome text.")
+		self.write("content/posts/new.md", "---\ndate: 2024-05-01\ntags: [books, tolkien]\ntemplate: post.html\n---\n# New Post\n\nMore text.")
+		self.write("content/posts/wip.md", "---\ntitle: Work in progress\ndraft: true\n---\nNot yet.")
+
+	def test_build_uses_front_matter(self):
+		self.build("--clean")
+		self.assertEqual(self.read("public/posts/old.html"), "<title>Old Post</title><div><p>Some text.</p></div>")
+		self.assertEqual(self.read("public/posts/new.html"), "<h1>New Post</h1><div><h1>New Post</h1><p>More text.</p></div>")
+		self.assertFalse(os.path.exists("public/posts/wip.html"))
+
+		self.build("--drafts")
+		self.assertTrue(os.path.exists("public/posts/wip.html"))
+		self.build()
+		self.assertFalse(os.path.exists("public/posts/wip.html"))
+
+	def test_front_matter_fields_fill_template_slots(self):
+		self.write("template.html", "<title>{{ Title }}</title><time>{{ date }}</time><p>{{ tags }}</p>{{ Content }}")
+		self.build("--clean")
+		self.assertEqual(
+			self.read("public/posts/old.html"),
+			"<title>Old Post</title><time>2023-05-01</time><p>books</p><div><p>Some text.</p></div>"
+		)
+		self.assertEqual(self.read("public/index.html"), "<title>Home</title><time></time><p></p><div><h1>Home</h1><p>Welcome.</p></div>")
+		# From the render cache, which is keyed by the body alone
+		self.write("content/posts/old.md", "---\ntitle: Old Post\ndate: 2023-06-01\ntags: [books]\n---\nSome text.")
+		self.build()
+		self.assertIn("<time>2023-06-01</time>", self.read("public/posts/old.html"))
+		# And from watch mode
+		graph = BuildGraph(compress=False)
+		self.write("content/posts/old.md", "---\ntitle: Old Post\ndate: 2023-07-01\ntags: [books]\n---\nSome text.")
+		graph.rebuild(*graph.poll())
+		self.assertIn("<time>2023-07-01</time>", self.read("public/posts/old.html"))
+
+	def test_index_queries(self):
+		self.build("--clean")
+		index = PageIndex.load(PAGE_INDEX_PATH)
+		titles = [entry["title"] for entry in index.published()]
+		self.assertEqual(titles, ["New Post", "Old Post", "Home"])
+		self.assertEqual([entry["title"] for entry in index.tags()["books"]], ["New Post", "Old Post"])
+		self.assertEqual(index.get("content/posts/new.md")["output"], os.path.join("public", "posts", "new.html"))
+		self.assertTrue(index.get("content/posts/wip.md")["draft"])
+
+	def test_scan_reads_only_changed_headers(self):
+		pages = [("content/index.md", "public/index.html"), ("content/posts/old.md", "public/posts/old.html")]
+		index = PageIndex()
+		self.assertEqual(len(index.scan(pages)), 2)
+		self.assertEqual(index.scan(pages), [])
+
+		self.write("content/posts/old.md", "---\ntitle: Renamed\n---\nSome text.")
+		self.assertEqual(index.scan(pages), [os.path.join("content", "posts", "old.md")])
+		self.assertEqual(index.get("content/posts/old.md")["title"], "Renamed")
+
+		index.scan(pages[:1])
+		self.assertIsNone(index.get("content/posts/old.md"))
+
+
+if __name__ == "__main__":
+	unittest.main()
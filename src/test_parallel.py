@@ -0,0 +1,85 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import unittest
+
+from main import main
+from parallel import make_batches
+from sitetest import SiteTestCase
+
+
+class TestParallel(SiteTestCase):
+	build_args = ("--no-render-cache",)
+
+	def setUp(self):
+		super().setUp()
+		for i in range(12):
+			os.makedirs(f"content/section{i % 3}/page{i}")
+			self.write(
+				f"content/section{i % 3}/page{i}/index.md",
+				f"# Page {i}\n\nSome **bold** and *italic* text with a [link](/page{i}).\n\n* one\n* two"
+			)
+
+	def read_tree(self, root):
+		tree = {}
+		for dir_path, _, files in os.walk(root):
+			for name in files:
+				path = os.path.join(dir_path, name)
+				with open(path, "rb") as f:
+					tree[os.path.relpath(path, root)] = f.read()
+		return tree
+
+	def test_make_batches(self):
+		batches = make_batches(list(range(10)), jobs=2)
+		self.assertEqual(len(batches), 5)
+		self.assertEqual(sum(batches, []), list(range(10)))
+
+		batches = make_batches(list(range(10)), jobs=2, batch_size=4)
+		self.assertEqual([len(batch) for batch in batches], [4, 4, 2])
+
+		self.assertEqual(make_batches([], jobs=4), [])
+
+	def test_parallel_output_matches_serial(self):
+		self.build("--clean")
+		serial = self.read_tree("public")
+		shutil.rmtree("public")
+
+		self.build("--clean", "--jobs", "3")
+		parallel = self.read_tree("public")
+
+		self.assertEqual(len(serial), 12)
+		self.assertEqual(serial, parallel)
+
+	def test_block_memo_counters_are_merged(self):
+		self.build("--clean", "--jobs", "3")
+		with open(".build/report.json") as f:
+			memo = json.load(f)["block_memo"]
+		# 3 blocks per page; only the list is the same on every page, and
+		# each of the 3 workers converts it twice before it is kept
+		self.assertEqual(memo["hits"] + memo["misses"], 36)
+		self.assertGreaterEqual(memo["hits"], 12 - 3 * 2)
+
+	def test_block_memo_must_not_be_negative(self):
+		with self.assertRaises(SystemExit):
+			self.build("--block-memo", "-1")
+		self.build("--clean", "--block-memo", "0")
+		with open(".build/report.json") as f:
+			self.assertNotIn("block_memo", json.load(f))
+
+	def test_throughput_is_shown_at_the_normal_level(self):
+		with contextlib.redirect_stdout(io.StringIO()) as out:
+			main(["--clean", "--no-render-cache", "--no-check-links", "--jobs", "3"])
+		self.assertIn("Rendered 12 pages across 3 workers\n", out.getvalue())
+		self.assertEqual(out.getvalue().count(" pages/s)\n"), 3)
+
+	def test_jobs_must_be_positive(self):
+		for jobs in ["0", "-2"]:
+			with self.assertRaises(SystemExit):
+				self.build("--jobs", jobs)
+		self.assertFalse(os.path.exists("public"))
+
+
+if __name__ == "__main__":
+	unittest.main()
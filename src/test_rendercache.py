@@ -0,0 +1,162 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import rendercache
+import utils
+from htmlnode import Fragments
+from rendercache import RecordingContent, RenderCache
+from sitetest import SiteTestCase
+from utils import MarkdownStream, iter_blocks
+
+
+class TestRenderCache(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.cache = RenderCache(os.path.join(self.tmp.name, "cache"))
+
+	def tearDown(self):
+		self.cache.close()
+		self.tmp.cleanup()
+
+	def test_put_and_get(self):
+		self.assertIsNone(self.cache.get("ab12"))
+		self.cache.put("ab12", "<div><p>a\nb</p></div>", title="Home", text={"terms": ["a"], "summary": "a"})
+		self.cache.flush()
+		entry = self.cache.get("ab12")
+		self.assertEqual(entry["html"], "<div><p>a\nb</p></div>")
+		self.assertEqual(entry["title"], "Home")
+		self.assertEqual(entry["text"], {"terms": ["a"], "summary": "a"})
+
+	def test_lookup_needs_title_and_text(self):
+		self.cache.put("ab12", "<div></div>")
+		self.cache.flush()
+		self.assertIsNone(self.cache.lookup("ab12", need_title=True))
+		self.assertIsNone(self.cache.lookup("ab12", need_text=True))
+		self.assertIsNotNone(self.cache.lookup("ab12"))
+		self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 2})
+
+	def test_prune_evicts_least_recently_used(self):
+		self.cache.max_bytes = 250
+		for i, key in enumerate(["aa1", "bb2", "cc3"]):
+			self.cache.put(key, "x" * 100)
+		self.cache.flush()
+		with self.cache.connect() as db:
+			db.executemany("UPDATE pages SET used = ? WHERE key = ?", [(1, "aa1"), (2, "bb2"), (3, "cc3")])
+		# A hit makes aa1 the most recently used entry
+		self.cache.get("aa1")
+		self.assertEqual(self.cache.prune(), 1)
+		self.assertIsNone(self.cache.get("bb2"))
+		self.assertIsNotNone(self.cache.get("aa1"))
+		self.assertIsNotNone(self.cache.get("cc3"))
+
+	def test_shared_between_instances(self):
+		self.cache.put("ab12", "<div></div>", title="Home")
+		self.assertIsNone(RenderCache(self.cache.directory).get("ab12"))
+		self.cache.close()
+		self.assertEqual(RenderCache(self.cache.directory).get("ab12")["title"], "Home")
+
+
+class TestRecordingContent(unittest.TestCase):
+
+	def test_streams_and_keeps_html(self):
+		out = Fragments()
+		content = RecordingContent(MarkdownStream(iter_blocks(["Hello"])))
+		content.write_html(out)
+		self.assertEqual("".join(out), "<div><p>Hello</p></div>")
+		self.assertEqual(content.html, "".join(out))
+
+	def test_drops_html_past_max_bytes(self):
+		out = Fragments()
+		content = RecordingContent(MarkdownStream(iter_blocks(["Hello", ""] * 10)), max_bytes=30)
+		content.write_html(out)
+		self.assertEqual("".join(out), "<div>" + "<p>Hello</p>" * 10 + "</div>")
+		self.assertIsNone(content.html)
+
+
+class TestRenderCacheBuild(SiteTestCase):
+	build_args = ("--no-compress",)
+
+	def setUp(self):
+		super().setUp()
+		os.makedirs("content/posts")
+		self.write("content/index.md", "# Home\n\nWelcome to the **shire**.")
+		self.write("content/posts/a.md", "---\ndate: 2024-01-01\n---\n# First\n\nThe *ring* goes [east](/east).")
+		self.write("content/posts/b.md", "---\ntitle: Second\n---\nMore about the ring.")
+
+	def outputs(self):
+		return {path: self.read(path) for path in ["public/index.html", "public/posts/a.html", "public/posts/b.html"]}
+
+	def report(self):
+		with open(".build/report.json") as f:
+			return json.load(f)["render_cache"]
+
+	def test_warm_build_skips_parsing(self):
+		self.build("--clean")
+		cold = self.outputs()
+		self.assertEqual(self.report()["hits"], 0)
+		with mock.patch.object(utils, "markdown_to_blocks", side_effect=AssertionError("parsed")), \
+				mock.patch.object(utils, "block_converters", {}):
+			self.build("--clean")
+		self.assertEqual(self.outputs(), cold)
+		self.assertEqual(self.report(), {"hits": 3, "misses": 0, "evicted": 0})
+
+	def test_front_matter_is_not_part_of_the_key(self):
+		self.build("--clean")
+		self.write("content/posts/a.md", "---\ndate: 2024-05-05\ntitle: Renamed\n---\n# First\n\nThe *ring* goes [east](/east).")
+		self.build()
+		self.assertEqual(self.report()["hits"], 1)
+		self.assertIn("<title>Renamed</title>", self.read("public/posts/a.html"))
+
+	def test_title_from_front_matter_is_not_reused(self):
+		# b.md was stored without an h1 title; the same body without a title would need one
+		self.build("--clean")
+		self.write("content/posts/c.md", "More about the ring.")
+		with self.assertRaises(ValueError):
+			self.build()
+
+	def test_feeds_text_comes_from_the_cache(self):
+		self.build("--clean")
+		self.build("--clean", "--feeds")
+		self.assertEqual(self.report()["misses"], 3)
+		self.build("--clean", "--feeds")
+		self.assertEqual(self.report()["hits"], 3)
+		with open("public/search.json") as f:
+			self.assertIn("shire", json.load(f)["terms"])
+
+	def test_shared_directory_and_parallel_build(self):
+		shared = os.path.join(self.tmp.name, "shared")
+		self.build("--clean", "--render-cache", shared)
+		cold = self.outputs()
+		self.build("--clean", "--render-cache", shared, "--jobs", "2")
+		self.assertEqual(self.outputs(), cold)
+		self.assertEqual(self.report()["hits"], 3)
+		self.assertFalse(os.path.exists(".build/render-cache"))
+
+	def test_large_pages_are_not_kept(self):
+		with mock.patch.object(rendercache, "MAX_ENTRY_BYTES", 64):
+			self.build("--clean")
+			cold = self.outputs()
+			self.build("--clean")
+		self.assertEqual(self.outputs(), cold)
+		# Only a.md renders to more than 64 bytes of html
+		self.assertEqual(self.report(), {"hits": 2, "misses": 1, "evicted": 0})
+
+	def test_no_render_cache(self):
+		self.build("--clean", "--no-render-cache")
+		self.assertFalse(os.path.exists(".build/render-cache"))
+		self.assertIsNone(rendercache.active)
+
+	def test_size_must_not_be_negative(self):
+		with self.assertRaises(SystemExit):
+			self.build("--render-cache-size", "-1")
+		self.assertFalse(os.path.exists("public"))
+		self.build("--clean", "--render-cache-size", "0")
+		self.assertEqual(len(self.outputs()), 3)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,153 @@
+import asyncio
+import gzip
+import http.client
+import os
+import tempfile
+import unittest
+
+from server import DevServer, FileCache, parse_range
+
+
+class TestParseRange(unittest.TestCase):
+
+	def test_parse_range(self):
+		self.assertEqual(parse_range("bytes=0-9", 100), (0, 9))
+		self.assertEqual(parse_range("bytes=90-", 100), (90, 99))
+		self.assertEqual(parse_range("bytes=-10", 100), (90, 99))
+		self.assertEqual(parse_range("bytes=50-500", 100), (50, 99))
+		self.assertEqual(parse_range("bytes=0-1,5-6", 100), None)
+		self.assertEqual(parse_range("items=0-1", 100), None)
+		with self.assertRaises(ValueError):
+			parse_range("bytes=100-", 100)
+		with self.assertRaises(ValueError):
+			parse_range("bytes=a-b", 100)
+
+
+class TestFileCache(unittest.TestCase):
+
+	def test_lru_eviction(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			paths = []
+			for i in range(3):
+				paths.append(os.path.join(tmp, f"{i}.txt"))
+				with open(paths[-1], "wb") as f:
+					f.write(b"x" * 10)
+			cache = FileCache(max_bytes=25)
+			cache.get(paths[0])
+			cache.get(paths[1])
+			cache.get(paths[0])
+			cache.get(paths[2])
+			self.assertEqual(list(cache.entries), [paths[0], paths[2]])
+			self.assertEqual(cache.bytes, 20)
+			self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+
+class TestDevServer(unittest.IsolatedAsyncioTestCase):
+
+	async def asyncSetUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.root = self.tmp.name
+		os.makedirs(os.path.join(self.root, "majesty"))
+		self.write("index.html", b"<html>home</html>")
+		self.write("majesty/index.html", b"<html>majesty</html>")
+		self.write("index.css", b"body { color: black; }")
+		self.write("index.css.gz", gzip.compress(b"body { color: black; }"))
+		self.server = await DevServer(self.root).start("127.0.0.1", 0)
+		self.port = self.server.sockets[0].getsockname()[1]
+
+	async def asyncTearDown(self):
+		self.server.close()
+		await self.server.wait_closed()
+		self.tmp.cleanup()
+
+	def write(self, path, data):
+		with open(os.path.join(self.root, path), "wb") as f:
+			f.write(data)
+
+	async def fetch(self, path, headers=None, method="GET"):
+		def request():
+			conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+			conn.request(method, path, headers=headers or {})
+			response = conn.getresponse()
+			body = response.read()
+			conn.close()
+			return response.status, dict(response.getheaders()), body
+		return await asyncio.to_thread(request)
+
+	async def test_get_index(self):
+		status, headers, body = await self.fetch("/")
+		self.assertEqual(status, 200)
+		self.assertEqual(body, b"<html>home</html>")
+		self.assertEqual(headers["Content-Type"], "text/html")
+
+		status, headers, _ = await self.fetch("/majesty")
+		self.assertEqual(status, 301)
+		self.assertEqual(headers["Location"], "/majesty/")
+
+		status, _, body = await self.fetch("/majesty/")
+		self.assertEqual(body, b"<html>majesty</html>")
+
+	async def test_not_found_and_traversal(self):
+		status, _, _ = await self.fetch("/missing.html")
+		self.assertEqual(status, 404)
+		status, _, _ = await self.fetch("/../../etc/passwd")
+		self.assertEqual(status, 404)
+
+	async def test_etag(self):
+		status, headers, _ = await self.fetch("/index.html")
+		status, _, body = await self.fetch("/index.html", {"If-None-Match": headers["ETag"]})
+		self.assertEqual(status, 304)
+		self.assertEqual(body, b"")
+
+	async def test_precompressed(self):
+		status, headers, body = await self.fetch("/index.css", {"Accept-Encoding": "gzip, deflate"})
+		self.assertEqual(status, 200)
+		self.assertEqual(headers["Content-Encoding"], "gzip")
+		self.assertEqual(headers["Vary"], "Accept-Encoding")
+		self.assertEqual(gzip.decompress(body), b"body { color: black; }")
+
+		status, headers, body = await self.fetch("/index.css")
+		self.assertNotIn("Content-Encoding", headers)
+		self.assertEqual(body, b"body { color: black; }")
+
+	async def test_range(self):
+		status, headers, body = await self.fetch("/index.html", {"Range": "bytes=6-9"})
+		self.assertEqual(status, 206)
+		self.assertEqual(body, b"home")
+		self.assertEqual(headers["Content-Range"], "bytes 6-9/17")
+
+		status, headers, _ = await self.fetch("/index.html", {"Range": "bytes=100-"})
+		self.assertEqual(status, 416)
+		self.assertEqual(headers["Content-Range"], "bytes */17")
+
+	async def test_large_files_are_streamed(self):
+		data = os.urandom(1 << 20)
+		self.write("big.bin", data)
+		large = await DevServer(self.root, cache=FileCache(max_file_bytes=1024)).start("127.0.0.1", 0)
+		self.port = large.sockets[0].getsockname()[1]
+		try:
+			status, headers, body = await self.fetch("/big.bin")
+			self.assertEqual((status, headers["Content-Length"], body), (200, str(len(data)), data))
+			status, headers, body = await self.fetch("/big.bin", {"Range": "bytes=1000-1999"})
+			self.assertEqual((status, body), (206, data[1000:2000]))
+			status, headers, body = await self.fetch("/big.bin", method="HEAD")
+			self.assertEqual((status, headers["Content-Length"], body), (200, str(len(data)), b""))
+		finally:
+			large.close()
+			await large.wait_closed()
+
+	async def test_head(self):
+		status, headers, body = await self.fetch("/index.html", method="HEAD")
+		self.assertEqual(status, 200)
+		self.assertEqual(headers["Content-Length"], "17")
+		self.assertEqual(body, b"")
+
+	async def test_reloads_changed_files(self):
+		await self.fetch("/index.html")
+		self.write("index.html", b"<html>changed home</html>")
+		_, _, body = await self.fetch("/index.html")
+		self.assertEqual(body, b"<html>changed home</html>")
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,66 @@
+import io
+import os
+import tempfile
+import unittest
+
+import source
+from source import MarkdownSource, iter_block_spans
+from utils import iter_blocks
+
+
+class TestMarkdownSource(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.path = os.path.join(self.tmp.name, "index.md")
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def write(self, data: bytes):
+		with open(self.path, "wb") as f:
+			f.write(data)
+
+	def read_blocks(self):
+		with MarkdownSource(self.path) as src:
+			return list(src.iter_blocks())
+
+	def test_iter_block_spans(self):
+		buffer = b"# Title\n\n\n\nparagraph\nline two\n\n* a\n* b\n"
+		spans = [buffer[start:end] for start, end in iter_block_spans(buffer)]
+		self.assertEqual(spans, [b"# Title", b"paragraph\nline two", b"* a\n* b\n"])
+		self.assertEqual(list(iter_block_spans(b"")), [])
+		self.assertEqual(list(iter_block_spans(b"\n\n\n")), [])
+
+	def test_matches_text_reader(self):
+		md = " # Tïtle \n\n\n \n\nSome **bold** ünïcode\n  indented\n\n```\ncode\n```\n\n1. one\n2. two\n\n\n"
+		self.write(md.encode("utf-8"))
+		self.assertEqual(self.read_blocks(), list(iter_blocks(md.split("\n"))))
+
+	def test_large_file_is_mapped(self):
+		md = "\n\n".join(f"## Heading {i}\n\n* item *{i}*\n* item `{i}`" for i in range(5000))
+		self.write(md.encode("utf-8"))
+		self.assertGreater(os.path.getsize(self.path), source.MMAP_THRESHOLD)
+		self.assertEqual(self.read_blocks(), list(iter_blocks(md.split("\n"))))
+
+	def test_windows_line_endings(self):
+		self.write(b"# Title\r\n\r\nparagraph\r\nline\r\n")
+		self.assertEqual(self.read_blocks(), [("heading", ["# Title"]), ("paragraph", ["paragraph", "line"])])
+		md = "\r\n\r\n".join(f"## Heading {i}\r\n\r\ntext\rmore" for i in range(5000))
+		self.write(md.encode("utf-8"))
+		self.assertGreater(os.path.getsize(self.path), source.MMAP_THRESHOLD)
+		self.assertEqual(self.read_blocks(), list(iter_blocks(io.StringIO(md, newline=None))))
+
+	def test_empty_file(self):
+		self.write(b"")
+		self.assertEqual(self.read_blocks(), [])
+
+	def test_exit_with_suspended_iterator(self):
+		self.write(("# Title\n\n" + "text\n\n" * 20000).encode("utf-8"))
+		with MarkdownSource(self.path) as src:
+			blocks = src.iter_blocks()
+			self.assertEqual(next(blocks), ("heading", ["# Title"]))
+
+
+if __name__ == "__main__":
+	unittest.main()
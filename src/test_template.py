@@ -0,0 +1,54 @@
+import io
+import unittest
+
+from htmlnode import LeafNode, ParentNode
+from template import Template
+
+
+class TestTemplate(unittest.TestCase):
+
+	def test_render(self):
+		tmpl = Template("<title> {{ Title }} </title>\n<article>{{ Content }}</article>")
+		res = tmpl.render(Title="Home", Content="<p>Hi</p>")
+		self.assertEqual(res, "<title> Home </title>\n<article><p>Hi</p></article>")
+		self.assertEqual(tmpl.names, {"Title", "Content"})
+
+	def test_matches_str_replace(self):
+		text = "<title> {{ Title }} </title><body>{{ Content }}</body>"
+		expected = text.replace("{{ Title }}", "A title").replace("{{ Content }}", "<p>Body</p>")
+		self.assertEqual(Template(text).render(Title="A title", Content="<p>Body</p>"), expected)
+
+	def test_arbitrary_variables(self):
+		tmpl = Template("{{ Title }} by {{author}} on {{ Date }}")
+		res = tmpl.render({"Title": "Post", "author": "Me"}, Date="2024-01-01")
+		self.assertEqual(res, "Post by Me on 2024-01-01")
+
+	def test_missing_and_repeated_slots(self):
+		tmpl = Template("{{ Title }} - {{ Title }} - {{ Missing }}")
+		self.assertEqual(tmpl.render(Title="X"), "X - X - {{ Missing }}")
+
+	def test_front_matter_values(self):
+		tmpl = Template("{{ Title }} on {{ date }} in {{ tags }}{{ author }}")
+		meta = {"date": "2024-01-01", "tags": ["a", "<b>"], "draft": False, "title": None}
+		self.assertEqual(tmpl.render(tmpl.front_matter_values(meta), Title="Post"), "Post on 2024-01-01 in a, &lt;b&gt;")
+		self.assertEqual(tmpl.front_matter_values()["author"], "")
+
+	def test_values_are_not_substituted_again(self):
+		tmpl = Template("{{ Title }}|{{ Content }}")
+		res = tmpl.render(Title="{{ Content }}", Content="{{ Title }}")
+		self.assertEqual(res, "{{ Content }}|{{ Title }}")
+
+	def test_no_placeholders(self):
+		tmpl = Template("<p>static</p>")
+		self.assertEqual(tmpl.render(Title="unused"), "<p>static</p>")
+
+	def test_write_streams_nodes(self):
+		tmpl = Template("<title>{{ Title }}</title><article>{{ Content }}</article>{{ Missing }}")
+		node = ParentNode("div", [LeafNode("p", "Hello"), LeafNode("b", "World")])
+		out = io.StringIO()
+		tmpl.write(out, Title="Home", Content=node)
+		self.assertEqual(out.getvalue(), tmpl.render(Title="Home", Content=node.to_html()))
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -29,6 +29,12 @@ class TestTextNode(unittest.TestCase):
 		node = TextNode("This is a bold text.", "bold", "https://random.url.io")
 		self.assertEqual(node.url, "https://random.url.io")
 
+	def test_slots(self):
+		node = TextNode("This is a text node", "bold")
+		self.assertFalse(hasattr(node, "__dict__"))
+		with self.assertRaises(AttributeError):
+			node.extra = "not allowed"
+
 
 if __name__ == "__main__":
 	unittest.main()
\ No newline at end of file
@@ -1,5 +1,8 @@
+import io
+import random
 import unittest
 
+import utils
 from textnode import TextNode
 from htmlnode import HTMLNode, LeafNode, ParentNode
 from utils import (
@@ -13,13 +16,23 @@ from utils import (
 	ol_to_html_ol,
 	ul_to_html_ul,
 	markdown_to_blocks,
+	iter_blocks,
+	split_blocks,
+	MarkdownStream,
+	BlockMemo,
 	text_node_to_html_node, 
+	register_text_type,
+	tag_converter,
+	text_node_converters,
 	text_to_textnode,
+	text_to_textnode_chain,
+	scan_inline,
 	split_nodes_delimiter, 
 	extract_markdown_images, 
 	extract_markdown_links, 
 	split_nodes_image, 
 	split_nodes_link,
+	iter_markdown_links,
 	text_type_italic,
 	text_type_bold,
 	text_type_code,
@@ -54,6 +67,21 @@ class TestTextNode(unittest.TestCase):
 		expected = LeafNode(tag="a", value="This is a text node", props={"href" : "www.google.com"})
 		self.assertEqual(text_node_to_html_node(inp), expected)
 
+	def test_image_text_node(self):
+		inp = TextNode("alt text", "image", "/images/rivendell.png")
+		expected = LeafNode(tag="img", value="alt text", props={"src" : "/images/rivendell.png", "alt" : "alt text"})
+		self.assertEqual(text_node_to_html_node(inp), expected)
+
+	def test_register_text_type(self):
+		register_text_type("strikethrough", tag_converter("s"))
+		try:
+			res = text_node_to_html_node(TextNode("gone", "strikethrough"))
+			self.assertEqual(res, LeafNode(tag="s", value="gone"))
+		finally:
+			del text_node_converters["strikethrough"]
+		with self.assertRaises(ValueError):
+			text_node_to_html_node(TextNode("gone", "strikethrough"))
+
 class TestSplitNodesDelimiter(unittest.TestCase):
 	
 	def test_spit_nodes_delimiter(self):
@@ -110,6 +138,21 @@ class TestMarkdownExtraction(unittest.TestCase):
 		res = extract_markdown_links(text)
 		self.assertEqual(res, [])
 
+	def test_extract_links_skips_images(self):
+		text = "A [link](/a) and an ![image](/i.png)"
+		self.assertEqual(extract_markdown_links(text), [("link", "/a")])
+		self.assertEqual(extract_markdown_images(text), [("image", "/i.png")])
+
+	def test_nested_brackets_and_parentheses(self):
+		text = "See [Ring [1]](https://en.wikipedia.org/wiki/Ring_(jewellery)) and ![a (b)](/c_(d).png)."
+		self.assertEqual(extract_markdown_links(text), [("Ring [1]", "https://en.wikipedia.org/wiki/Ring_(jewellery)")])
+		self.assertEqual(extract_markdown_images(text), [("a (b)", "/c_(d).png")])
+
+	def test_iter_markdown_links_spans(self):
+		text = "x [a](/a) ![b](/b)"
+		spans = [(start, end) for start, end, _, _, _ in iter_markdown_links(text)]
+		self.assertEqual([text[start:end] for start, end in spans], ["[a](/a)", "![b](/b)"])
+
 class TestMarkdownImageLinkSplitting(unittest.TestCase):
 
 	def test_split_nodes_link(self):
@@ -164,6 +207,16 @@ class TestMarkdownImageLinkSplitting(unittest.TestCase):
 		new_nodes = split_nodes_image([node])
 		self.assertEqual(new_nodes[0].text, "to boot dev")
 
+	def test_split_nested_markup(self):
+		node = TextNode("Go [home [1]](/h_(x)) now [![logo](/l.png)](/)", text_type_text)
+		self.assertEqual(split_nodes_image([node]), [node])
+		self.assertEqual(split_nodes_link([node]), [
+			TextNode("Go ", text_type_text),
+			TextNode("home [1]", text_type_link, "/h_(x)"),
+			TextNode(" now ", text_type_text),
+			TextNode("![logo](/l.png)", text_type_link, "/"),
+		])
+
 class TestTextToTextNode(unittest.TestCase):
 
 	def test_text_to_textnode(self):
@@ -186,6 +239,90 @@ class TestTextToTextNode(unittest.TestCase):
 		text = "![obi wan image](https://i.imgur.com/fJRm4Vk.jpeg) and a [link](https://boot.dev)"
 		res = text_to_textnode(text)
 
+class TestScanInline(unittest.TestCase):
+
+	def test_scan_inline(self):
+		text = "This is **text** with an *italic* word and a `code block` and an ![obi wan image](https://i.imgur.com/fJRm4Vk.jpeg) and a [link](https://boot.dev)"
+		self.assertEqual(scan_inline(text), text_to_textnode_chain(text))
+
+		self.assertEqual(scan_inline(""), [TextNode("", text_type_text)])
+		self.assertEqual(scan_inline("[a](b)"), [TextNode("a", text_type_link, "b")])
+		self.assertEqual(
+			scan_inline("**bold**"),
+			[TextNode("", text_type_text), TextNode("bold", text_type_bold), TextNode("", text_type_text)]
+		)
+
+	def test_consecutive_links_keep_spaces(self):
+		text = "[a](/a) [b](/b) ![c](/c.png) ![d](/d.png)"
+		expected = [
+			TextNode("a", text_type_link, "/a"),
+			TextNode(" ", text_type_text),
+			TextNode("b", text_type_link, "/b"),
+			TextNode(" ", text_type_text),
+			TextNode("c", text_type_image, "/c.png"),
+			TextNode(" ", text_type_text),
+			TextNode("d", text_type_image, "/d.png"),
+		]
+		self.assertEqual(scan_inline(text), expected)
+		self.assertEqual(text_to_textnode_chain(text), expected)
+
+	def test_nested_emphasis(self):
+		res = scan_inline("**bold *and italic* bold** and `code with **stars**`")
+		self.assertEqual(res[1], TextNode("bold *and italic* bold", text_type_bold))
+		self.assertEqual(res[3], TextNode("code with **stars**", text_type_code))
+		self.assertEqual(scan_inline("*a **b** c*"), [
+			TextNode("", text_type_text),
+			TextNode("a **b** c", text_type_italic),
+			TextNode("", text_type_text),
+		])
+
+	def test_nested_emphasis_to_html(self):
+		def to_html(text):
+			return "".join(text_node_to_html_node(node).to_html() for node in scan_inline(text))
+		self.assertEqual(to_html("**bold *and italic* bold**"), "<b>bold <i>and italic</i> bold</b>")
+		self.assertEqual(to_html("*a **b** c* d"), "<i>a <b>b</b> c</i> d")
+		self.assertEqual(to_html("*a `b` c*"), "<i>a <code>b</code> c</i>")
+		# An inner delimiter left open is shown as it is
+		self.assertEqual(to_html("**a *b**"), "<b>a *b</b>")
+		self.assertEqual(to_html("*a **b*"), "<i>a **b</i>")
+
+	def test_overlapping_delimiters(self):
+		for text in ["**bold *both** italic*", "*italic **both* bold**", "**bold *and italic***"]:
+			with self.assertRaises(Exception, msg=text):
+				scan_inline(text)
+
+	def test_code_spans_keep_stars(self):
+		self.assertEqual(scan_inline("`a*b` and `**`"), [
+			TextNode("", text_type_text),
+			TextNode("a*b", text_type_code),
+			TextNode(" and ", text_type_text),
+			TextNode("**", text_type_code),
+			TextNode("", text_type_text),
+		])
+		self.assertEqual(scan_inline("`*` then *it*")[3], TextNode("it", text_type_italic))
+
+	def test_unmatched_delimiter(self):
+		with self.assertRaises(Exception):
+			scan_inline("This has an *unmatched delimiter")
+		with self.assertRaises(Exception):
+			scan_inline("This has an unmatched `code")
+
+	def test_matches_chain(self):
+		# Whenever the five-pass chain accepts an input, the scanner must
+		# produce exactly the same nodes.
+		tokens = ["word", " ", "*", "**", "`", "[a](/a)", "![i](/i.png)", "x y", "[", "]", "(", ")", "!"]
+		rng = random.Random(1234)
+		compared = 0
+		for _ in range(5000):
+			text = "".join(rng.choice(tokens) for _ in range(rng.randint(0, 12)))
+			try:
+				expected = text_to_textnode_chain(text)
+			except Exception:
+				continue
+			compared += 1
+			self.assertEqual(scan_inline(text), expected, text)
+		self.assertGreater(compared, 500)
+
 class TestMarkdownToBlocks(unittest.TestCase):
 
 	def test_markdown_to_blocks(self):
@@ -214,6 +351,102 @@ Here comes a paragraph but it is separated too far."""
 		self.assertEqual(res[0], "# This is heading with some whitespace.")			
 		self.assertEqual(res[1], "Here comes a paragraph but it is separated too far.")
 
+	def test_blank_separators_make_no_empty_blocks(self):
+		md = "# Heading\n\n\n\n \n\nParagraph\n\n\n"
+		self.assertEqual(markdown_to_blocks(md), ["# Heading", "Paragraph"])
+
+class TestIterBlocks(unittest.TestCase):
+
+	def test_iter_blocks_from_file(self):
+		f = io.StringIO("# Heading\n\n* one\n* two\n\n```\ncode\n```\n\n1. a\n2. b\n\n> quote\n\ntext  \nmore\n")
+		res = list(iter_blocks(f))
+		self.assertEqual(res, [
+			("heading", ["# Heading"]),
+			("unordered_list", ["* one", "* two"]),
+			("code", ["```", "code", "```"]),
+			("ordered_list", ["1. a", "2. b"]),
+			("quote", ["> quote"]),
+			("paragraph", ["text  ", "more"]),
+		])
+
+	def test_matches_markdown_to_blocks(self):
+		md = " # Heading \n\n\nparagraph\n  indented line\n\n\n\n* item\n"
+		blocks = ["\n".join(lines) for _, lines in iter_blocks(md.split("\n"))]
+		self.assertEqual(blocks, markdown_to_blocks(md))
+		self.assertEqual(blocks, [block.strip() for block in md.split("\n\n") if block.strip()])
+		self.assertEqual(list(split_blocks(md)), list(iter_blocks(md.split("\n"))))
+
+	def test_markdown_stream(self):
+		md = "# Title\n\nSome **bold** text.\n\n* a\n* b"
+		out = io.StringIO()
+		MarkdownStream(iter_blocks(io.StringIO(md))).write_html(out)
+		self.assertEqual(out.getvalue(), markdown_to_html_node(md).to_html())
+
+class TestBlockMemo(unittest.TestCase):
+
+	def tearDown(self):
+		utils.block_memo = None
+		utils.text_sink = None
+		utils.link_sink = None
+
+	def stream(self, md):
+		out = io.StringIO()
+		MarkdownStream(iter_blocks(io.StringIO(md))).write_html(out)
+		return out.getvalue()
+
+	def test_same_output_as_without_memo(self):
+		md = "# Title\n\nSome **bold** text.\n\n* a\n* b\n\nSome **bold** text."
+		expected = self.stream(md)
+		utils.block_memo = BlockMemo()
+		self.assertEqual(self.stream(md), expected)
+		self.assertEqual(self.stream(md), expected)
+		# The repeated paragraph is kept the second time, all blocks the third
+		self.assertEqual(self.stream(md), expected)
+		self.assertEqual(utils.block_memo.stats(), {"hits": 6, "misses": 6})
+
+	def block_html(self, memo, block_type, text):
+		out = io.StringIO()
+		memo.write_block(out, block_type, text)
+		return out.getvalue()
+
+	def test_html_is_kept_from_the_second_time(self):
+		memo = BlockMemo()
+		self.assertEqual(self.block_html(memo, "paragraph", "*a*"), "<p><i>a</i></p>")
+		self.assertIsNone(memo.entries["*a*"])
+		self.assertEqual(self.block_html(memo, "paragraph", "*a*"), "<p><i>a</i></p>")
+		self.assertEqual(memo.entries["*a*"], ("<p><i>a</i></p>", None, []))
+		self.assertEqual(self.block_html(memo, "paragraph", "*a*"), "<p><i>a</i></p>")
+		self.assertEqual(memo.stats(), {"hits": 1, "misses": 2})
+
+	def test_least_recently_used_block_is_dropped(self):
+		memo = BlockMemo(max_entries=2)
+		for text in ["a", "a", "b", "a", "c"]:
+			self.block_html(memo, "paragraph", text)
+		self.assertEqual(list(memo.entries), ["a", "c"])
+
+	def test_hits_feed_the_text_sink(self):
+		memo = BlockMemo()
+		self.block_html(memo, "paragraph", "plain **bold**")
+		self.block_html(memo, "paragraph", "plain **bold**")
+		runs = []
+		utils.text_sink = runs.append
+		# Kept without text nodes: converted again to collect them
+		self.block_html(memo, "paragraph", "plain **bold**")
+		self.block_html(memo, "paragraph", "plain **bold**")
+		self.assertEqual(memo.stats(), {"hits": 1, "misses": 3})
+		self.assertEqual(len(runs), 2)
+		self.assertEqual(runs[0], runs[1])
+		self.assertEqual([node.text for node in runs[1] if node.text], ["plain ", "bold"])
+
+	def test_hits_feed_the_link_sink(self):
+		memo = BlockMemo()
+		links = []
+		utils.link_sink = lambda url, include: links.append((url, include))
+		for _ in range(3):
+			self.block_html(memo, "paragraph", "[home](/) and ![map](/images/map.png)")
+		self.assertEqual(memo.stats(), {"hits": 1, "misses": 2})
+		self.assertEqual(links, [("/", None), ("/images/map.png", None)] * 3)
+
 class TestBlockToBlockType(unittest.TestCase):
 
 	def test_block_to_block_type(self):
@@ -251,6 +484,12 @@ class TestBlockToBlockType(unittest.TestCase):
 		res = block_to_block_type(md_block)
 		self.assertEqual(res, "ordered_list")
 
+	def test_include_block(self):
+		self.assertEqual(block_to_block_type("{{ include footer.md }}"), "include")
+		self.assertEqual(block_to_block_type("{{include notes/a.md}}"), "include")
+		self.assertEqual(block_to_block_type("{{ include footer.md }} and more"), "paragraph")
+		self.assertEqual(block_to_block_type("{{ include footer.md }}\n{{ include footer.md }}"), "paragraph")
+
 class TestBlockToHTMLNode(unittest.TestCase):
 
 	def test_text_to_children(self):
@@ -0,0 +1,144 @@
+import os
+import unittest
+from unittest import mock
+
+import depgraph
+import feeds
+import linkcheck
+import utils
+
+from console import console
+from sitetest import SiteTestCase
+from watch import BuildGraph
+
+
+class TestBuildGraph(SiteTestCase):
+
+	def setUp(self):
+		super().setUp()
+		os.makedirs("content/blog")
+		self.write("content/index.md", "# Home\n\nWelcome!\n\n* one\n* two")
+		self.write("content/blog/index.md", "# Blog\n\nSome *words*.")
+		self.write("static/index.css", "body {}")
+		self.build()
+		self.graph = BuildGraph()
+
+	def rebuild(self):
+		return self.graph.rebuild(*self.graph.poll())
+
+	def test_no_changes(self):
+		self.assertEqual(self.graph.poll(), (set(), set()))
+
+	def test_page_edit_rebuilds_only_that_page(self):
+		self.write("content/index.md", "# Home\n\nWelcome back!\n\n* one\n* two")
+		outputs = self.rebuild()
+		self.assertEqual(outputs, [os.path.join("public", "index.html")])
+		self.assertIn("<p>Welcome back!</p>", self.read("public/index.html"))
+
+	def test_render_matches_full_build(self):
+		self.write("content/blog/index.md", "# Blog\n\nMore **words** and a [link](/).")
+		self.rebuild()
+		watched = self.read("public/blog/index.html")
+		self.build("--clean")
+		self.assertEqual(watched, self.read("public/blog/index.html"))
+
+	def test_template_change_rebuilds_all_pages(self):
+		self.write("template.html", "<h1>{{ Title }}</h1>{{ Content }}")
+		outputs = self.rebuild()
+		self.assertEqual(len(outputs), 2)
+		self.assertIn("<h1>Blog</h1>", self.read("public/blog/index.html"))
+
+	def test_page_template_change_rebuilds_its_pages(self):
+		self.write("post.html", "<h2>{{ Title }}</h2>{{ Content }}")
+		self.write("content/blog/index.md", "---\ntemplate: post.html\n---\n# Blog\n\nSome *words*.")
+		self.rebuild()
+		self.write("post.html", "<h3>{{ Title }}</h3>{{ Content }}")
+		outputs = self.rebuild()
+		self.assertEqual(outputs, [os.path.join("public", "blog", "index.html")])
+		self.assertIn("<h3>Blog</h3>", self.read("public/blog/index.html"))
+
+	def test_drafts_are_not_published(self):
+		self.write("content/blog/index.md", "# Blog\n\n" + "Some *words*. " * 100)
+		self.rebuild()
+		self.assertTrue(os.path.exists("public/blog/index.html.gz"))
+		self.write("content/blog/index.md", "---\ndraft: true\n---\n# Blog\n\nNot ready.")
+		self.write("content/secret.md", "---\ndraft: true\n---\n# Secret")
+		outputs = self.rebuild()
+		self.assertEqual(sorted(outputs), [os.path.join("public", "blog", "index.html"), os.path.join("public", "blog", "index.html.gz")])
+		self.assertFalse(os.path.exists("public/blog"))
+		self.assertFalse(os.path.exists("public/secret.html"))
+
+		self.write("content/secret.md", "---\ndraft: true\n---\n# Secret\n\nStill not ready.")
+		self.assertEqual(self.rebuild(), [])
+
+		graph = BuildGraph(drafts=True)
+		self.write("content/secret.md", "# Secret")
+		graph.rebuild(*graph.poll())
+		self.assertTrue(os.path.exists("public/secret.html"))
+
+	def test_listings_and_feeds_follow_page_edits(self):
+		self.build("--listings", "--feeds", "--no-compress")
+		graph = BuildGraph(compress=False, listings=True, feeds=True)
+		self.write("content/blog/index.md", "---\ntags: [news]\n---\n# Weblog\n\nSome *mithril*.")
+		outputs = graph.rebuild(*graph.poll())
+		self.assertIn(os.path.join("public", "list", "index.html"), outputs)
+		self.assertIn(">Weblog</a>", self.read("public/list/index.html"))
+		self.assertIn(">Weblog</a>", self.read("public/tags/news/index.html"))
+		self.assertIn('"Weblog"', self.read("public/search.json"))
+		self.assertIn('"mithril"', self.read("public/search.json"))
+		graph.refresh()
+
+		self.write("content/blog/index.md", "# Weblog\n\nSome *mithril*.")
+		outputs = graph.rebuild(*graph.poll())
+		self.assertIn(os.path.join("public", "tags", "news", "index.html"), outputs)
+		self.assertFalse(os.path.exists("public/tags"))
+
+		# A build agrees with what watch left behind
+		graph.manifest.save()
+		graph.index.save()
+		graph.text_cache.save()
+		watched = self.read("public/search.json")
+		self.build("--listings", "--feeds", "--no-compress")
+		self.assertFalse(console.counters.get("pages rendered"))
+		self.assertFalse(console.counters.get("listings rendered"))
+		self.assertEqual(self.read("public/search.json"), watched)
+
+	def test_added_and_removed_files(self):
+		os.makedirs("content/new")
+		self.write("content/new/index.md", "# New")
+		os.remove("content/blog/index.md")
+		self.write("static/extra.css", "p {}")
+		self.rebuild()
+		self.assertEqual(self.read("public/new/index.html"), "<title>New</title><div><h1>New</h1></div>")
+		self.assertFalse(os.path.exists("public/blog"))
+		self.assertEqual(self.read("public/extra.css"), "p {}")
+
+		# The manifest kept in memory agrees with a fresh build
+		self.graph.manifest.save()
+		self.build()
+		self.assertTrue(os.path.exists("public/extra.css"))
+		self.assertTrue(os.path.exists("public/new/index.html"))
+
+	def test_failed_render_resets_the_collecting_state(self):
+		graph = BuildGraph(feeds=True)
+		with mock.patch.object(BuildGraph, "convert_block", side_effect=ValueError("bad block")):
+			with self.assertRaises(ValueError):
+				graph.render_page("content/index.md")
+		self.assertIsNone(graph.dependencies.collecting)
+		self.assertIsNone(depgraph.active)
+		self.assertIsNone(linkcheck.collecting)
+		self.assertIsNone(feeds.collecting)
+		self.assertIsNone(utils.text_sink)
+		self.assertIsNone(utils.link_sink)
+		self.assertIsNone(utils.dependency_sink)
+
+		with mock.patch("main.generate_page", side_effect=ValueError("bad page")):
+			with self.assertRaises(ValueError):
+				self.build("--clean", "--feeds")
+		self.assertIsNone(depgraph.active)
+		self.assertIsNone(linkcheck.collecting)
+		self.assertIsNone(feeds.collecting)
+
+
+if __name__ == "__main__":
+	unittest.main()
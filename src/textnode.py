@@ -1,4 +1,6 @@
 class TextNode:
+	# One TextNode is created per inline span, so skip the per-instance __dict__
+	__slots__ = ("text", "text_type", "url")
 
 	def __init__(self, text, text_type, url=None):
 		self.text = text
@@ -1,6 +1,8 @@
+import os
 import re
+from collections import OrderedDict
 
-from htmlnode import LeafNode, ParentNode, HTMLNode
+from htmlnode import Fragments, LeafNode, ParentNode, HTMLNode
 from textnode import TextNode
 
 text_type_text = "text"
@@ -11,9 +13,87 @@ text_type_image = "image"
 text_type_link = "link"
 
 ### TextNode to HTMLNode
+def tag_converter(tag: str):
+	"""
+	Build a converter that wraps the text of a TextNode in a single tag.
+	"""
+	def convert(text_node: TextNode) -> LeafNode:
+		return LeafNode(tag=tag, value=text_node.text)
+	return convert
+
+def emphasis_converter(tag: str):
+	"""
+	Build a converter for bold and italic TextNodes, whose text may hold
+	nested spans: "bold *and italic* bold" in a bold node becomes
+	<b>bold <i>and italic</i> bold</b>. A nested delimiter left open is
+	shown as it is.
+	"""
+	def convert(text_node: TextNode) -> LeafNode:
+		text = text_node.text
+		if "*" in text or "`" in text:
+			nodes = []
+			_scan_delimited(text, 0, len(text), nodes, strict=False)
+			text = "".join(text_node_to_html_node(node).to_html() for node in nodes)
+		return LeafNode(tag=tag, value=text)
+	return convert
+
+def link_to_html_node(text_node: TextNode) -> LeafNode:
+	text = text_node.text
+	if not text and link_title is not None:
+		# [](/majesty) links to a page under its own title
+		target = link_title(text_node.url)
+		if target is not None:
+			url, text = target
+			if dependency_sink is not None:
+				dependency_sink("page", url)
+			text = text or ""
+	if link_sink is not None:
+		link_sink(text_node.url, _including[-1] if _including else None)
+	return LeafNode(tag="a", value=text, props={"href" : text_node.url})
+
+def image_to_html_node(text_node: TextNode) -> LeafNode:
+	if link_sink is not None:
+		link_sink(text_node.url, _including[-1] if _including else None)
+	props = {"src" : text_node.url, "alt" : text_node.text}
+	if image_attributes is not None:
+		# width, height and srcset of the image, when it is known
+		image = image_attributes(text_node.url)
+		if image is not None:
+			key, attributes = image
+			if dependency_sink is not None:
+				dependency_sink("image", key)
+			props.update(attributes)
+	return LeafNode(
+		tag="img",
+		value=text_node.text,
+		props=props)
+
+# text_type -> function turning a TextNode of that type into an HTMLNode
+text_node_converters = {
+	text_type_text : tag_converter(None),
+	text_type_bold : emphasis_converter("b"),
+	text_type_italic : emphasis_converter("i"),
+	text_type_code : tag_converter("code"),
+	text_type_link : link_to_html_node,
+	text_type_image : image_to_html_node,
+}
+
+def register_text_type(text_type: str, converter):
+	"""
+	Teach text_node_to_html_node about a new text_type.
+
+	Example:
+	register_text_type("strikethrough", tag_converter("s"))
+	text_node_to_html_node(TextNode("gone", "strikethrough"))
+	# LeafNode(tag="s", value="gone")
+	"""
+	text_node_converters[text_type] = converter
+
 def text_node_to_html_node(text_node : TextNode) -> LeafNode:
 	"""
 	Takes a TextNode and turns it into an HTMLNode.
+	Only the node for the TextNode's own type is built, looked up in
+	text_node_converters.
 
 	:params:
 	text_node: TextNode
@@ -21,35 +101,165 @@ def text_node_to_html_node(text_node : TextNode) -> LeafNode:
 	:return:
 	HTMLNode
 	"""
-	valid_text_to_html = {
-		"text" : LeafNode(tag=None, value=text_node.text), 
-		"bold" : LeafNode(tag="b", value=text_node.text),
-		"italic" : LeafNode(tag="i", value=text_node.text),
-		"code" : LeafNode(tag="code", value=text_node.text),
-		"link" : LeafNode(tag="a", value=text_node.text, props={"href" : text_node.url}),
-		"image" : LeafNode(
-			tag="img", 
-			value=text_node.text, 
-			props={"src" : text_node.url, "alt" : text_node.text})
-	}
-	if text_node.text_type in valid_text_to_html:
-		return valid_text_to_html[text_node.text_type]
-		
-	raise ValueError("TextNode does not contain a valid text_type")
+	converter = text_node_converters.get(text_node.text_type)
+	if converter is None:
+		raise ValueError("TextNode does not contain a valid text_type")
+	return converter(text_node)
 
 ### Markdown 
+# Blocks kept by a BlockMemo unless the build asks for another size
+BLOCK_MEMO_SIZE = 4096
+
+# The BlockMemo of the running build, or None: MarkdownStream converts
+# every block then.
+block_memo = None
+
 def markdown_to_html_node(markdown: str) -> ParentNode:
 	children = []
-	# split markdown into blocks
-	md_blocks = markdown_to_blocks(markdown)
-
-	# loop over blocks
-	for md_block in md_blocks:
-		html_node = block_to_html_node(md_block)
+	# split markdown into typed blocks and convert each one
+	for block_type, lines in split_blocks(markdown):
+		html_node = block_converters[block_type]("\n".join(lines))
 		children.append(html_node)
 		
 	return ParentNode(tag="div", children=children)
 
+class MarkdownStream:
+	"""
+	The html content of a markdown document, converted block by block
+	while it is written.
+
+	Template.write() streams it like an HTMLNode tree, but only one block
+	(and its html nodes) is held in memory at a time.
+	The output is the same as markdown_to_html_node(markdown).to_html().
+	While a block_memo is set, blocks seen before are written from it.
+	"""
+
+	def __init__(self, blocks):
+		"""
+		parameters:
+		* blocks: an iterable of (block_type, lines), e.g. from iter_blocks
+		"""
+		self.blocks = blocks
+
+	def write_html(self, out):
+		out.write("<div>")
+		memo = block_memo
+		for block_type, lines in self.blocks:
+			if memo is None:
+				block_converters[block_type]("\n".join(lines)).write_html(out)
+			else:
+				memo.write_block(out, block_type, "\n".join(lines))
+		out.write("</div>")
+
+class BlockMemo:
+	"""
+	Bounded LRU memo of block text -> html fragment, shared by every page
+	a process converts. Boilerplate that recurs across pages (license
+	footers, notes, repeated code samples) is converted once more after
+	it is first seen; after that its html is written straight from the
+	memo, skipping inline parsing, node building and serialization.
+
+	Most blocks of a site occur once, so a block seen for the first time
+	is only remembered by its text and streamed as usual; its html is
+	kept from the second time on. Unique blocks then cost a dict insert
+	rather than a copy of their html.
+
+	When a text_sink is listening, the TextNodes of a block are kept with
+	its html and handed to the sink again on every hit, so the search
+	index sees the same words either way; so are the targets of its links
+	and images for the link_sink. Blocks that report a dependency
+	(includes, linked page titles) are always converted.
+
+	parameters:
+	* max_entries: number of blocks kept before the least recently used is dropped
+	"""
+
+	def __init__(self, max_entries: int=BLOCK_MEMO_SIZE):
+		self.max_entries = max_entries
+		# text -> (html, list of TextNode runs or None, list of links), None
+		# if seen once, False if the block has dependencies
+		self.entries = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	def write_block(self, out, block_type: str, text: str):
+		"""
+		Write the html of one block into out, the same as
+		block_converters[block_type](text).write_html(out).
+		"""
+		global text_sink, dependency_sink, link_sink
+		sink = text_sink
+		entries = self.entries
+		entry = entries.get(text)
+		if entry and (sink is None or entry[1] is not None):
+			entries.move_to_end(text)
+			self.hits += 1
+			if sink is not None:
+				for nodes in entry[1]:
+					sink(nodes)
+			if link_sink is not None:
+				for url, include in entry[2]:
+					link_sink(url, include)
+			out.write(entry[0])
+			return
+
+		self.misses += 1
+		if entry is False or text not in entries:
+			if entry is None:
+				entries[text] = None
+				if len(entries) > self.max_entries:
+					entries.popitem(last=False)
+			block_converters[block_type](text).write_html(out)
+			return
+
+		runs = None
+		if sink is not None:
+			runs = []
+			def record(nodes):
+				runs.append(nodes)
+				sink(nodes)
+			text_sink = record
+		dependencies = []
+		depend = dependency_sink
+		def record_dependency(kind, target):
+			dependencies.append((kind, target))
+			if depend is not None:
+				depend(kind, target)
+		dependency_sink = record_dependency
+		links = []
+		check = link_sink
+		def record_link(url, include):
+			links.append((url, include))
+			if check is not None:
+				check(url, include)
+		link_sink = record_link
+		try:
+			fragments = Fragments()
+			block_converters[block_type](text).write_html(fragments)
+		finally:
+			text_sink = sink
+			dependency_sink = depend
+			link_sink = check
+		html = "".join(fragments)
+		# Html that depends on other files or pages is never kept
+		entries[text] = (html, runs, links) if not dependencies else False
+		entries.move_to_end(text)
+		out.write(html)
+
+	def reset(self):
+		self.hits = 0
+		self.misses = 0
+
+	def stats(self) -> dict:
+		return {"hits": self.hits, "misses": self.misses}
+
+	def merge(self, stats: dict):
+		"""
+		Add the counters of a worker process to this memo's.
+		"""
+		self.hits += stats["hits"]
+		self.misses += stats["misses"]
+
 def block_to_html_node(markdown_block: str) -> HTMLNode:
 	"""
 	This helper function is supposed to take in a 
@@ -67,16 +277,8 @@ def block_to_html_node(markdown_block: str) -> HTMLNode:
 
 	To cover those caveats we should be able to use the text_to_children function below
 	"""
-	func_dict = {
-		"heading" : heading_to_html_heading,
-		"paragraph" : paragraph_to_html_paragraph,
-		"code" : code_to_html_code,
-		"quote" : quote_to_html_quote,
-		"ordered_list" : ol_to_html_ol,
-		"unordered_list" : ul_to_html_ul
-	}
 	block_type = block_to_block_type(markdown_block)
-	return func_dict[block_type](markdown_block)
+	return block_converters[block_type](markdown_block)
 
 def heading_to_html_heading(markdown_heading: str):
 
@@ -129,6 +331,33 @@ def ul_to_html_ul(markdown_ul: str):
 		ul_node.children.append(ParentNode(tag=tag, children=item_text_node))
 	return ul_node
 
+def include_to_html(markdown_include: str) -> LeafNode:
+	"""
+	Convert the markdown file named by an include block in its place.
+	The path is relative to include_dir; an included file may include
+	others, but not itself.
+
+	Example:
+	include_to_html("{{ include footer.md }}")
+	# LeafNode(None, "<p>...</p>") with the html of includes/footer.md
+	"""
+	path = os.path.normpath(os.path.join(include_dir, include_re.fullmatch(markdown_include).group(1)))
+	if path in _including:
+		raise ValueError(f"Include cycle: {' -> '.join(_including + [path])}")
+	if not os.path.isfile(path):
+		raise ValueError(f"Include not found: {path}")
+	if dependency_sink is not None:
+		dependency_sink("include", path)
+	_including.append(path)
+	try:
+		fragments = Fragments()
+		with open(path, "r", encoding="utf-8") as f:
+			for block_type, lines in iter_blocks(f):
+				block_converters[block_type]("\n".join(lines)).write_html(fragments)
+	finally:
+		_including.pop()
+	return LeafNode(None, "".join(fragments))
+
 def ol_to_html_ol(markdown_ol: str):
 	tag = "li"
 	ol_node = ParentNode(tag="ol", children=[])
@@ -139,6 +368,51 @@ def ol_to_html_ol(markdown_ol: str):
 		ol_node.children.append(ParentNode(tag=tag, children=item_text_node))
 	return ol_node
 
+# block_type -> function turning a block of that type into an HTMLNode
+block_converters = {
+	"heading" : heading_to_html_heading,
+	"paragraph" : paragraph_to_html_paragraph,
+	"code" : code_to_html_code,
+	"quote" : quote_to_html_quote,
+	"ordered_list" : ol_to_html_ol,
+	"unordered_list" : ul_to_html_ul,
+	"include" : include_to_html
+}
+
+# A block of the single line {{ include path }}
+include_re = re.compile(r"\{\{\s*include\s+(\S+?)\s*\}\}")
+# Directory the paths of include blocks are relative to
+include_dir = "includes"
+# Includes being converted, innermost last
+_including = []
+
+# Called with (kind, target) for everything outside the block that its
+# html depends on: ("include", path) for included files, ("page", url)
+# for links showing the title of the page at url and ("image", path)
+# for images shown with their size. None when nobody listens.
+dependency_sink = None
+
+# Called with the url of a link without text; returns (url, title) of the
+# page it points to (title None if there is none yet), or None for urls
+# outside the site. None when titles are not resolved.
+link_title = None
+
+# Called with the url of an image; returns (path below the output
+# directory, dict of extra img attributes) for images of the site, or
+# None for urls outside it. None when images are shown as written.
+image_attributes = None
+
+# Called with (url, include) for the target of every link and image while
+# it is converted, include being the path of the included file it is in
+# or None, e.g. by linkcheck to check the targets once the site is
+# written. None when nobody listens.
+link_sink = None
+
+# Called with the TextNodes of every run of inline text while it is
+# converted, e.g. by feeds.PageText to index the words of a page
+# without parsing it a second time. None when nobody listens.
+text_sink = None
+
 def text_to_children(text):
 	"""
 	This should turn markdown text into the correct HTMLNodes.
@@ -146,12 +420,17 @@ def text_to_children(text):
 	But for this to work, we first have to transform the text into a TextNode
 	"""	
 	text_nodes = text_to_textnode(text)
+	if text_sink is not None:
+		text_sink(text_nodes)
 	return [text_node_to_html_node(text_node) for text_node in text_nodes]	
 
 def block_to_block_type(markdown_block: str) -> str:
+	return lines_to_block_type(markdown_block.split("\n"))
 
-	# In case of quotes or lists
-	lines = markdown_block.split("\n")
+def lines_to_block_type(lines: list[str]) -> str:
+	"""
+	Classify a block given as its list of lines.
+	"""
 	# For headings, only first_line should exist.
 	first_line = lines[0]
 
@@ -160,6 +439,9 @@ def block_to_block_type(markdown_block: str) -> str:
 		if len(parts) == 2 and 1 <= len(parts[0]) <= 6 and all(char == "#" for char in parts[0]):
 			return "heading"
 		
+	if len(lines) == 1 and first_line.startswith("{{") and include_re.fullmatch(first_line):
+		return "include"
+
 	if len(lines) >= 2 and lines[0].strip() == "```" and lines[-1].strip() == "```":
 		return "code"
 	
@@ -223,24 +505,240 @@ def markdown_to_blocks(markdown: str) -> list[str]:
 		"
 	]
 	"""
-	block_markdown = []
-	split_markdown = markdown.split("\n\n")
-	for block in split_markdown:
-		if block != "":
-			block_markdown.append(block.strip())
-	
-	return block_markdown
+	blocks = []
+	for block in markdown.split("\n\n"):
+		block = block.strip()
+		if block:
+			blocks.append(block)
+	return blocks
+
+def split_blocks(markdown: str):
+	"""
+	Yield (block_type, lines) for every block of markdown already in
+	memory, exactly like iter_blocks, but split by str.split in one pass
+	each rather than line by line in Python. A run of newlines splits
+	into empty pieces, which are dropped like the empty lines iter_blocks
+	skips.
+
+	return:
+	* generator of (block_type, list of lines)
+	"""
+	for block in markdown.split("\n\n"):
+		block = block.strip()
+		if block:
+			lines = block.split("\n")
+			yield lines_to_block_type(lines), lines
+
+def iter_blocks(lines):
+	"""
+	Read markdown line by line and yield one (block_type, lines) tuple per
+	block. Blocks are separated by empty lines, and like markdown_to_blocks
+	the leading and trailing whitespace of a block is stripped.
+
+	Only the lines of the current block are held in memory, so a file
+	object can be passed in directly:
+
+	with open("content/index.md") as f:
+		for block_type, lines in iter_blocks(f):
+			...
+
+	parameters:
+	* lines: any iterable of lines, with or without trailing newlines
+
+	return:
+	* generator of (block_type, list of lines)
+	"""
+	block = []
+	for line in lines:
+		line = line.rstrip("\n")
+		if line:
+			block.append(line)
+		elif block:
+			block = strip_block(block)
+			if block:
+				yield lines_to_block_type(block), block
+			block = []
+	block = strip_block(block)
+	if block:
+		yield lines_to_block_type(block), block
+
+def strip_block(lines: list[str]) -> list[str]:
+	"""
+	The line-wise equivalent of "\n".join(lines).strip().split("\n").
+	"""
+	start, end = 0, len(lines)
+	while start < end and not lines[start].strip():
+		start += 1
+	while end > start and not lines[end - 1].strip():
+		end -= 1
+	if start == end:
+		return []
+	lines = lines[start:end]
+	lines[0] = lines[0].lstrip()
+	lines[-1] = lines[-1].rstrip()
+	return lines
 
 
 ### Inline text to TextNode
 def text_to_textnode(text: str) -> list[TextNode]:
-    text_node = TextNode(text=text, text_type=text_type_text)
-    img = split_nodes_image([text_node])
-    lnk = split_nodes_link(img)
-    bold = split_nodes_delimiter(lnk, "**", text_type_bold)
-    italic = split_nodes_delimiter(bold, "*", text_type_italic)
-    code = split_nodes_delimiter(italic, "`", text_type_code)
-    return code
+	return scan_inline(text)
+
+def text_to_textnode_chain(text: str) -> list[TextNode]:
+	"""
+	The original five-pass implementation of text_to_textnode.
+	Kept as the reference scan_inline is tested and benchmarked against.
+	"""
+	text_node = TextNode(text=text, text_type=text_type_text)
+	img = split_nodes_image([text_node])
+	lnk = split_nodes_link(img)
+	bold = split_nodes_delimiter(lnk, "**", text_type_bold)
+	italic = split_nodes_delimiter(bold, "*", text_type_italic)
+	code = split_nodes_delimiter(italic, "`", text_type_code)
+	return code
+
+# Links, and images when the match is preceded by "!". Starting the pattern
+# with a literal "[" lets the regex engine skip ahead to candidates quickly.
+# A link or image: [text](url). The text may hold one level of nested
+# brackets and the url one level of balanced parentheses, e.g.
+# [Ring [1]](https://en.wikipedia.org/wiki/Ring_(jewellery))
+inline_link_re = re.compile(r"\[((?:[^\[\]]++|\[[^\[\]]*+\])*+)\]\(((?:[^()]++|\([^()]*+\))*+)\)")
+
+def iter_markdown_links(text: str):
+	"""
+	Yield (start, end, text, url, text_type) for every link and image in
+	text, left to right, in one finditer pass. text_type is
+	text_type_image when the match is preceded by "!", and start then
+	includes the "!", so text[start:end] is the whole markup.
+
+	An image inside the text of a link, e.g. [![logo](/logo.png)](/),
+	stays part of the link's text.
+	"""
+	for match in inline_link_re.finditer(text):
+		start = match.start()
+		if start and text[start - 1] == "!":
+			yield start - 1, match.end(), match.group(1), match.group(2), text_type_image
+		else:
+			yield start, match.end(), match.group(1), match.group(2), text_type_link
+
+
+def scan_inline(text: str) -> list[TextNode]:
+	"""
+	Turn a run of inline markdown into TextNodes in one left-to-right walk.
+
+	Produces the same TextNode sequence as the chain of split_nodes_image,
+	split_nodes_link and split_nodes_delimiter passes (text_to_textnode_chain)
+	for every input the chain accepts, including the empty text nodes around
+	delimited spans, but allocates each node once and visits every character
+	a bounded number of times.
+
+	Emphasis may nest: a span ends at the delimiter that matches its own,
+	not at one of a span opened inside it, so "*italic **and bold** italic*"
+	and "**bold *and italic* bold**" are one span each, whose text keeps
+	the inner delimiters for the converters to render (see
+	emphasis_converter). Delimiters that overlap instead of nesting, e.g.
+	"**bold *both** italic*", leave one of them unmatched and raise, as do
+	spans closed by the same run of stars, e.g. "**bold *and italic***".
+	Inside backticks every character is code, so "`a*b`" is a code span.
+	"""
+	nodes = []
+	position = 0
+	found = False
+	# Same matches as iter_markdown_links, without a generator frame per call
+	for match in inline_link_re.finditer(text):
+		found = True
+		start = match.start()
+		if start and text[start - 1] == "!":
+			start -= 1
+			text_type = text_type_image
+		else:
+			text_type = text_type_link
+		if start > position:
+			_scan_delimited(text, position, start, nodes)
+		nodes.append(TextNode(match.group(1), text_type, match.group(2)))
+		position = match.end()
+	if position < len(text) or not found:
+		_scan_delimited(text, position, len(text), nodes)
+	return nodes
+
+# delimiter -> text_type of the spans it encloses
+delimiter_types = {
+	"**" : text_type_bold,
+	"*" : text_type_italic,
+	"`" : text_type_code,
+}
+
+def _scan_delimited(text: str, start: int, end: int, nodes: list[TextNode], strict: bool=True):
+	"""
+	Split text[start:end] on the **, * and ` delimiters and append the
+	resulting TextNodes. Like split_nodes_delimiter, every span is preceded
+	and the run is closed by a (possibly empty) text node.
+
+	An opening delimiter without a closing one raises, or when strict is
+	False, stays part of the text.
+	"""
+	run_start = start
+	position = start
+	next_star = text.find("*", start, end)
+	next_tick = text.find("`", start, end)
+	while next_star != -1 or next_tick != -1:
+		if next_tick == -1 or (next_star != -1 and next_star < next_tick):
+			opening = next_star
+			delimiter = "**" if text.startswith("**", opening, end) else "*"
+			closing = _closing_star(text, opening + len(delimiter), end, delimiter)
+		else:
+			opening = next_tick
+			delimiter = "`"
+			closing = text.find("`", opening + 1, end)
+
+		if closing == -1:
+			if strict:
+				raise Exception(f"Invalid markdown: Unmatched delimiter {delimiter}")
+			# No later delimiter of its kind can be closed either, so the
+			# scan stays linear
+			position = opening + len(delimiter)
+		else:
+			nodes.append(TextNode(text[run_start:opening], text_type_text))
+			nodes.append(TextNode(text[opening + len(delimiter):closing], delimiter_types[delimiter]))
+			run_start = position = closing + len(delimiter)
+
+		if next_star != -1 and next_star < position:
+			next_star = text.find("*", position, end)
+		if next_tick != -1 and next_tick < position:
+			next_tick = text.find("`", position, end)
+	nodes.append(TextNode(text[run_start:end], text_type_text))
+
+def _closing_star(text: str, position: int, end: int, delimiter: str) -> int:
+	"""
+	Find the ** or * closing the span that delimiter opened just before
+	position, matching the spans opened inside it on the way.
+
+	Runs of stars are split into ** pairs from the left and a single *
+	for an odd one out, like split_nodes_delimiter splits them. A piece
+	closes the open span of its own kind, along with any span opened
+	inside that one and left open, or else opens a span. Backticks are
+	plain text here, as they are to split_nodes_delimiter.
+
+	return:
+	* the index of the closing delimiter, or -1 when there is none
+	"""
+	# At most one span of each kind is open at a time
+	stack = [delimiter]
+	while True:
+		position = text.find("*", position, end)
+		if position == -1:
+			return -1
+		run_end = position + 1
+		while run_end < end and text[run_end] == "*":
+			run_end += 1
+		while position < run_end:
+			piece = "**" if run_end - position >= 2 else "*"
+			if piece in stack:
+				del stack[stack.index(piece):]
+				if not stack:
+					return position
+			else:
+				stack.append(piece)
+			position += len(piece)
 
 ### Text splitting
 def split_nodes_delimiter(
@@ -284,45 +782,7 @@ def split_nodes_delimiter(
 	return new_nodes
 
 def split_nodes_image(old_nodes: list[TextNode]) -> list[TextNode]:
-	new_nodes = []
-
-	for node in old_nodes:
-		if node.text_type != text_type_text:
-			new_nodes.append(node)
-			continue
-
-		images = extract_markdown_images(node.text)
-		if not images:
-			new_nodes.append(node)
-			continue
-
-		current_position = 0
-
-		for i, image in enumerate(images):
-			markup = f"![{image[0]}]({image[1]})"
-			image_position = node.text.find(markup, current_position)
-
-			# Extract text up to the current link
-			before_image = node.text[current_position:image_position]
-			after_image = node.text[image_position+len(markup):]
-			if before_image:
-				new_nodes.append(TextNode(before_image, text_type_text))
-
-			# Add the link node
-			new_nodes.append(TextNode(image[0], text_type_image, image[1]))
-
-			if i == len(images)-1 and after_image:
-				new_nodes.append(TextNode(after_image, text_type_text))
-
-
-			# Move the current position past the link markup
-			if image_position + len(markup) < len(node.text):
-				if node.text[image_position + len(markup)] == " ":
-					current_position = image_position + len(markup) + 1
-				else:
-					current_position = image_position + len(markup)
-
-	return new_nodes
+	return _split_nodes_links(old_nodes, text_type_image)
 
 def extract_markdown_images(text: str) -> list[tuple]:
 	"""
@@ -334,7 +794,7 @@ def extract_markdown_images(text: str) -> list[tuple]:
 	print(extract_markdown_images(text))
 	# [("rick roll", "https://i.imgur.com/aKaOqIh.gif"), ("obi wan", "https://i.imgur.com/fJRm4Vk.jpeg")]
 	"""
-	return re.findall(r"!\[(.*?)\]\((.*?)\)", text)
+	return [(alt, url) for _, _, alt, url, text_type in iter_markdown_links(text) if text_type == text_type_image]
 
 # def split_nodes_link(old_nodes: list[TextNode]) -> list[TextNode]:
 # 	"""
@@ -395,6 +855,13 @@ def split_nodes_link(old_nodes: list[TextNode]) -> list[TextNode]:
 	#     ),
 	# ]
 	"""
+	return _split_nodes_links(old_nodes, text_type_link)
+
+def _split_nodes_links(old_nodes: list[TextNode], text_type: str) -> list[TextNode]:
+	"""
+	Split the text nodes on the links (or images) found by
+	iter_markdown_links, slicing the text on the match spans.
+	"""
 	new_nodes = []
 
 	for node in old_nodes:
@@ -402,40 +869,23 @@ def split_nodes_link(old_nodes: list[TextNode]) -> list[TextNode]:
 			new_nodes.append(node)
 			continue
 
-		links = extract_markdown_links(node.text)
-		if not links:
+		text = node.text
+		position = 0
+		for start, end, link_text, url, match_type in iter_markdown_links(text):
+			if match_type != text_type:
+				continue
+			if start > position:
+				new_nodes.append(TextNode(text[position:start], text_type_text))
+			new_nodes.append(TextNode(link_text, text_type, url))
+			position = end
+
+		if position == 0:
 			new_nodes.append(node)
-			continue
-		current_position = 0
-
-		for i, link in enumerate(links):
-			markup = f"[{link[0]}]({link[1]})"
-			link_position = node.text.find(markup, current_position)
-
-			# Extract text up to the current link
-			before_link = node.text[current_position:link_position]
-			after_link = node.text[link_position+len(markup):]
-			if before_link:
-				new_nodes.append(TextNode(before_link, text_type_text))
-
-			# Add the link node
-			new_nodes.append(TextNode(link[0], text_type_link, link[1]))
-
-			if i == len(links)-1 and after_link:
-				new_nodes.append(TextNode(after_link, text_type_text))
-
-			# Move the current position past the link markup
-			if link_position + len(markup) < len(node.text):
-				if node.text[link_position + len(markup)] == " ":
-					current_position = link_position + len(markup) + 1
-				else:
-					current_position = link_position + len(markup)
+		elif position < len(text):
+			new_nodes.append(TextNode(text[position:], text_type_text))
 
 	return new_nodes
 
-
-
-
 def extract_markdown_links(text: str) -> list[tuple]:
 	"""
 	extract_markdown_links extracts the link and its name from 
@@ -444,5 +894,7 @@ def extract_markdown_links(text: str) -> list[tuple]:
 	text = "This is text with a link [to boot dev](https://www.boot.dev) and [to youtube](https://www.youtube.com/@bootdotdev)"
 	print(extract_markdown_links(text))
 	# [("to boot dev", "https://www.boot.dev"), ("to youtube", "https://www.youtube.com/@bootdotdev")]
+
+	Images are not links: ![alt](url) is left to extract_markdown_images.
 	"""
-	return re.findall(r"\[(.*?)\]\((.*?)\)", text)
+	return [(name, url) for _, _, name, url, text_type in iter_markdown_links(text) if text_type == text_type_link]
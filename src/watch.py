@@ -0,0 +1,428 @@
+import contextlib
+import os
+import time
+
+from assets import sync_file
+from compress import SIBLING_SUFFIXES, recompress
+import feeds
+import linkcheck
+import utils
+from console import console
+from depgraph import DependencyGraph, DEPGRAPH_PATH
+from feeds import TextCache, TEXT_CACHE_PATH, default_title, write_feeds
+from frontmatter import read_header
+from images import ImageIndex, IMAGES_PATH, IMAGE_EXTENSIONS
+from linkcheck import LinkChecker, LINKS_PATH, UrlIndex
+from listings import entry_url, generate_listings, listing_pages
+from main import collecting, extract_title, output_path
+from manifest import BuildManifest, MANIFEST_PATH
+from pageindex import PageIndex, PAGE_INDEX_PATH
+from source import MarkdownSource
+from template import Template
+from utils import block_converters
+
+
+class BuildGraph:
+	"""
+	The state of a built site, kept in memory between edits.
+
+	Holds the compiled template, the html of every block of every page
+	rendered so far and the build manifest, plus a (mtime, size) snapshot
+	of every source file. poll() compares a fresh snapshot against the
+	last one and rebuild() regenerates only the outputs of what changed:
+	an edited page is re-rendered reusing the html of its unchanged
+	blocks, an edited asset is synced on its own, and only a template
+	change touches every page. Pages showing an edited include or the
+	changed title of another page are re-rendered after it, as told by
+	the dependency graph, and so are pages showing an image whose size
+	changed or rendered with a template of their own that was edited.
+	Pages marked draft: true are left out unless drafts is set, as in a
+	build with --drafts. With listings or feeds, the page index is brought
+	up to date after pages were rendered or removed, and the listing pages
+	whose members changed, or the sitemap, feed and search index, are
+	written again as by a build with --listings or --feeds. After every
+	rebuild the links of all pages are checked against the outputs, like
+	at the end of a build.
+	"""
+
+	def __init__(
+			self,
+			content_dir: str="content",
+			static_dir: str="static",
+			template_path: str="template.html",
+			dest_dir: str="public",
+			manifest: BuildManifest=None,
+			compress: bool=True,
+			dependencies: DependencyGraph=None,
+			check_links: bool=True,
+			images: bool=True,
+			image_widths: list[int]=None,
+			drafts: bool=False,
+			listings: bool=False,
+			listing_page_size: int=10,
+			feeds: bool=False,
+			base_url: str="http://localhost:8888",
+			site_title: str=None,
+			site_author: str=None):
+		self.content_dir = content_dir
+		self.static_dir = static_dir
+		self.template_path = template_path
+		self.dest_dir = dest_dir
+		self.compress = compress
+		self.drafts = drafts
+		self.listing_page_size = listing_page_size if listings else None
+		self.base_url = base_url
+		self.site_title = site_title
+		self.site_author = site_author
+		self.manifest = manifest if manifest is not None else BuildManifest.load(MANIFEST_PATH)
+		self.index = PageIndex.load(PAGE_INDEX_PATH)
+		if dependencies is None:
+			dependencies = DependencyGraph.load(DEPGRAPH_PATH)
+			dependencies.bind(self.index, dest_dir)
+		self.dependencies = dependencies
+		self.text_cache = TextCache.load(TEXT_CACHE_PATH) if feeds else None
+		# The listing pages of the last build, to take down those that are gone
+		self.listing_paths = self.listing_outputs()
+		self.images = ImageIndex.load(IMAGES_PATH) if images else None
+		if self.images is not None and image_widths is not None:
+			self.images.widths = image_widths
+		dependencies.images = self.images
+		self.links = LinkChecker.load(LINKS_PATH) if check_links else None
+		# Kept up to date with the outputs of every rebuild
+		self.urls = UrlIndex.scan(dest_dir) if check_links else None
+		self.template = Template.load(template_path)
+		self.template_hash = self.manifest.file_hash(template_path)
+		# from_path -> {block text: (block html, its links)} of the last render
+		self.page_blocks = {}
+		self.files = self.scan()
+
+	def scan(self) -> dict[str, tuple[int, int]]:
+		"""
+		Stat every watched file.
+
+		return:
+		* dict of path to (mtime_ns, size)
+		"""
+		files = {}
+		for root in (self.content_dir, self.static_dir, utils.include_dir):
+			if os.path.isdir(root):
+				self._scan_dir(root, files)
+		# The default template and those picked in the front matter of pages
+		for path in {self.template_path} | self.dependencies.targets("template"):
+			if os.path.isfile(path):
+				stat = os.stat(path)
+				files[path] = (stat.st_mtime_ns, stat.st_size)
+		return files
+
+	def _scan_dir(self, path: str, files: dict):
+		with os.scandir(path) as entries:
+			for entry in entries:
+				if entry.is_dir():
+					self._scan_dir(entry.path, files)
+				else:
+					stat = entry.stat()
+					files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+
+	def poll(self) -> tuple[set[str], set[str]]:
+		"""
+		return:
+		* (changed or added paths, removed paths) since the last poll
+		"""
+		files = self.scan()
+		changed = {path for path, stat in files.items() if self.files.get(path) != stat}
+		removed = set(self.files) - set(files)
+		self.files = files
+		return changed, removed
+
+	def output_for(self, path: str) -> str:
+		if path.startswith(self.content_dir + os.sep):
+			return output_path(os.path.join(self.dest_dir, os.path.relpath(path, self.content_dir)))
+		return os.path.join(self.dest_dir, os.path.relpath(path, self.static_dir))
+
+	def rebuild(self, changed: set[str], removed: set[str]) -> list[str]:
+		"""
+		Regenerate the outputs affected by the given source changes.
+
+		return:
+		* list of outputs written or removed
+		"""
+		outputs = []
+		pages = {path for path in changed if path.startswith(self.content_dir + os.sep)}
+		assets = {path for path in changed if path.startswith(self.static_dir + os.sep)}
+		self.dependencies.forget(changed | removed)
+
+		if self.template_path in changed:
+			self.template = Template.load(self.template_path)
+			self.template_hash = self.manifest.file_hash(self.template_path, refresh=True)
+			pages = {path for path in self.files if path.startswith(self.content_dir + os.sep)}
+
+		for path in sorted(removed):
+			self.dependencies.remove_page(path)
+			outputs.extend(self.remove_outputs(path))
+
+		for path in sorted(assets):
+			dst = self.output_for(path)
+			os.makedirs(os.path.dirname(dst), exist_ok=True)
+			sync_file(path, os.stat(path), dst)
+			self.manifest.record_asset(path, dst)
+			outputs.append(dst)
+
+		if self.images is not None and any(
+				os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+				for path in assets | removed if path.startswith(self.static_dir + os.sep)):
+			before = {output for _, output in self.images.outputs(self.dest_dir)}
+			update = self.images.update(self.static_dir, self.dest_dir, self.manifest)
+			outputs.extend(update.synced)
+			for output in sorted(before - {output for _, output in self.images.outputs(self.dest_dir)}):
+				if self.manifest.remove_output(output):
+					outputs.append(output)
+
+		pages -= removed
+		rendered = set()
+		while True:
+			# Pages showing an include, a title or an image that changed,
+			# before or on the way
+			pages |= {
+				os.path.normpath(source) for source in self.dependencies.pages
+				if os.path.normpath(source) not in rendered and os.path.exists(source) and self.dependencies.is_stale(source)
+			}
+			if not self.drafts:
+				for path in sorted(path for path in pages if read_header(path)["draft"]):
+					# Like build(), leaves drafts out, and takes down the
+					# output of a page that just became one
+					outputs.extend(self.remove_outputs(path))
+					pages.discard(path)
+					rendered.add(path)
+			if not pages:
+				break
+			work = self.dependencies.order([(path, None) for path in sorted(pages)])
+			for path, _ in work:
+				outputs.append(self.render_page(path))
+			rendered.update(pages)
+			pages = set()
+
+		if (self.listing_page_size is not None or self.text_cache is not None) and (
+				rendered or any(path.startswith(self.content_dir + os.sep) for path in removed)):
+			outputs.extend(self.update_index())
+
+		if self.compress:
+			for output in list(outputs):
+				outputs.extend(recompress(self.manifest, output))
+		return outputs
+
+	def update_index(self) -> list[str]:
+		"""
+		Re-read the headers of the pages that changed into the page index,
+		then write the listing pages whose members changed and take down
+		those that are gone, and write the feeds again.
+
+		return:
+		* list of outputs written or removed
+		"""
+		content = self.content_dir + os.sep
+		self.index.scan([(path, self.output_for(path)) for path in sorted(self.files) if path.startswith(content)])
+		outputs = []
+		if self.listing_page_size is not None:
+			outputs.extend(generate_listings(
+				self.index,
+				template_path=self.template_path,
+				dest_dir=self.dest_dir,
+				content_dir=self.content_dir,
+				page_size=self.listing_page_size,
+				manifest=self.manifest
+			))
+			paths = self.listing_outputs()
+			for path in sorted(self.listing_paths - paths):
+				outputs.extend(
+					output for output in [path] + [path + suffix for suffix in SIBLING_SUFFIXES]
+					if self.manifest.remove_output(output)
+				)
+			self.listing_paths = paths
+		if self.text_cache is not None:
+			self.text_cache.keep(self.index.pages)
+			title = self.site_title if self.site_title is not None else default_title(self.index, self.content_dir)
+			for path in write_feeds(self.index, self.text_cache, self.base_url, title, dest_dir=self.dest_dir, author=self.site_author):
+				self.manifest.record_generated(path, "feeds")
+				outputs.append(path)
+		return outputs
+
+	def listing_outputs(self) -> set[str]:
+		"""
+		return:
+		* the paths of every listing page of the indexed site, empty without listings
+		"""
+		if self.listing_page_size is None:
+			return set()
+		return {
+			dest_path for *_, dest_path in listing_pages(self.index, self.dest_dir, self.content_dir, self.listing_page_size)
+		}
+
+	def remove_outputs(self, path: str) -> list[str]:
+		"""
+		Delete the output of a source and its precompressed siblings, and
+		forget the blocks and links of the page.
+
+		return:
+		* list of outputs removed
+		"""
+		dst = self.output_for(path)
+		self.page_blocks.pop(path, None)
+		if self.links is not None:
+			self.links.remove(path)
+		return [
+			output for output in [dst] + [dst + suffix for suffix in SIBLING_SUFFIXES]
+			if self.manifest.remove_output(output)
+		]
+
+	def refresh(self) -> list[str]:
+		"""
+		Poll once and rebuild whatever changed. Errors in a page are
+		reported instead of raised, so a half-typed edit does not end a
+		watch session.
+
+		return:
+		* list of outputs written or removed
+		"""
+		changed, removed = self.poll()
+		if not changed and not removed:
+			return []
+		start = time.perf_counter()
+		try:
+			outputs = self.rebuild(changed, removed)
+		except Exception as e:
+			console.error("Rebuild failed: %s", e)
+			return []
+		elapsed = (time.perf_counter() - start) * 1000
+		for output in outputs:
+			console.debug("Rebuilt %s", output)
+		console.info("Rebuilt %d outputs in %.1f ms", len(outputs), elapsed)
+		if self.links is not None:
+			self.check_links(outputs)
+		self.manifest.save()
+		self.dependencies.save()
+		self.index.save()
+		if self.images is not None:
+			self.images.save()
+		if self.text_cache is not None:
+			self.text_cache.save()
+		return outputs
+
+	def check_links(self, outputs: list[str]) -> list[dict]:
+		"""
+		Update the url index with the outputs of a rebuild and report the
+		broken links of every page.
+
+		return:
+		* the broken links, as LinkChecker.check()
+		"""
+		for output in outputs:
+			if os.path.exists(output):
+				self.urls.add(output)
+			else:
+				self.urls.discard(output)
+		broken = self.links.check(self.urls)
+		linkcheck.report_broken(broken)
+		self.links.save()
+		return broken
+
+	def render_page(self, from_path: str) -> str:
+		"""
+		Render one page, reusing the html of blocks that did not change
+		since its last render. The result is the same as generate_page's.
+		"""
+		dest_path = self.output_for(from_path)
+		os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+
+		cached = self.page_blocks.get(from_path, {})
+		blocks = {}
+		fragments = []
+		graph = self.dependencies
+		with collecting(graph, links=self.links is not None, text=self.text_cache is not None):
+			with (
+					MarkdownSource(from_path) as source,
+					graph.record(from_path) as dependencies,
+					linkcheck.collect(from_path, dest_path) if self.links is not None else contextlib.nullcontext([]) as links,
+					feeds.collect(from_path) if self.text_cache is not None else contextlib.nullcontext()):
+				meta = source.front_matter
+				title = meta["title"]
+				dependencies.append(("template", meta["template"] or self.template_path))
+				for block_type, lines in source.iter_blocks():
+					text = "\n".join(lines)
+					if not fragments and title is None:
+						title = extract_title(text)
+					block = cached.get(text)
+					if block is None:
+						recorded = len(dependencies)
+						start = len(links)
+						html, runs = self.convert_block(block_type, text)
+						# Html showing an include or a page title is not reused
+						if len(dependencies) == recorded:
+							blocks[text] = (html, links[start:], runs)
+					else:
+						html, block_links, runs = block
+						links.extend(block_links)
+						if utils.text_sink is not None:
+							for nodes in runs:
+								utils.text_sink(nodes)
+						blocks[text] = block
+					fragments.append(html)
+			graph.update(graph.collecting)
+			if self.links is not None:
+				self.links.update(linkcheck.collecting)
+			if self.text_cache is not None:
+				self.text_cache.put(from_path, self.manifest.file_hash(from_path, refresh=True), feeds.collecting[os.path.relpath(from_path)])
+		if not fragments and title is None:
+			title = extract_title("")
+		self.page_blocks[from_path] = blocks
+		graph.set_page(os.path.relpath(from_path), entry_url({"output": dest_path}, self.dest_dir), title)
+
+		template = self.template
+		template_hash = self.template_hash
+		if meta["template"] is not None and meta["template"] != self.template_path:
+			template = Template.load(meta["template"])
+			template_hash = self.manifest.file_hash(meta["template"], refresh=True)
+		page = template.render(template.front_matter_values(meta), Title=title, Content=f"<div>{''.join(fragments)}</div>")
+		tmp_path = f"{dest_path}.tmp"
+		with open(tmp_path, "w") as f:
+			f.write(page)
+		os.replace(tmp_path, dest_path)
+
+		self.manifest.file_hash(from_path, refresh=True)
+		self.manifest.record(from_path, dest_path, template_hash)
+		return dest_path
+
+	@staticmethod
+	def convert_block(block_type: str, text: str) -> tuple[str, list]:
+		"""
+		Convert one block, keeping the TextNode runs it hands to
+		utils.text_sink so they can be handed over again when the block
+		is reused.
+
+		return:
+		* (html of the block, list of TextNode runs, empty while nobody listens)
+		"""
+		runs = []
+		sink = utils.text_sink
+		if sink is not None:
+			def record(nodes):
+				runs.append(nodes)
+				sink(nodes)
+			utils.text_sink = record
+		try:
+			return block_converters[block_type](text).to_html(), runs
+		finally:
+			utils.text_sink = sink
+
+
+def watch(graph: BuildGraph, interval: float=0.05):
+	"""
+	Poll the sources of graph every interval seconds and rebuild what
+	changed, until interrupted.
+	"""
+	console.info("Watching %s/, %s/ and %s for changes (Ctrl+C to stop)", graph.content_dir, graph.static_dir, graph.template_path)
+	try:
+		while True:
+			graph.refresh()
+			time.sleep(interval)
+	except KeyboardInterrupt:
+		graph.manifest.save()